@@ -0,0 +1,185 @@
+"""
+Streaming animated wallpaper output
+Encodes a sequence of frames into an animated PNG or, through ffmpeg, a WebP/MP4/WebM file one frame at a time so memory stays at a single frame
+"""
+import io
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import time
+import zlib
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 格式名称 -> 扩展名
+ANIMATION_FORMATS = {
+    "apng": ".png",
+    "webp": ".webp",
+    "mp4": ".mp4",
+    "webm": ".webm",
+}
+# ffmpeg输出参数（输入是标准输入上的原始RGB帧）
+FFMPEG_OUTPUT_ARGS = {
+    "webp": ["-c:v", "libwebp", "-lossless", "0", "-q:v", "75", "-loop", "0"],
+    "mp4": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p",
+            "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2", "-movflags", "+faststart"],
+    "webm": ["-c:v", "libvpx-vp9", "-b:v", "0", "-crf", "33", "-row-mt", "1", "-pix_fmt", "yuv420p"],
+}
+FFMPEG_PATH = "ffmpeg"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+APNG_COMPRESS_LEVEL = 1  # 与静态PNG壁纸相同的快速压缩
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def _read_png_chunks(png_bytes):
+    """逐个返回PNG数据中的 (类型, 数据)"""
+    position = len(PNG_SIGNATURE)
+    while position < len(png_bytes):
+        length, = struct.unpack(">I", png_bytes[position:position + 4])
+        chunk_type = png_bytes[position + 4:position + 8]
+        yield chunk_type, png_bytes[position + 8:position + 8 + length]
+        position += 12 + length
+
+
+class ApngStreamWriter:
+    """
+    逐帧写入APNG文件：每帧由Pillow编码为PNG后取出图像数据，第一帧写为IDAT，之后的帧写为fdAT。
+    帧数事先未知，acTL中的帧数在关闭时回填。
+    """
+
+    def __init__(self, path, size, fps, loop=0):
+        self.path = path
+        self.size = size
+        self.delay = (1, max(1, int(round(fps))))  # 每帧显示 1/fps 秒
+        self.loop = loop
+        self.frame_count = 0
+        self._sequence = 0
+        self._actl_offset = None
+        self._file = open(path, "wb")
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(_png_chunk(chunk_type, data))
+
+    def add(self, image):
+        if image.size != self.size:
+            raise ValueError(f"帧尺寸不一致: {image.size} != {self.size}")
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG", compress_level=APNG_COMPRESS_LEVEL)
+        chunks = list(_read_png_chunks(buffer.getvalue()))
+
+        if self.frame_count == 0:
+            self._file.write(PNG_SIGNATURE)
+            self._write_chunk(b"IHDR", next(data for chunk_type, data in chunks if chunk_type == b"IHDR"))
+            self._actl_offset = self._file.tell()
+            self._write_chunk(b"acTL", struct.pack(">II", 0, self.loop))
+
+        width, height = self.size
+        self._write_chunk(b"fcTL", struct.pack(">IIIIIHHBB", self._sequence, width, height, 0, 0,
+                                               self.delay[0], self.delay[1], 0, 0))
+        self._sequence += 1
+        for chunk_type, data in chunks:
+            if chunk_type != b"IDAT":
+                continue
+            if self.frame_count == 0:
+                self._write_chunk(b"IDAT", data)
+            else:
+                self._write_chunk(b"fdAT", struct.pack(">I", self._sequence) + data)
+                self._sequence += 1
+        self.frame_count += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            if self.frame_count:
+                self._write_chunk(b"IEND", b"")
+                self._file.seek(self._actl_offset)
+                self._write_chunk(b"acTL", struct.pack(">II", self.frame_count, self.loop))
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class FfmpegStreamWriter:
+    """把原始RGB帧通过管道交给ffmpeg编码，内存中只保留当前帧"""
+
+    def __init__(self, path, size, fps, fmt, ffmpeg_path=FFMPEG_PATH):
+        executable = shutil.which(ffmpeg_path)
+        if executable is None:
+            raise Exception(f"找不到ffmpeg ({ffmpeg_path})，无法输出{fmt}格式的动画")
+        self.path = path
+        self.size = size
+        self.frame_count = 0
+        width, height = size
+        command = [executable, "-y", "-loglevel", "error",
+                   "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-"]
+        command += FFMPEG_OUTPUT_ARGS[fmt] + [path]
+        logger.debug(f"ffmpeg命令: {' '.join(command)}")
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def add(self, image):
+        if image.size != self.size:
+            raise ValueError(f"帧尺寸不一致: {image.size} != {self.size}")
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        try:
+            self._process.stdin.write(image.tobytes())
+        except BrokenPipeError:
+            raise Exception(f"ffmpeg已退出: {self._process.stderr.read().decode(errors='replace').strip()}")
+        self.frame_count += 1
+
+    def close(self):
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise Exception(f"ffmpeg编码失败 (退出码 {process.returncode}): {stderr.decode(errors='replace').strip()}")
+
+
+def open_animation_writer(path, fmt, size, fps):
+    if fmt not in ANIMATION_FORMATS:
+        raise ValueError(f"不支持的动画格式: {fmt}")
+    if fmt == "apng":
+        return ApngStreamWriter(path, size, fps)
+    return FfmpegStreamWriter(path, size, fps, fmt)
+
+
+def write_animation(frames, base_path, fmt, fps):
+    """
+    从帧迭代器中逐帧取出图像并编码，返回 (文件路径, 帧数, 耗时秒数)。
+    先写入临时文件，完整写完后才替换旧的动画文件。
+    """
+    path = os.path.splitext(base_path)[0] + ANIMATION_FORMATS[fmt]
+    temp_path = path + ".partial" + ANIMATION_FORMATS[fmt]
+    start = time.perf_counter()
+    writer = None
+    try:
+        for image in frames:
+            if writer is None:
+                writer = open_animation_writer(temp_path, fmt, image.size, fps)
+            writer.add(image)
+        if writer is None:
+            raise Exception("没有可编码的动画帧")
+        writer.close()
+        os.replace(temp_path, path)
+    except BaseException:
+        if writer is not None:
+            try:
+                writer.close()
+            except Exception:
+                pass
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    seconds = time.perf_counter() - start
+    logger.info(f"动画已保存: {path} ({writer.frame_count} 帧, {fps} fps, {seconds:.1f}秒, "
+                f"{os.path.getsize(path) / 1024:.0f} KB)")
+    return path, writer.frame_count, seconds
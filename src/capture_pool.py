@@ -0,0 +1,267 @@
+"""
+Process-pool view capture
+Runs several headless browser workers in separate processes that pull views from a shared bounded queue, each worker being one CaptureSession
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+from capture_session import CaptureSession, ViewCapture
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 单个工作进程的浏览器（chromedriver、Chrome及其渲染/GPU子进程）常驻内存之和的上限（MB），超过后在下一个任务前重启浏览器。
+# 各进程的RSS直接相加，共享的页面会被重复计算，所以这个值偏保守
+MAX_WORKER_MEMORY_MB = 1536
+# 每个工作进程最多排队的任务数（有界队列，视图很多时主进程在提交时等待）
+TASKS_PER_WORKER = 2
+
+
+def _proc_children():
+    """从/proc读取进程树：父进程PID -> 子进程PID列表"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # 进程名可能包含空格和括号，父进程PID是最后一个")"之后的第二个字段
+        ppid = int(stat[stat.rindex(b")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _proc_rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _process_tree_memory_mb(pid):
+    """进程及其所有子孙进程的常驻内存之和（MB）；无法测量时返回None"""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            total = 0
+            for process in [root] + root.children(recursive=True):
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / (1024 * 1024)
+        except psutil.Error:
+            return None
+    if sys.platform.startswith("linux"):
+        children = _proc_children()
+        total, pending = 0, [pid]
+        while pending:
+            current = pending.pop()
+            total += _proc_rss_bytes(current)
+            pending.extend(children.get(current, []))
+        return total / (1024 * 1024) if total else None
+    return None
+
+
+def _browser_memory_mb(session):
+    """会话的浏览器进程树占用的内存（MB），浏览器未运行或无法测量时返回None"""
+    try:
+        return _process_tree_memory_mb(session.driver.service.process.pid)
+    except AttributeError:
+        return None
+
+
+def _worker_main(index, driver_path, url, window_size, max_memory_mb, tasks, results, active_batch):
+    """工作进程：复用一个截图会话依次处理任务，收到None时关闭浏览器并退出"""
+    session = CaptureSession(driver_path, url, window_size)
+    if psutil is None and not sys.platform.startswith("linux"):
+        logger.warning("没有安装psutil，无法测量截图进程的内存，不会按内存上限回收浏览器")
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            batch, position, view, timeout = task
+            if batch != active_batch.value:
+                continue  # 已超时放弃的批次中剩下的任务，调用方不再等待结果
+            recycled = False
+            try:
+                if session.ensure_driver() or not session.page_is_warm():
+                    session.ensure_page()
+                capture = session.capture_view(view, "hash", timeout)
+            except Exception as e:
+                capture = ViewCapture(view, error=str(e))
+                logger.error(traceback.format_exc())
+                session.close()
+            memory_mb = _browser_memory_mb(session) if session.driver is not None else None
+            if memory_mb is not None and memory_mb > max_memory_mb:
+                # 超过内存上限：关闭浏览器，下一个任务时重新启动
+                session.close()
+                recycled = True
+            results.put((batch, position, index, capture, memory_mb, recycled))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.close()
+
+
+class WorkerStats:
+    """单个工作进程的计数器"""
+
+    def __init__(self, index):
+        self.index = index
+        self.tasks = 0
+        self.errors = 0
+        self.recycles = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+        self.memory_mb = None
+
+    def __repr__(self):
+        memory = f"{self.memory_mb:.0f}MB" if self.memory_mb is not None else "-"
+        return (f"worker{self.index}(任务 {self.tasks}, 失败 {self.errors}, 截图 {self.busy_seconds:.1f}秒, "
+                f"内存 {memory}, 回收 {self.recycles}, 重启 {self.restarts})")
+
+
+class CapturePool:
+    """多进程截图池：N个工作进程各自持有一个无头浏览器，从共享的有界队列中领取视图"""
+
+    def __init__(self, driver_path, url, window_size=(1920, 1080), workers=2,
+                 max_memory_mb=MAX_WORKER_MEMORY_MB):
+        if workers < 1:
+            raise ValueError(f"工作进程数必须至少为1: {workers}")
+        self.driver_path = driver_path
+        self.url = url
+        self.window_size = window_size
+        self.workers = workers
+        self.max_memory_mb = max_memory_mb
+        # 统一使用spawn，各平台行为一致，也避免fork带着主进程的线程和浏览器连接
+        self._context = multiprocessing.get_context("spawn")
+        self._tasks = None
+        self._results = None
+        self._active_batch = self._context.Value("i", 0)  # 正在等待结果的批次，工作进程跳过其他批次的任务
+        self._processes = []
+        self.stats = [WorkerStats(index) for index in range(workers)]
+        self._batch = 0
+
+    def _start_worker(self, index):
+        process = self._context.Process(
+            target=_worker_main, name=f"capture-worker-{index}", daemon=True,
+            args=(index, self.driver_path, self.url, self.window_size, self.max_memory_mb,
+                  self._tasks, self._results, self._active_batch))
+        process.start()
+        return process
+
+    def start(self):
+        if self._processes:
+            return
+        self._tasks = self._context.Queue(maxsize=self.workers * TASKS_PER_WORKER)
+        self._results = self._context.Queue()
+        self._processes = [self._start_worker(index) for index in range(self.workers)]
+        logger.info(f"截图池已启动: {self.workers} 个工作进程, 每个进程内存上限 {self.max_memory_mb} MB")
+
+    def _restart_dead_workers(self):
+        for index, process in enumerate(self._processes):
+            if not process.is_alive():
+                logger.warning(f"截图工作进程 {index} 已退出 (退出码 {process.exitcode})，正在重启")
+                self._processes[index] = self._start_worker(index)
+                self.stats[index].restarts += 1
+
+    def capture(self, views, timeout=20):
+        """把视图分发给工作进程并收集结果，返回与views顺序一致的ViewCapture列表"""
+        self.start()
+        self._restart_dead_workers()
+        self._batch += 1
+        batch = self._batch
+        self._active_batch.value = batch
+        captures = [None] * len(views)
+        pending = len(views)
+
+        def collect(wait):
+            nonlocal pending
+            try:
+                result_batch, position, index, capture, memory_mb, recycled = self._results.get(timeout=wait)
+            except queue.Empty:
+                return False
+            if result_batch != batch:
+                return True  # 上一批超时任务的迟到结果
+            captures[position] = capture
+            pending -= 1
+            stats = self.stats[index]
+            stats.tasks += 1
+            stats.errors += 0 if capture.ok else 1
+            stats.busy_seconds += capture.seconds
+            stats.memory_mb = memory_mb
+            if recycled:
+                stats.recycles += 1
+                logger.info(f"截图工作进程 {index} 超过内存上限 ({memory_mb:.0f} MB)，已回收浏览器")
+            return True
+
+        # 队列有界：工作进程忙时提交会等待，期间先收集已完成的结果
+        for position, view in enumerate(views):
+            while True:
+                try:
+                    self._tasks.put((batch, position, view, timeout), timeout=0.1)
+                    break
+                except queue.Full:
+                    collect(0.1)
+
+        # 每个结果最多等待：一次浏览器启动和页面加载 + 渲染等待上限
+        deadline = time.monotonic() + timeout * 3
+        while pending and time.monotonic() < deadline:
+            if collect(0.5):
+                deadline = time.monotonic() + timeout * 3
+            elif not all(process.is_alive() for process in self._processes):
+                self._restart_dead_workers()
+
+        self._active_batch.value = 0
+        if pending:
+            # 超时放弃的任务：清空队列中还没有被领取的部分，没有清掉的由工作进程按批次号跳过
+            dropped = 0
+            while True:
+                try:
+                    self._tasks.get_nowait()
+                    dropped += 1
+                except queue.Empty:
+                    break
+            logger.warning(f"截图池等待结果超时，{pending} 个视图没有结果，丢弃队列中 {dropped} 个任务")
+        for position, view in enumerate(views):
+            if captures[position] is None:
+                captures[position] = ViewCapture(view, error="截图池等待结果超时")
+        return captures
+
+    def summary(self):
+        return "; ".join(repr(stats) for stats in self.stats)
+
+    def close(self, timeout=30):
+        """通知所有工作进程关闭浏览器并退出"""
+        if not self._processes:
+            return
+        for _ in self._processes:
+            try:
+                self._tasks.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"截图工作进程 {process.name} 未按时退出，强制结束")
+                process.terminate()
+                process.join()
+        self._processes = []
+        self._tasks.close()
+        self._results.close()
+        self._tasks = self._results = None
+        logger.info(f"截图池已关闭: {self.summary()}")
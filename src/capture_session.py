@@ -0,0 +1,397 @@
+"""
+Headless Chrome capture session
+Keeps one browser and the loaded Earth Nullschool page warm between wallpaper updates, and captures several views in one session
+"""
+import logging
+import re
+import time
+import traceback
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+import metrics
+from scheduler import data_refresh_fragment
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 页面保持的最长时间（秒），超过后完整重新加载一次页面
+MAX_PAGE_AGE = 6 * 3600
+# 多视图截图的切换方式: "hash"=在同一个标签页中切换URL片段, "tabs"=每个视图一个标签页并行加载
+CAPTURE_MODES = ("hash", "tabs")
+# 复用页面时等待新的风场数据请求的最长时间（秒），超时（页面没有响应片段变化）则完整重新加载页面
+WARM_DATA_TIMEOUT = 5
+
+
+# 页面当前的URL片段（#之后的部分）
+_CURRENT_FRAGMENT_JS = "return location.hash.slice(1);"
+
+# 切换标签页的URL片段；返回切换的时刻，就绪检测只认此后开始的数据请求
+_SHOW_FRAGMENT_JS = """
+performance.clearResourceTimings();
+var since = performance.now();
+location.hash = arguments[0];
+return since;
+"""
+
+# 是否已有在since之后开始的风场数据请求完成
+_DATA_REQUESTED_JS = """
+var dataPattern = new RegExp(arguments[0]);
+var since = arguments[1];
+return performance.getEntriesByType('resource').some(function(entry) {
+    return dataPattern.test(entry.name) && entry.startTime >= since && entry.responseEnd > 0;
+});
+"""
+
+
+class CaptureView:
+    """一个要截图的视图：URL片段（#之后的部分）、截图元素的选择器和输出名称"""
+
+    def __init__(self, name, fragment, selector=".mapContainer"):
+        if not re.fullmatch(r"[\w.-]+", name):
+            raise ValueError(f"视图名称只能包含字母、数字、下划线、点和横线: {name}")
+        self.name = name
+        self.fragment = fragment.lstrip("#")
+        self.selector = selector
+
+    @classmethod
+    def parse(cls, text):
+        """解析 "名称=片段" 或 "名称=片段@选择器"，例如 "850hPa=current/wind/isobaric/850hPa/orthographic" """
+        name, sep, rest = text.partition("=")
+        if not sep or not rest:
+            raise ValueError(f"无法解析视图: {text}（格式: 名称=URL片段[@选择器]）")
+        fragment, _, selector = rest.partition("@")
+        return cls(name.strip(), fragment.strip(), selector.strip() or ".mapContainer")
+
+    def __repr__(self):
+        return f"CaptureView({self.name}: #{self.fragment})"
+
+
+class ViewCapture:
+    """一个视图的截图结果"""
+
+    def __init__(self, view, png_bytes=None, ready=False, signature=None, seconds=0.0, error=None):
+        self.view = view
+        self.png_bytes = png_bytes
+        self.ready = ready
+        self.signature = signature
+        self.seconds = seconds  # 从切换视图到截图完成的耗时
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.png_bytes is not None
+
+    def __repr__(self):
+        status = "成功" if self.ok else f"失败: {self.error}"
+        return f"ViewCapture({self.view.name}, {self.seconds:.2f}秒, {status})"
+
+
+class CaptureSession:
+    """长期存活的无头浏览器截图会话"""
+
+    def __init__(self, driver_path, url, window_size=(1920, 1080), max_page_age=MAX_PAGE_AGE):
+        self.driver_path = driver_path
+        self.url = url
+        self.window_size = window_size
+        self.max_page_age = max_page_age
+        self.driver = None
+        self.page_loaded_at = None
+        self.data_since = None  # 当前页面最近一次触发数据刷新的时刻（页面的performance.now()），完整加载后为None
+        self.respawn_count = 0
+        self.main_handle = None  # 主标签页
+        self.view_tabs = {}  # 视图名称 -> 标签页句柄（tabs模式）
+
+    def _chrome_options(self):
+        """构造Chrome启动参数"""
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")  # 无头模式
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument(f"--window-size={self.window_size[0]},{self.window_size[1]}")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")  # 解决内存不足问题
+        chrome_options.add_argument("--disable-extensions")  # 禁用扩展
+        chrome_options.add_argument("--disable-browser-side-navigation")  # 避免超时错误
+        chrome_options.add_argument("--disable-features=VizDisplayCompositor")  # 避免渲染问题
+        return chrome_options
+
+    def start(self):
+        """启动Chrome浏览器"""
+        chrome_options = self._chrome_options()
+        logger.debug(f"Chrome选项: {chrome_options.arguments}")
+        try:
+            service = Service(self.driver_path)
+            self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            self.page_loaded_at = None
+            self.data_since = None
+            self.main_handle = self.driver.current_window_handle
+            self.view_tabs = {}
+            logger.info("Chrome浏览器已启动")
+        except Exception as e:
+            self.driver = None
+            logger.error(f"启动Chrome浏览器失败: {e}")
+            logger.error(traceback.format_exc())
+            raise Exception(f"启动Chrome浏览器失败: {e}")
+
+    def close(self):
+        """关闭浏览器，下次使用时会重新启动"""
+        if self.driver is None:
+            return
+        try:
+            self.driver.quit()
+            logger.info("浏览器已关闭")
+        except Exception as e:
+            logger.error(f"关闭浏览器时出错: {e}")
+        finally:
+            self.driver = None
+            self.page_loaded_at = None
+            self.data_since = None
+            self.main_handle = None
+            self.view_tabs = {}
+
+    def is_alive(self):
+        """健康检查：浏览器是否仍能响应脚本调用"""
+        if self.driver is None:
+            return False
+        try:
+            self.driver.execute_script("return document.readyState")
+            return True
+        except Exception as e:
+            logger.warning(f"浏览器健康检查失败: {e}")
+            return False
+
+    def respawn(self):
+        """重启浏览器"""
+        logger.warning("浏览器会话失效，正在重启")
+        self.close()
+        self.start()
+        self.respawn_count += 1
+        logger.info(f"浏览器已重启 (累计重启 {self.respawn_count} 次)")
+
+    def ensure_driver(self):
+        """确保浏览器可用，必要时透明地重启"""
+        if self.driver is None:
+            self.start()
+            return True
+        if not self.is_alive():
+            self.respawn()
+            return True
+        return False
+
+    def page_is_warm(self):
+        """页面是否已加载且未过期"""
+        if self.page_loaded_at is None:
+            return False
+        if time.time() - self.page_loaded_at > self.max_page_age:
+            logger.info("页面已超过最长保持时间，将重新加载")
+            return False
+        try:
+            return self.driver.current_url.split("#")[0] == self.url.split("#")[0]
+        except Exception:
+            return False
+
+    def ensure_page(self):
+        """确保页面已加载；返回True表示本次完整加载了页面"""
+        if self.page_is_warm():
+            # 复用已加载的页面：把URL片段的日期切换到最新数据时间，页面重新解析视图并拉取数据
+            logger.info("复用已加载的页面，刷新当前数据")
+            self.data_since = self._switch_fragment(self.url.partition("#")[2])
+            if self._wait_for_data_request(self.data_since, WARM_DATA_TIMEOUT):
+                return False
+            # 没有新的数据请求时，画布和旧的数据会被误判为就绪，只能完整重新加载
+            logger.warning(f"切换URL片段后 {WARM_DATA_TIMEOUT} 秒内没有新的数据请求，完整重新加载页面")
+
+        try:
+            self.driver.get(self.url)
+        except Exception as e:
+            logger.warning(f"访问网站失败，重启浏览器后重试: {e}")
+            self.respawn()
+            self.driver.get(self.url)
+        self.page_loaded_at = time.time()
+        self.data_since = None
+        return True
+
+    def _switch_fragment(self, fragment):
+        """在当前标签页中显示fragment对应的视图并重新拉取数据，返回切换的时刻（页面的performance.now()）"""
+        current = self.driver.execute_script(_CURRENT_FRAGMENT_JS)
+        return self.driver.execute_script(_SHOW_FRAGMENT_JS, data_refresh_fragment(current, fragment))
+
+    def _wait_for_data_request(self, since, timeout, poll_interval=0.25):
+        """等待一个在since之后开始的风场数据请求完成"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self.driver.execute_script(_DATA_REQUESTED_JS, DATA_RESOURCE_PATTERN, since):
+                    return True
+            except Exception as e:
+                logger.debug(f"检查数据请求失败: {e}")
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+
+    def view_url(self, view):
+        return self.url.split("#")[0] + "#" + view.fragment
+
+    def prepare_views(self, views, mode="hash"):
+        """tabs模式下为还没有标签页的视图打开新标签页，让各视图的页面和数据并行加载"""
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"不支持的多视图模式: {mode}")
+        if mode != "tabs":
+            return
+        self.driver.switch_to.window(self.main_handle)
+        for view in views:
+            if view.name in self.view_tabs:
+                continue
+            before = set(self.driver.window_handles)
+            self.driver.execute_script("window.open(arguments[0], '_blank');", self.view_url(view))
+            opened = set(self.driver.window_handles) - before
+            if opened:
+                self.view_tabs[view.name] = opened.pop()
+                logger.debug(f"已为视图 {view.name} 打开标签页")
+        self.driver.switch_to.window(self.main_handle)
+
+    def _show_view(self, view, mode):
+        """切换到视图；返回True表示该视图的页面刚刚开始加载"""
+        if mode == "tabs" and view.name in self.view_tabs:
+            self.driver.switch_to.window(self.view_tabs[view.name])
+            fresh = self.driver.execute_script("return !window.__windViewSeen && (window.__windViewSeen = true);")
+            if fresh:
+                self.data_since = None
+            else:
+                # 已加载的标签页：切换URL片段的日期，重新拉取数据
+                self.data_since = self._switch_fragment(view.fragment)
+            return fresh
+
+        self.driver.switch_to.window(self.main_handle)
+        # 清除资源记录，确保就绪检测等待的是新视图的数据请求
+        self.data_since = self._switch_fragment(view.fragment)
+        return False
+
+    def capture_view(self, view, mode="hash", timeout=20):
+        """切换到视图、等待渲染就绪并截图，返回ViewCapture（失败时error不为空）"""
+        start = time.perf_counter()
+        try:
+            with metrics.span(f"view:{view.name}"):
+                self._show_view(view, mode)
+                ready, _, signature = wait_for_render_ready(self.driver, timeout=timeout, since=self.data_since)
+                elements = self.driver.find_elements(By.CSS_SELECTOR, view.selector)
+                if elements:
+                    png_bytes = elements[0].screenshot_as_png
+                else:
+                    logger.warning(f"视图 {view.name} 中找不到元素 {view.selector}，截取整个页面")
+                    png_bytes = self.driver.get_screenshot_as_png()
+            capture = ViewCapture(view, png_bytes, ready, signature, time.perf_counter() - start)
+        except Exception as e:
+            logger.error(f"截取视图 {view.name} 失败: {e}")
+            logger.error(traceback.format_exc())
+            capture = ViewCapture(view, seconds=time.perf_counter() - start, error=str(e))
+        logger.info(f"视图截图: {capture}")
+        return capture
+
+    def iter_capture_views(self, views, mode="hash", timeout=20):
+        """在同一个浏览器会话中依次截取所有视图，每截好一个就产生一个ViewCapture，调用方可以边截图边处理"""
+        if self.ensure_driver() or not self.page_is_warm():
+            self.ensure_page()
+        self.prepare_views(views, mode)
+        try:
+            for view in views:
+                yield self.capture_view(view, mode, timeout)
+        finally:
+            self.driver.switch_to.window(self.main_handle)
+            if mode == "hash":
+                # 恢复主视图，下次更新复用页面时截取的仍是主视图
+                self.data_since = self._switch_fragment(self.url.partition("#")[2])
+
+    def capture_views(self, views, mode="hash", timeout=20):
+        """在同一个浏览器会话中一次截取所有视图，返回与views顺序一致的ViewCapture列表"""
+        return list(self.iter_capture_views(views, mode, timeout))
+
+
+# 按优先级查找用于判断渲染是否稳定的画布（粒子动画画布会一直变化，优先选择覆盖层画布）
+READY_CANVAS_SELECTORS = ["canvas#overlay", ".mapContainer canvas", "canvas"]
+# 风场数据请求的URL特征
+DATA_RESOURCE_PATTERN = r"/data/weather/.*\.json"
+
+# 在页面中计算画布的缩略签名，并检查风场数据请求是否已完成
+_READY_PROBE_JS = """
+var selectors = arguments[0];
+var dataPattern = new RegExp(arguments[1]);
+var since = arguments[2] || 0;
+var canvas = null;
+for (var i = 0; i < selectors.length && !canvas; i++) {
+    canvas = document.querySelector(selectors[i]);
+}
+var signature = null;
+if (canvas && canvas.width > 0 && canvas.height > 0) {
+    try {
+        var probe = window.__windReadyProbe || (window.__windReadyProbe = document.createElement('canvas'));
+        probe.width = 32;
+        probe.height = 32;
+        var ctx = probe.getContext('2d');
+        ctx.clearRect(0, 0, 32, 32);
+        ctx.drawImage(canvas, 0, 0, 32, 32);
+        var pixels = ctx.getImageData(0, 0, 32, 32).data;
+        var sum = 0, weighted = 0;
+        for (var j = 0; j < pixels.length; j++) {
+            sum += pixels[j];
+            weighted = (weighted + pixels[j] * (j % 251 + 1)) % 1000000007;
+        }
+        signature = canvas.width + 'x' + canvas.height + ':' + sum + ':' + weighted;
+    } catch (e) {
+        signature = null;
+    }
+}
+var dataLoaded = performance.getEntriesByType('resource').some(function(entry) {
+    return dataPattern.test(entry.name) && entry.startTime >= since && entry.responseEnd > 0;
+});
+return {
+    readyState: document.readyState,
+    hasCanvas: canvas !== null,
+    signature: signature,
+    dataLoaded: dataLoaded
+};
+"""
+
+
+def wait_for_render_ready(driver, timeout=20, stable_frames=3, poll_interval=0.5,
+                          canvas_selectors=READY_CANVAS_SELECTORS, data_pattern=DATA_RESOURCE_PATTERN, since=None):
+    """
+    等待页面真正渲染完成：风场数据请求已完成，且地图画布连续stable_frames次采样保持不变。
+    复用页面时传入触发刷新的时刻since（页面的performance.now()），只认此后开始的数据请求，
+    并且只从该请求完成后开始计算画布的稳定次数，避免把刷新前的旧画面当作就绪。
+    返回 (是否就绪, 耗时秒数, 画布签名)；超过timeout仍未就绪时返回False，由调用方决定是否继续截图。
+    覆盖层画布只由风场数据决定，签名可以作为数据是否变化的标识。
+    """
+    start = time.monotonic()
+    last_signature = None
+    stable_count = 0
+    state = None
+
+    while True:
+        elapsed = time.monotonic() - start
+        try:
+            state = driver.execute_script(_READY_PROBE_JS, canvas_selectors, data_pattern, since)
+        except Exception as e:
+            logger.debug(f"就绪探测脚本执行失败: {e}")
+            state = None
+
+        if state and state.get("readyState") == "complete" and state.get("signature") \
+                and (since is None or state.get("dataLoaded")):
+            if state["signature"] == last_signature:
+                stable_count += 1
+            else:
+                stable_count = 1
+                last_signature = state["signature"]
+
+            if state.get("dataLoaded") and stable_count >= stable_frames:
+                logger.info(f"页面渲染已就绪，耗时 {elapsed:.2f} 秒")
+                return True, elapsed, last_signature
+        else:
+            stable_count = 0
+            last_signature = None
+
+        if elapsed >= timeout:
+            logger.warning(f"等待页面渲染就绪超时 ({timeout} 秒)，最后状态: {state}")
+            return False, elapsed, last_signature
+
+        time.sleep(poll_interval)
@@ -0,0 +1,153 @@
+"""
+Event-driven update daemon
+Runs wallpaper updates on asyncio timers with blocking work in an executor; idle time costs no wakeups
+"""
+import asyncio
+import logging
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 控制台命令
+COMMAND_HELP = "输入 r 立即更新, s 查看状态, q 退出"
+
+
+class WallpaperDaemon:
+    """壁纸更新守护进程：更新由定时器驱动，手动刷新和状态查询都是事件，空闲时进程不会被唤醒"""
+
+    def __init__(self, update_func, scheduler):
+        self.update_func = update_func  # 返回True表示得到并应用了新数据
+        self.scheduler = scheduler
+        self.update_count = 0
+        self.last_update_seconds = None
+        self.next_update_at = None  # 下次更新的墙钟时间
+        self._loop = None
+        self._refresh = None
+        self._stop = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wallpaper-update")
+
+    def next_delay(self):
+        """距下次定时更新的秒数"""
+        return self.scheduler.next_delay()
+
+    # 以下方法可以从任意线程调用
+
+    def request_refresh(self):
+        """立即触发一次更新；更新进行中时合并为一次后续更新"""
+        self._call_in_loop(self._refresh.set)
+
+    def request_status(self):
+        self._call_in_loop(self.heartbeat)
+
+    def stop(self):
+        self._call_in_loop(self._stop.set)
+
+    def _call_in_loop(self, callback):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(callback)
+
+    def heartbeat(self):
+        """输出一次运行状态（只在事件发生时调用，不做周期性轮询）"""
+        if self.next_update_at is not None:
+            remaining = max(0, self.next_update_at - time.time())
+            next_text = f"下次更新还有 {remaining:.0f} 秒"
+        else:
+            next_text = "正在更新"
+        last_text = f", 上次更新耗时 {self.last_update_seconds:.1f} 秒" if self.last_update_seconds is not None else ""
+        message = f"程序正在运行... 已更新 {self.update_count} 次{last_text}, {next_text}"
+        logger.info(message)
+        print(message)
+
+    async def _run_update(self):
+        self.next_update_at = None
+        start = time.perf_counter()
+        changed = False
+        try:
+            changed = bool(await self._loop.run_in_executor(self._executor, self.update_func))
+        except Exception as e:
+            logger.error(f"更新壁纸时出错: {e}", exc_info=True)
+        self.scheduler.record_result(changed)
+        self.last_update_seconds = time.perf_counter() - start
+        self.update_count += 1
+
+    async def _wait_for_trigger(self, delay):
+        """等待定时器到期、手动刷新或停止，返回触发原因"""
+        refresh_task = asyncio.ensure_future(self._refresh.wait())
+        stop_task = asyncio.ensure_future(self._stop.wait())
+        try:
+            done, _ = await asyncio.wait({refresh_task, stop_task}, timeout=delay,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            refresh_task.cancel()
+            stop_task.cancel()
+        if stop_task in done:
+            return "stop"
+        if refresh_task in done:
+            self._refresh.clear()
+            return "refresh"
+        return "timer"
+
+    async def run(self, update_first=False):
+        self._loop = asyncio.get_running_loop()
+        self._refresh = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._install_signal_handlers()
+        logger.info("开始主循环（事件驱动）")
+
+        if update_first:
+            await self._run_update()
+        try:
+            while True:
+                delay = self.next_delay()
+                self.next_update_at = time.time() + delay
+                self.heartbeat()
+                reason = await self._wait_for_trigger(delay)
+                if reason == "stop":
+                    break
+                if reason == "refresh":
+                    logger.info("收到手动刷新请求")
+                    print("收到手动刷新请求，立即更新壁纸")
+                await self._run_update()
+        finally:
+            self._loop = None
+            # 被中断时不等待正在进行的更新
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("主循环已停止")
+
+    def _install_signal_handlers(self):
+        if sys.platform == "win32":
+            return
+        # Unix下可以用 kill -USR1 触发刷新, kill -USR2 查看状态
+        try:
+            self._loop.add_signal_handler(signal.SIGUSR1, self._refresh.set)
+            self._loop.add_signal_handler(signal.SIGUSR2, self.heartbeat)
+        except (NotImplementedError, RuntimeError, ValueError) as e:
+            logger.debug(f"无法注册信号处理: {e}")
+
+    def start_console_commands(self):
+        """在后台线程中读取控制台命令；该线程阻塞在input()上，不会周期性唤醒"""
+        thread = threading.Thread(target=self._read_console_commands, name="console-commands", daemon=True)
+        thread.start()
+        print(COMMAND_HELP)
+        return thread
+
+    def _read_console_commands(self):
+        while True:
+            try:
+                command = input().strip().lower()
+            except (EOFError, OSError):
+                logger.debug("控制台输入已关闭，停止读取命令")
+                return
+            if command == "r":
+                self.request_refresh()
+            elif command == "s":
+                self.request_status()
+            elif command == "q":
+                self.stop()
+                return
+            elif command:
+                print(COMMAND_HELP)
@@ -0,0 +1,178 @@
+"""
+Desktop visibility state
+Detects whether the session is locked or idle and whether a window is fully covered by other windows, so the live wallpaper can stop rendering when nobody can see it
+"""
+import ctypes
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger("wind_wallpaper")
+
+MONITOR_DEFAULTTONEAREST = 2
+GA_ROOT = 2
+DESKTOP_SWITCHDESKTOP = 0x0100
+GWL_EXSTYLE = -20
+WS_EX_TRANSPARENT = 0x00000020
+WS_EX_TOOLWINDOW = 0x00000080
+DWMWA_CLOAKED = 14
+# 桌面和任务栏本身不算遮挡
+SHELL_WINDOW_CLASSES = {"Progman", "WorkerW", "Shell_TrayWnd", "Shell_SecondaryTrayWnd"}
+# Linux上查询logind锁屏和空闲状态的最短间隔（秒）；遮挡由调用方按窗口是否映射到屏幕上判断，不受此限制
+LOGIND_POLL_INTERVAL = 30
+
+_logind_session = None
+_logind_hints = {}
+_logind_checked_at = None
+
+
+class DesktopState:
+    """一次检测的结果；无法检测的项为None"""
+
+    def __init__(self, locked=None, idle_seconds=None, covered=None):
+        self.locked = locked
+        self.idle_seconds = idle_seconds
+        self.covered = covered
+
+    def __repr__(self):
+        return f"DesktopState(locked={self.locked}, idle_seconds={self.idle_seconds}, covered={self.covered})"
+
+
+def _windows_locked():
+    """锁屏（或UAC安全桌面）时普通进程无法打开输入桌面"""
+    user32 = ctypes.windll.user32
+    desktop = user32.OpenInputDesktop(0, False, DESKTOP_SWITCHDESKTOP)
+    if not desktop:
+        return True
+    user32.CloseDesktop(desktop)
+    return False
+
+
+def _windows_idle_seconds():
+    from ctypes import wintypes
+
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+
+    info = LASTINPUTINFO()
+    info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return None
+    # 两个计数都是32位毫秒数，约49天回绕一次
+    return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000.0
+
+
+def _windows_covered(hwnd):
+    """
+    是否有一个位于hwnd之上的可见顶层窗口（通常是最大化或全屏窗口）完整覆盖了hwnd所在显示器的工作区。
+    EnumWindows按Z顺序从上到下枚举，遇到hwnd（或它所在的顶层窗口）就停止，下面的窗口不可能遮挡它。
+    """
+    from ctypes import wintypes
+
+    class MONITORINFO(ctypes.Structure):
+        _fields_ = [("cbSize", wintypes.DWORD), ("rcMonitor", wintypes.RECT),
+                    ("rcWork", wintypes.RECT), ("dwFlags", wintypes.DWORD)]
+
+    user32 = ctypes.windll.user32
+    info = MONITORINFO()
+    info.cbSize = ctypes.sizeof(MONITORINFO)
+    if not user32.GetMonitorInfoW(user32.MonitorFromWindow(hwnd, MONITOR_DEFAULTTONEAREST), ctypes.byref(info)):
+        return None
+    work = info.rcWork
+    # 嵌入到桌面WorkerW等宿主窗口中时，按宿主窗口在Z顺序中的位置判断
+    user32.GetAncestor.restype = wintypes.HWND
+    top_level = user32.GetAncestor(hwnd, GA_ROOT) or hwnd
+    try:
+        dwmapi = ctypes.windll.dwmapi
+    except OSError:
+        dwmapi = None
+
+    covered = []
+    class_name = ctypes.create_unicode_buffer(64)
+    WNDENUMPROC = ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+
+    def callback(other, data):
+        if other == top_level:
+            return False
+        if not user32.IsWindowVisible(other) or user32.IsIconic(other):
+            return True
+        if user32.GetWindowLongW(other, GWL_EXSTYLE) & (WS_EX_TRANSPARENT | WS_EX_TOOLWINDOW):
+            return True
+        user32.GetClassNameW(other, class_name, len(class_name))
+        if class_name.value in SHELL_WINDOW_CLASSES:
+            return True
+        if dwmapi is not None:
+            # 其他虚拟桌面上的窗口和挂起的UWP应用是"隐身"的，实际不可见
+            cloaked = wintypes.DWORD()
+            if dwmapi.DwmGetWindowAttribute(other, DWMWA_CLOAKED, ctypes.byref(cloaked), ctypes.sizeof(cloaked)) == 0 \
+                    and cloaked.value:
+                return True
+        rect = wintypes.RECT()
+        if not user32.GetWindowRect(other, ctypes.byref(rect)):
+            return True
+        if rect.left <= work.left and rect.top <= work.top and rect.right >= work.right and rect.bottom >= work.bottom:
+            covered.append(other)
+            return False  # 找到一个即可停止枚举
+        return True
+
+    user32.EnumWindows(WNDENUMPROC(callback), 0)
+    return bool(covered)
+
+
+def _logind_session_id():
+    """当前会话的systemd-logind会话ID，只查找一次；无法查询时为空字符串"""
+    global _logind_session
+    if _logind_session is None:
+        session = os.environ.get("XDG_SESSION_ID")
+        _logind_session = session if session and shutil.which("loginctl") else ""
+    return _logind_session
+
+
+def _loginctl_session():
+    """
+    systemd-logind会话的锁屏和空闲提示（由桌面环境设置）。
+    每次查询都要启动一个loginctl进程，所以结果缓存LOGIND_POLL_INTERVAL秒；空闲时间由IdleSinceHint推算，缓存期间仍然准确。
+    """
+    global _logind_hints, _logind_checked_at
+    now = time.monotonic()
+    if _logind_checked_at is not None and now - _logind_checked_at < LOGIND_POLL_INTERVAL:
+        return _logind_hints
+    _logind_checked_at = now
+    session = _logind_session_id()
+    if not session:
+        _logind_hints = {}
+        return _logind_hints
+    output = subprocess.run(["loginctl", "show-session", session, "-p", "LockedHint", "-p", "IdleHint",
+                             "-p", "IdleSinceHint"], capture_output=True, text=True, timeout=2).stdout
+    _logind_hints = dict(line.split("=", 1) for line in output.splitlines() if "=" in line)
+    return _logind_hints
+
+
+def query_desktop_state(hwnd=None):
+    """
+    检测锁屏、空闲时间和窗口是否被完全遮挡。
+    Windows上三项都可检测（遮挡检测需要窗口句柄）；Linux上通过loginctl检测锁屏和空闲（最多每LOGIND_POLL_INTERVAL秒一次）；其他情况返回None。
+    """
+    state = DesktopState()
+    try:
+        if sys.platform == "win32":
+            state.locked = _windows_locked()
+            state.idle_seconds = _windows_idle_seconds()
+            if hwnd:
+                state.covered = _windows_covered(hwnd)
+        elif sys.platform.startswith("linux"):
+            session = _loginctl_session()
+            if "LockedHint" in session:
+                state.locked = session["LockedHint"] == "yes"
+            if "IdleHint" in session:
+                idle_since = int(session.get("IdleSinceHint") or 0)
+                if session["IdleHint"] == "yes" and idle_since:
+                    state.idle_seconds = max(0.0, time.time() - idle_since / 1e6)
+                else:
+                    state.idle_seconds = 0.0
+    except Exception as e:
+        logger.debug(f"检测桌面状态失败: {e}")
+    return state
@@ -0,0 +1,284 @@
+"""
+Scripts injected into the live wallpaper page
+Switches to the wind view, hides the page UI with one stylesheet and keeps the map fullscreen through a MutationObserver instead of periodic DOM scans
+"""
+
+# 隐藏的页面元素：写成一张样式表，之后新加入的元素也会自动隐藏，不需要再扫描DOM
+HIDDEN_SELECTORS = [
+    'header', '.header', '.navbar', '.nav-bar', '.top-bar',
+    'footer', '.footer', '.bottom-bar',
+    '.sidebar', '.sidebar-left', '.sidebar-right',
+    '.panel', '.control-panel', '.layer-panel',
+    '.logo', '.brand', '.title', '.app-title',
+    '.toolbar', '.toolbar-top', '.toolbar-bottom',
+    '.menu', '.menu-bar', '.nav-menu',
+    '.search', '.search-box', '.search-bar',
+    '.zoom-control', '.map-controls', '.leaflet-control',
+    '.legend', '.map-legend', '.color-legend',
+    '.info-box', '.info-panel', '.popup',
+    '.attribution', '.copyright', '.credits',
+    'button', '.btn', '.button', 'input', 'select', '.control',
+    '.top', '.top-container', '.header-container',
+    'h1', 'h2', 'h3', '.heading', 'img[src*="logo"]',
+]
+
+# 按顺序查找地图容器
+MAP_SELECTORS = [
+    '.map-container', '.map', '#map',
+    '.leaflet-container', '.mapContainer',
+    'div[class*="map"]', 'div[id*="map"]',
+    '.amap-container', '.bmap-container', '.tmap-container',
+]
+
+# 可能是"风流场"切换项的元素（只检查这些元素的文字，不遍历整个DOM）
+WIND_SWITCH_SELECTORS = [
+    '.menu li', '.nav-item', '.menu-item',
+    '.toolbar button', '.toolbar-item',
+    '.layer-control li', '.layer-panel li', '.sidebar-left li', '.layer-item',
+    'button', '[role="button"]',
+]
+
+
+def _js_list(items):
+    return "[" + ", ".join("'" + item.replace("'", "\\'") + "'" for item in items) + "]"
+
+
+# 页面加载完成后注入一次：切换到风流场视图，2秒后隐藏界面并全屏显示地图，
+# 之后只在DOM变化时检查地图容器是否仍然全屏。耗时记录在 window.__windWallpaperStats 中
+SETUP_JS = """
+(function() {
+    var HIDDEN_SELECTORS = %(hidden)s;
+    var MAP_SELECTORS = %(maps)s;
+    var WIND_SWITCH_SELECTORS = %(switches)s;
+    var WIND_TEXT = /风|流场/;
+
+    var stats = window.__windWallpaperStats = {
+        setupMs: 0, observerCalls: 0, observerMs: 0, fullscreenRuns: 0, clicked: null
+    };
+    if (window.__windWallpaperObserver) {
+        window.__windWallpaperObserver.disconnect();
+    }
+    var mapContainer = null;
+
+    // 切换到风流场视图：只检查候选元素的文字
+    function switchToWindFlow() {
+        var candidates = document.querySelectorAll(WIND_SWITCH_SELECTORS.join(','));
+        for (var i = 0; i < candidates.length; i++) {
+            var text = candidates[i].textContent;
+            if (text && text.length < 40 && WIND_TEXT.test(text)) {
+                candidates[i].click();
+                return text.trim();
+            }
+        }
+        // 根据截图，风流场按钮可能是底部工具栏的第二个按钮
+        var toolbarButtons = document.querySelectorAll('.toolbar button, .toolbar-item');
+        if (toolbarButtons.length >= 2) {
+            toolbarButtons[1].click();
+            return 'toolbar[1]';
+        }
+        return null;
+    }
+
+    // 隐藏所有UI元素：插入一张样式表
+    function hideAllUIElements() {
+        if (document.getElementById('wind-wallpaper-hide')) {
+            return;
+        }
+        var style = document.createElement('style');
+        style.id = 'wind-wallpaper-hide';
+        style.textContent = HIDDEN_SELECTORS.join(',\\n') + ' { display: none !important; }';
+        (document.head || document.documentElement).appendChild(style);
+    }
+
+    function findMapContainer() {
+        for (var i = 0; i < MAP_SELECTORS.length; i++) {
+            var container = document.querySelector(MAP_SELECTORS[i]);
+            if (container) {
+                return container;
+            }
+        }
+        // 找不到地图容器时使用面积最大的div（只在初始化或容器被替换时执行）
+        var allDivs = document.querySelectorAll('div');
+        var largestDiv = null;
+        var largestArea = 0;
+        for (var i = 0; i < allDivs.length; i++) {
+            var rect = allDivs[i].getBoundingClientRect();
+            if (rect.width * rect.height > largestArea) {
+                largestArea = rect.width * rect.height;
+                largestDiv = allDivs[i];
+            }
+        }
+        return largestDiv;
+    }
+
+    // 使地图全屏显示
+    function makeMapFullscreen() {
+        stats.fullscreenRuns++;
+        mapContainer = findMapContainer();
+        if (!mapContainer) {
+            console.log('未找到地图容器');
+            return false;
+        }
+        mapContainer.style.position = 'fixed';
+        mapContainer.style.top = '0';
+        mapContainer.style.left = '0';
+        mapContainer.style.width = '100vw';
+        mapContainer.style.height = '100vh';
+        mapContainer.style.zIndex = '9999';
+        document.body.style.backgroundColor = 'black';
+        document.body.style.margin = '0';
+        document.body.style.padding = '0';
+        document.body.style.overflow = 'hidden';
+        observer.observe(mapContainer, {attributes: true, attributeFilter: ['style']});
+        return true;
+    }
+
+    function isFullscreen() {
+        return mapContainer && mapContainer.isConnected && mapContainer.style.position === 'fixed';
+    }
+
+    // DOM变化时最多每帧检查一次
+    var pending = false;
+    var observer = new MutationObserver(function() {
+        if (pending) {
+            return;
+        }
+        pending = true;
+        requestAnimationFrame(function() {
+            pending = false;
+            var start = performance.now();
+            stats.observerCalls++;
+            hideAllUIElements();
+            if (!isFullscreen()) {
+                makeMapFullscreen();
+            }
+            stats.observerMs += performance.now() - start;
+        });
+    });
+    window.__windWallpaperObserver = observer;
+
+    var start = performance.now();
+    stats.clicked = switchToWindFlow();
+    stats.setupMs += performance.now() - start;
+
+    // 等待一段时间，让风流场加载
+    setTimeout(function() {
+        var start = performance.now();
+        hideAllUIElements();
+        makeMapFullscreen();
+        observer.observe(document.body, {childList: true, subtree: true});
+        stats.setupMs += performance.now() - start;
+        console.log('处理完成');
+    }, 2000);
+
+    return {clicked: stats.clicked, setupMs: stats.setupMs};
+})();
+""" % {
+    "hidden": _js_list(HIDDEN_SELECTORS),
+    "maps": _js_list(MAP_SELECTORS),
+    "switches": _js_list(WIND_SWITCH_SELECTORS),
+}
+
+# 页面状态检查：只检查可能包含风场信息的元素，并返回注入脚本的耗时统计
+STATUS_JS = """
+(function() {
+    var mapContainer = document.querySelector('.mapContainer') ||
+                       document.querySelector('div[class*="map"]') ||
+                       document.querySelector('div[id*="map"]');
+
+    var windElements = [];
+    var candidates = document.querySelectorAll('li, a, label, [class*="wind"], [id*="wind"], [class*="status"], [id*="status"]');
+    for (var i = 0; i < candidates.length && windElements.length < 10; i++) {
+        var text = candidates[i].textContent;
+        if (text && text.length < 80 && /风流场|风向|风速/.test(text)) {
+            windElements.push({
+                tag: candidates[i].tagName,
+                text: text.trim(),
+                visible: candidates[i].offsetParent !== null
+            });
+        }
+    }
+
+    return {
+        url: window.location.href,
+        title: document.title,
+        hasMapContainer: mapContainer !== null,
+        windElements: windElements,
+        injectedStats: window.__windWallpaperStats || null
+    };
+})();
+"""
+
+# 帧率限制：在页面脚本运行之前替换requestAnimationFrame，回调最多以fps的频率执行，
+# 两帧之间用setTimeout等待而不是每次垂直同步都唤醒。fps为0时不限制；paused时保留回调直到恢复
+FRAME_GOVERNOR_JS = """
+(function(fps) {
+    if (window.__windFrameGovernor) {
+        return;
+    }
+    var nativeRequest = window.requestAnimationFrame.bind(window);
+    var callbacks = new Map();
+    var nextId = 1;
+    var scheduled = false;
+    var last = 0;
+    var governor = window.__windFrameGovernor = {fps: fps, paused: false, frames: 0};
+
+    function schedule() {
+        if (scheduled || governor.paused || callbacks.size === 0) {
+            return;
+        }
+        scheduled = true;
+        var wait = governor.fps > 0 ? last + 1000 / governor.fps - performance.now() : 0;
+        if (wait > 4) {
+            setTimeout(function() { nativeRequest(run); }, wait);
+        } else {
+            nativeRequest(run);
+        }
+    }
+
+    function run(now) {
+        scheduled = false;
+        if (governor.paused) {
+            return;
+        }
+        last = now;
+        governor.frames++;
+        var pending = callbacks;
+        callbacks = new Map();
+        pending.forEach(function(callback) {
+            try {
+                callback(now);
+            } catch (e) {
+                console.error(e);
+            }
+        });
+        schedule();
+    }
+
+    window.requestAnimationFrame = function(callback) {
+        var id = nextId++;
+        callbacks.set(id, callback);
+        schedule();
+        return id;
+    };
+    window.cancelAnimationFrame = function(id) {
+        callbacks.delete(id);
+    };
+    governor.set = function(fps, paused) {
+        governor.fps = fps;
+        governor.paused = paused;
+        schedule();
+        return governor.frames;
+    };
+})(%d);
+"""
+
+
+def frame_governor_js(fps):
+    return FRAME_GOVERNOR_JS % int(fps)
+
+
+def set_frame_rate_js(fps, paused=False):
+    """运行时修改帧率限制，返回页面启动以来执行的动画帧数"""
+    return ("window.__windFrameGovernor ? window.__windFrameGovernor.set(%d, %s) : null"
+            % (int(fps), "true" if paused else "false"))
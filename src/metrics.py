@@ -0,0 +1,216 @@
+"""
+Update cycle metrics
+Records timing spans for each update stage as one JSON line per cycle and summarizes metrics files
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 当前线程正在记录的周期和嵌套的span名称
+_local = threading.local()
+
+
+class _NullCycle:
+    """未启用指标时使用的空记录，所有操作都不做任何事"""
+
+    enabled = False
+
+    @contextmanager
+    def activate(self):
+        yield self
+
+    @contextmanager
+    def span(self, name):
+        yield
+
+    def annotate(self, **fields):
+        pass
+
+    def finish(self, status):
+        pass
+
+
+NULL_CYCLE = _NullCycle()
+
+
+class CycleRecord:
+    """一次更新周期的记录：各阶段的span和附加字段"""
+
+    enabled = True
+
+    def __init__(self, recorder, fields):
+        self.recorder = recorder
+        self.fields = dict(fields)
+        self.spans = []
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        """在当前线程中把本记录设为活动记录，供 span() 和 annotate() 使用"""
+        previous = getattr(_local, "cycle", None), getattr(_local, "path", ())
+        _local.cycle, _local.path = self, ()
+        try:
+            yield self
+        finally:
+            _local.cycle, _local.path = previous
+
+    @contextmanager
+    def span(self, name):
+        """记录一段耗时；嵌套的span名称用"/"连接，例如 acquire/page_load"""
+        active = getattr(_local, "cycle", None) is self
+        parent = _local.path if active else ()
+        path = parent + (name,)
+        if active:
+            _local.path = path
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if active:
+                _local.path = parent
+            with self._lock:
+                self.spans.append({"name": "/".join(path), "start": round(start - self._start, 4),
+                                   "seconds": round(end - start, 4)})
+
+    def annotate(self, **fields):
+        with self._lock:
+            self.fields.update(fields)
+
+    def finish(self, status):
+        record = {
+            "time": self.started_at.isoformat(timespec="seconds"),
+            "status": status,
+            "total_seconds": round(time.perf_counter() - self._start, 4),
+            "spans": sorted(self.spans, key=lambda span: span["start"]),
+        }
+        record.update(self.fields)
+        self.recorder.write(record)
+
+
+class MetricsRecorder:
+    """把每个更新周期写成JSON Lines文件中的一行；path为None时不记录"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def start_cycle(self, **fields):
+        if not self.enabled:
+            return NULL_CYCLE
+        return CycleRecord(self, fields)
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"写入指标文件失败: {e}")
+
+
+def current_cycle():
+    return getattr(_local, "cycle", None) or NULL_CYCLE
+
+
+def span(name):
+    """在当前线程的活动记录中记录一段耗时（没有活动记录时不做任何事）"""
+    return current_cycle().span(name)
+
+
+def annotate(**fields):
+    current_cycle().annotate(**fields)
+
+
+# 统计
+
+def percentile(values, fraction):
+    """线性插值的百分位数，values须已排序"""
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def load_records(path, last=None):
+    records = []
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"跳过无法解析的指标记录: 第{number}行")
+    return records[-last:] if last else records
+
+
+def summarize(records):
+    """按span名称汇总：次数、p50/p90/p99/最大值，以及后半段相对前半段的平均耗时变化"""
+    series = {"total": [record.get("total_seconds", 0.0) for record in records]}
+    for record in records:
+        totals = {}
+        for item in record.get("spans", []):
+            totals[item["name"]] = totals.get(item["name"], 0.0) + item["seconds"]
+        for name, seconds in totals.items():
+            series.setdefault(name, []).append(seconds)
+
+    rows = []
+    for name, values in series.items():
+        ordered = sorted(values)
+        half = len(values) // 2
+        trend = None
+        if half:
+            earlier = sum(values[:half]) / half
+            later = sum(values[half:]) / (len(values) - half)
+            trend = (later - earlier) / earlier if earlier else None
+        rows.append({
+            "name": name,
+            "count": len(values),
+            "p50": percentile(ordered, 0.5),
+            "p90": percentile(ordered, 0.9),
+            "p99": percentile(ordered, 0.99),
+            "max": ordered[-1],
+            "trend": trend,
+        })
+    return rows
+
+
+def print_stats(path, last=None):
+    """打印指标文件的统计信息，返回进程退出码"""
+    if not os.path.exists(path):
+        print(f"指标文件不存在: {path}")
+        return 1
+    records = load_records(path, last)
+    if not records:
+        print(f"指标文件中没有记录: {path}")
+        return 1
+
+    statuses = {}
+    for record in records:
+        statuses[record.get("status", "?")] = statuses.get(record.get("status", "?"), 0) + 1
+    print(f"指标文件: {os.path.abspath(path)}")
+    print(f"周期数: {len(records)} ({records[0].get('time')} ~ {records[-1].get('time')})")
+    print("状态: " + ", ".join(f"{status}={count}" for status, count in sorted(statuses.items())))
+    print()
+    print(f"{'阶段':<32}{'次数':>6}{'p50(s)':>10}{'p90(s)':>10}{'p99(s)':>10}{'最大(s)':>10}{'趋势':>10}")
+    for row in summarize(records):
+        trend = f"{row['trend'] * 100:+.0f}%" if row["trend"] is not None else "-"
+        print(f"{row['name']:<32}{row['count']:>6}{row['p50']:>10.3f}{row['p90']:>10.3f}"
+              f"{row['p99']:>10.3f}{row['max']:>10.3f}{trend:>10}")
+    return 0
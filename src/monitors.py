@@ -0,0 +1,176 @@
+"""
+Output geometry discovery
+Finds the connected monitors (or takes a command-line override) and derives per-monitor wallpapers from one master image
+"""
+import ctypes
+import logging
+import re
+import subprocess
+import sys
+from PIL import Image
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 无法检测显示器时使用的默认尺寸
+DEFAULT_SIZE = (1920, 1080)
+# 缩小时先用reduce()按整数倍快速降采样，再做最后一次精确缩放
+REDUCING_GAP = 2.0
+
+
+class Monitor:
+    """一个显示器在虚拟桌面中的位置和尺寸"""
+
+    def __init__(self, x, y, width, height, primary=False, name=None):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.primary = primary
+        self.name = name
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def __repr__(self):
+        flag = ", 主显示器" if self.primary else ""
+        return f"Monitor({self.name or '?'}: {self.width}x{self.height}+{self.x}+{self.y}{flag})"
+
+
+def parse_geometry(text):
+    """解析命令行指定的几何，例如 "3840x2160" 或 "2560x1440+0+0,1920x1080+2560+0"；第一个为主显示器"""
+    monitors = []
+    next_x = 0
+    for index, part in enumerate(p.strip() for p in text.split(",") if p.strip()):
+        match = re.fullmatch(r"(\d+)x(\d+)(?:\+(-?\d+)\+(-?\d+))?", part)
+        if not match:
+            raise ValueError(f"无法解析显示器几何: {part}")
+        width, height = int(match.group(1)), int(match.group(2))
+        if match.group(3) is not None:
+            x, y = int(match.group(3)), int(match.group(4))
+        else:
+            # 未给出位置时从左到右依次排列
+            x, y = next_x, 0
+        next_x = max(next_x, x + width)
+        monitors.append(Monitor(x, y, width, height, primary=(index == 0), name=f"override{index + 1}"))
+    if not monitors:
+        raise ValueError("没有指定任何显示器")
+    return monitors
+
+
+def _discover_windows():
+    from ctypes import wintypes
+
+    class MONITORINFO(ctypes.Structure):
+        _fields_ = [("cbSize", wintypes.DWORD), ("rcMonitor", wintypes.RECT),
+                    ("rcWork", wintypes.RECT), ("dwFlags", wintypes.DWORD)]
+
+    user32 = ctypes.windll.user32
+    try:
+        # 获取物理像素尺寸，而不是DPI缩放后的尺寸
+        user32.SetProcessDPIAware()
+    except Exception:
+        pass
+
+    monitors = []
+    MONITORENUMPROC = ctypes.WINFUNCTYPE(ctypes.c_int, wintypes.HMONITOR, wintypes.HDC,
+                                         ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+
+    def callback(hmonitor, hdc, rect, data):
+        info = MONITORINFO()
+        info.cbSize = ctypes.sizeof(MONITORINFO)
+        if user32.GetMonitorInfoW(hmonitor, ctypes.byref(info)):
+            r = info.rcMonitor
+            monitors.append(Monitor(r.left, r.top, r.right - r.left, r.bottom - r.top,
+                                    primary=bool(info.dwFlags & 1), name=f"display{len(monitors) + 1}"))
+        return 1
+
+    user32.EnumDisplayMonitors(None, None, MONITORENUMPROC(callback), 0)
+    return monitors
+
+
+def _discover_xrandr():
+    output = subprocess.run(["xrandr", "--query"], capture_output=True, text=True, timeout=5).stdout
+    monitors = []
+    for line in output.splitlines():
+        match = re.match(r"^(\S+) connected (primary )?(\d+)x(\d+)\+(\d+)\+(\d+)", line)
+        if match:
+            monitors.append(Monitor(int(match.group(5)), int(match.group(6)), int(match.group(3)), int(match.group(4)),
+                                    primary=bool(match.group(2)), name=match.group(1)))
+    return monitors
+
+
+def discover_monitors():
+    """检测已连接的显示器，失败时返回默认尺寸的单个显示器"""
+    try:
+        if sys.platform == "win32":
+            monitors = _discover_windows()
+        else:
+            monitors = _discover_xrandr()
+    except Exception as e:
+        logger.warning(f"检测显示器失败: {e}")
+        monitors = []
+
+    if not monitors:
+        logger.info(f"未检测到显示器，使用默认尺寸 {DEFAULT_SIZE[0]}x{DEFAULT_SIZE[1]}")
+        return [Monitor(0, 0, DEFAULT_SIZE[0], DEFAULT_SIZE[1], primary=True, name="default")]
+    if not any(m.primary for m in monitors):
+        monitors[0].primary = True
+    logger.info(f"检测到显示器: {monitors}")
+    return monitors
+
+
+def derive_output(master, size):
+    """按目标宽高比居中裁剪主图像，再用快速降采样缩放到目标尺寸"""
+    target_w, target_h = size
+    if master.size == (target_w, target_h):
+        return master
+    scale = max(target_w / master.width, target_h / master.height)
+    crop_w = min(master.width, round(target_w / scale))
+    crop_h = min(master.height, round(target_h / scale))
+    left = (master.width - crop_w) // 2
+    top = (master.height - crop_h) // 2
+    box = (left, top, left + crop_w, top + crop_h)
+    return master.resize((target_w, target_h), Image.BICUBIC, box=box, reducing_gap=REDUCING_GAP)
+
+
+class OutputLayout:
+    """所有输出显示器的布局：主图像按最大尺寸渲染一次，各显示器的壁纸由它缩小得到"""
+
+    def __init__(self, monitors):
+        self.monitors = monitors
+        self.master_size = (max(m.width for m in monitors), max(m.height for m in monitors))
+        left = min(m.x for m in monitors)
+        top = min(m.y for m in monitors)
+        right = max(m.x + m.width for m in monitors)
+        bottom = max(m.y + m.height for m in monitors)
+        self.origin = (left, top)
+        self.bounds_size = (right - left, bottom - top)
+
+    @property
+    def is_span(self):
+        """多个显示器时输出一张横跨整个虚拟桌面的壁纸"""
+        return len(self.monitors) > 1
+
+    @property
+    def primary(self):
+        return next(m for m in self.monitors if m.primary)
+
+    def offset_of(self, monitor):
+        return monitor.x - self.origin[0], monitor.y - self.origin[1]
+
+    def compose(self, master):
+        """由主图像生成最终壁纸：单显示器时直接缩放，多显示器时拼成虚拟桌面大小的图像"""
+        if not self.is_span:
+            return derive_output(master, self.monitors[0].size)
+        canvas = Image.new("RGB", self.bounds_size, "black")
+        derived = {}
+        for monitor in self.monitors:
+            # 相同尺寸的显示器共享一次缩放结果
+            if monitor.size not in derived:
+                derived[monitor.size] = derive_output(master, monitor.size)
+            canvas.paste(derived[monitor.size], self.offset_of(monitor))
+        return canvas
+
+    def __repr__(self):
+        return f"OutputLayout(主图像={self.master_size[0]}x{self.master_size[1]}, 显示器={len(self.monitors)})"
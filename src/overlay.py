@@ -0,0 +1,94 @@
+"""
+Wallpaper text overlay
+Loads fonts once and caches the static attribution layer per resolution; only the timestamp is redrawn each cycle
+"""
+import logging
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 依次尝试的字体文件
+FONT_CANDIDATES = ["arial.ttf", "C:\\Windows\\Fonts\\Arial.ttf"]
+FONT_SIZE = 24  # 1080像素高度下的字号，其他分辨率按比例缩放
+REFERENCE_HEIGHT = 1080
+MARGIN = 20  # 文字距显示器左上角的距离
+LINE_SPACING = 30  # 时间戳与来源信息之间的行距
+SOURCE_TEXT = "Data Source: Earth Nullschool (earth.nullschool.net)"
+# 用于预留时间戳区域宽度的样例文本
+TIMESTAMP_SAMPLE = "更新时间: 0000-00-00 00:00"
+
+# 字号 -> 字体，每个字号只加载一次
+_font_cache = {}
+
+
+def load_font(size=FONT_SIZE):
+    """按FONT_CANDIDATES加载字体，全部失败时使用默认字体；结果按字号缓存"""
+    font = _font_cache.get(size)
+    if font is not None:
+        return font
+    for candidate in FONT_CANDIDATES:
+        try:
+            font = ImageFont.truetype(candidate, size)
+            logger.info(f"使用字体: {candidate} ({size}px)")
+            break
+        except IOError:
+            logger.debug(f"字体不可用: {candidate}")
+    if font is None:
+        logger.warning("无法加载Arial字体，使用默认字体")
+        try:
+            font = ImageFont.load_default(size)
+        except TypeError:
+            # 旧版Pillow的默认字体不支持指定字号
+            font = ImageFont.load_default()
+    _font_cache[size] = font
+    return font
+
+
+class TextOverlay:
+    """时间戳和来源信息图层：来源信息按分辨率缓存为RGBA图块，每次只重绘时间戳区域"""
+
+    def __init__(self, source_text=SOURCE_TEXT, fill=(0, 0, 0, 255)):
+        self.source_text = source_text
+        self.fill = fill
+        self._tiles = {}  # 缩放后的字号 -> (静态图块, 时间戳区域)
+
+    def _scaled(self, value, height):
+        return max(1, round(value * height / REFERENCE_HEIGHT))
+
+    def _static_tile(self, height):
+        font_size = self._scaled(FONT_SIZE, height)
+        cached = self._tiles.get(font_size)
+        if cached is not None:
+            return cached
+
+        font = load_font(font_size)
+        line_spacing = self._scaled(LINE_SPACING, height)
+        measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+        source_box = measure.textbbox((0, line_spacing), self.source_text, font=font)
+        timestamp_box = measure.textbbox((0, 0), TIMESTAMP_SAMPLE, font=font)
+        # 时间戳区域额外预留一些宽度，避免比例字体下文本被截断
+        timestamp_width = timestamp_box[2] + font_size * 2
+        width = max(source_box[2], timestamp_width)
+
+        tile = Image.new("RGBA", (width, source_box[3]), (0, 0, 0, 0))
+        ImageDraw.Draw(tile).text((0, line_spacing), self.source_text, fill=self.fill, font=font)
+        timestamp_region = (0, 0, timestamp_width, line_spacing)
+        self._tiles[font_size] = (tile, timestamp_region)
+        logger.debug(f"已缓存来源信息图层: 字号={font_size}, 尺寸={tile.width}x{tile.height}")
+        return tile, timestamp_region
+
+    def render(self, timestamp_text, height=REFERENCE_HEIGHT):
+        """返回包含时间戳和来源信息的RGBA图块"""
+        static_tile, timestamp_region = self._static_tile(height)
+        tile = static_tile.copy()
+        tile.paste((0, 0, 0, 0), timestamp_region)
+        font = load_font(self._scaled(FONT_SIZE, height))
+        ImageDraw.Draw(tile).text((0, 0), timestamp_text, fill=self.fill, font=font)
+        return tile
+
+    def apply(self, image, origin, timestamp_text, height=REFERENCE_HEIGHT):
+        """把文字图层一次性叠加到image上，origin为目标显示器左上角在图像中的位置"""
+        tile = self.render(timestamp_text, height)
+        margin = self._scaled(MARGIN, height)
+        image.paste(tile, (origin[0] + margin, origin[1] + margin), tile)
+        return image
@@ -0,0 +1,153 @@
+"""
+Vectorized particle advection renderer
+Draws Earth Nullschool style wind trails from a u/v grid with NumPy, without a browser
+"""
+import logging
+import numpy as np
+from PIL import Image
+import wind_data
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 渲染参数（以1920像素宽度为基准，其他分辨率按比例缩放）
+PARTICLE_COUNT = 30000  # 粒子数量
+PARTICLE_STEPS = 48  # 每帧的平流步数，决定拖尾长度
+PARTICLE_MAX_AGE = 60  # 粒子最大寿命（步），超过后重新随机播种
+TRAIL_FADE = 0.93  # 每步拖尾的衰减系数
+VELOCITY_SCALE = 0.12  # 每步位移（像素）= 风速(m/s) * VELOCITY_SCALE
+BACKGROUND_DIM = 0.55  # 风速底图的亮度
+BACKGROUND_REDUCE = 4  # 风速底图按此倍数降采样计算后放大
+
+
+class ParticleRenderer:
+    """
+    在屏幕空间中平流粒子，并把拖尾累积到浮点缓冲区。
+    默认使用等距圆柱投影；传入projection.ProjectionLUT时按查找表的投影视图渲染。
+    缓冲区记录每个像素最后一次被粒子经过的步数，输出时一次性换算成 fade ** (经过的步数)，
+    与逐步衰减整张缓冲区的结果相同，但每步的开销只与粒子数有关。
+    """
+
+    def __init__(self, grid, width, height, particle_count=PARTICLE_COUNT, max_age=PARTICLE_MAX_AGE,
+                 fade=TRAIL_FADE, velocity_scale=VELOCITY_SCALE, seed=None, lut=None):
+        self.grid = grid
+        self.lut = lut
+        self.width = width
+        self.height = height
+        self.particle_count = particle_count
+        self.max_age = max_age
+        self.fade = np.float32(fade)
+        self.pixel_scale = velocity_scale * width / 1920.0
+        self.rng = np.random.default_rng(seed)
+        self.step_count = 0
+        self.stamps = np.full((height, width), -np.inf, dtype=np.float32)
+        self.x = np.empty(particle_count, dtype=np.float32)
+        self.y = np.empty(particle_count, dtype=np.float32)
+        self.age = self.rng.integers(0, max_age, particle_count)
+        if lut is not None:
+            # 屏幕空间的速度场只依赖网格和查找表，预先算好，之后每步只需按像素取值
+            degrees_per_step = velocity_scale * 360.0 / 1920.0
+            self.field_x, self.field_y = lut.screen_velocity(grid, degrees_per_step)
+            self.seed_pixels = np.flatnonzero(lut.mask)
+        self._reseed(np.arange(particle_count))
+
+    def _reseed(self, index):
+        if self.lut is not None:
+            # 只在地图范围内播种
+            pixels = self.seed_pixels[self.rng.integers(0, len(self.seed_pixels), len(index))]
+            self.x[index] = pixels % self.width + self.rng.random(len(index), dtype=np.float32)
+            self.y[index] = pixels // self.width + self.rng.random(len(index), dtype=np.float32)
+        else:
+            self.x[index] = self.rng.random(len(index), dtype=np.float32) * self.width
+            self.y[index] = self.rng.random(len(index), dtype=np.float32) * self.height
+        self.age[index] = 0
+
+    def _screen_to_lonlat(self, x, y):
+        lon = -180 + x * (360.0 / self.width)
+        lat = 90 - y * (180.0 / self.height)
+        return lon, lat
+
+    def _deposit(self, x, y):
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        flat = y[inside].astype(np.intp) * self.width + x[inside].astype(np.intp)
+        self.stamps.ravel()[flat] = self.step_count
+
+    def _pixel_index(self, x, y):
+        xi = np.clip(x.astype(np.intp), 0, self.width - 1)
+        yi = np.clip(y.astype(np.intp), 0, self.height - 1)
+        return yi * self.width + xi
+
+    def _velocity(self):
+        """当前位置处每步的屏幕位移"""
+        if self.lut is not None:
+            index = self._pixel_index(self.x, self.y)
+            return self.field_x.ravel()[index], self.field_y.ravel()[index]
+        u, v = self.grid.interpolate(*self._screen_to_lonlat(self.x, self.y))
+        return u * self.pixel_scale, -v * self.pixel_scale
+
+    def step(self):
+        """所有粒子前进一步"""
+        dx, dy = self._velocity()
+
+        self.step_count += 1
+        # 在中点和终点各落一次笔，使快速粒子的拖尾保持连续
+        self._deposit(self.x + dx * 0.5, self.y + dy * 0.5)
+        self.x += dx
+        self.y += dy
+        self._deposit(self.x, self.y)
+
+        self.age += 1
+        expired = (self.age > self.max_age) | (self.x < 0) | (self.x >= self.width) | (self.y < 0) | (self.y >= self.height)
+        if self.lut is not None:
+            expired |= ~self.lut.mask.ravel()[self._pixel_index(self.x, self.y)]
+        if expired.any():
+            self._reseed(np.flatnonzero(expired))
+
+    def trails(self):
+        """当前的拖尾强度（0~1）"""
+        return np.power(self.fade, self.step_count - self.stamps)
+
+    def render(self, steps=PARTICLE_STEPS, background=True):
+        """推进steps步并输出Pillow图像"""
+        for _ in range(steps):
+            self.step()
+        return self._compose(self._background() if background else None)
+
+    def _background(self):
+        if self.lut is not None:
+            speed = np.hypot(*self.lut.sample_wind(self.grid))
+            base = wind_data.speed_to_rgb(speed).astype(np.float32) * BACKGROUND_DIM
+            base[~np.asarray(self.lut.mask)] = 0
+            return base
+        # 风速场本身很平滑，低分辨率计算后再放大即可
+        base = np.asarray(wind_data.render_speed_map(self.grid, self.width, self.height, reduce=BACKGROUND_REDUCE),
+                          dtype=np.float32)
+        base *= BACKGROUND_DIM
+        return base
+
+    def _compose(self, base):
+        alpha = self.trails()[..., np.newaxis]
+        if base is None:
+            base = np.zeros((self.height, self.width, 3), dtype=np.float32)
+        frame = base * (1.0 - alpha) + 255.0 * alpha
+        return Image.fromarray(frame.astype(np.uint8), "RGB")
+
+    def frames(self, count, steps_per_frame=2, warmup_steps=PARTICLE_STEPS):
+        """
+        动画帧生成器：先推进warmup_steps步形成拖尾，之后每推进steps_per_frame步产生一帧。
+        风速底图只计算一次，每次只保留当前帧。
+        """
+        base = self._background()
+        for _ in range(warmup_steps):
+            self.step()
+        for _ in range(count):
+            for _ in range(steps_per_frame):
+                self.step()
+            yield self._compose(base)
+
+
+def render_wind_particles(grid, width, height, particle_count=PARTICLE_COUNT, steps=PARTICLE_STEPS, seed=None, lut=None):
+    """渲染一张静态粒子风流图"""
+    renderer = ParticleRenderer(grid, width, height, particle_count=particle_count, seed=seed, lut=lut)
+    image = renderer.render(steps)
+    logger.info(f"粒子风流图已渲染: 尺寸={width}x{height}, 粒子={particle_count}, 步数={steps}")
+    return image
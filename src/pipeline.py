@@ -0,0 +1,284 @@
+"""
+Wallpaper update pipeline
+Passes decoded images in memory through acquire, decode, composite, encode and apply stages connected by bounded queues; the main wallpaper and each extra view flow through as separate items
+"""
+import io
+import logging
+import os
+import queue
+import threading
+import time
+import traceback
+from PIL import Image
+from metrics import NULL_CYCLE
+
+logger = logging.getLogger("wind_wallpaper")
+
+
+class WindFrame:
+    """
+    一次更新中在各阶段之间传递的数据：时间戳、已解码的图像和数据标识。
+    主壁纸和每个额外视图各是一个WindFrame，额外视图的view不为None，只经过编码阶段。
+    """
+
+    def __init__(self, timestamp, image=None, content_key=None, source=None, view=None):
+        self.timestamp = timestamp
+        self.image = image  # PIL图像；数据未变化而跳过渲染时为None
+        self.content_key = content_key
+        self.source = source  # "browser" 或 "data"
+        self.png_bytes = None  # 尚未解码的截图，解码阶段之后为None
+        self.view = view  # 额外视图的截图（ViewCapture），主壁纸为None
+        self.animation_source = None  # 动画帧生成函数 f(帧数) -> 图像迭代器，不输出动画时不使用
+        self.wallpaper = None  # 合成后的壁纸图像
+        self.wallpaper_path = None  # 编码后壁纸文件的路径
+
+    @property
+    def label(self):
+        """流水线中的任务标签，也是指标span的前缀；主壁纸为None"""
+        return f"view:{self.view.view.name}" if self.view is not None else None
+
+    def __repr__(self):
+        if self.view is not None:
+            return f"WindFrame({self.timestamp}, {self.label})"
+        if self.image is not None:
+            size = f"{self.image.width}x{self.image.height}"
+        else:
+            size = "未解码" if self.png_bytes is not None else "无图像"
+        return f"WindFrame({self.timestamp}, {size}, source={self.source})"
+
+
+def decode_png(png_bytes):
+    """把浏览器返回的PNG字节解码为图像（整个流程中唯一的一次解码）"""
+    image = Image.open(io.BytesIO(png_bytes))
+    image.load()
+    return image
+
+
+def save_debug_image(image, path):
+    """调试输出：把中间图像写到磁盘，不影响主流程"""
+    try:
+        image.save(path)
+        logger.debug(f"调试图像已保存到: {os.path.abspath(path)}")
+    except Exception as e:
+        logger.warning(f"保存调试图像失败: {e}")
+
+
+class StageStats:
+    """单个阶段的计数器：处理次数、处理耗时、排队等待时间和队列深度"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.dropped = 0  # 返回None而终止的任务数
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = None
+        self.total_wait_seconds = 0.0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def record_enqueue(self, depth):
+        with self._lock:
+            self.queue_depth = depth
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def record(self, seconds, wait_seconds, depth, dropped=False, error=False):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.last_seconds = seconds
+            self.total_wait_seconds += wait_seconds
+            self.queue_depth = depth
+            self.dropped += dropped
+            self.errors += error
+
+    def summary(self):
+        if not self.count:
+            return f"{self.name}: 0次"
+        avg_ms = self.total_seconds / self.count * 1000
+        wait_ms = self.total_wait_seconds / self.count * 1000
+        return (f"{self.name}: {self.count}次, 平均 {avg_ms:.0f} ms, 最长 {self.max_seconds * 1000:.0f} ms, "
+                f"平均排队 {wait_ms:.0f} ms, 队列 {self.queue_depth}/{self.max_queue_depth}")
+
+
+class PipelineStage:
+    """
+    流水线中的一个阶段：func接收上一阶段的结果，返回None表示该任务到此结束。
+    fan_out为True时func是生成器，每产生一个结果就作为独立的任务送入下一阶段，
+    下游处理先产生的任务时，本阶段可以继续产生后面的任务。
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=2, fan_out=False):
+        self.name = name
+        self.func = func
+        self.workers = workers  # 大于1时该阶段内的完成顺序不再保证
+        self.queue_size = queue_size
+        self.fan_out = fan_out
+
+
+class PipelineRun:
+    """一次提交产生的所有任务（分流后可能有多个）；全部完成后wait()返回 {任务标签: 最后一个阶段的返回值}"""
+
+    def __init__(self, metrics=NULL_CYCLE):
+        self.metrics = metrics  # 本次提交的周期指标记录，各任务的阶段耗时以任务标签为前缀记录为span
+        self.results = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def _add(self):
+        with self._lock:
+            self._pending += 1
+
+    def _finish(self, label=None, result=None, record=True):
+        with self._lock:
+            if record:
+                self.results[label] = result
+            self._pending -= 1
+            if self._pending == 0:
+                self._done.set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.results
+
+
+class PipelineJob:
+    """流水线中的一个任务；label取自任务对象的label属性，区分同一次提交中分流出的任务"""
+
+    def __init__(self, item, run, label=None):
+        self.item = item
+        self.run = run
+        self.label = label
+        self.enqueued_at = None
+        run._add()
+
+
+_STOP = object()
+
+
+class StagedPipeline:
+    """
+    由有界队列和工作线程连接的多阶段流水线。分流阶段产生多个任务（主壁纸和各个额外视图）时各阶段并行，
+    吞吐量取决于最慢的阶段；各任务的阶段耗时以任务标签为前缀分别记录。
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.stats = [StageStats(stage.name) for stage in stages]
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._threads = None  # 每个阶段的工作线程列表
+
+    def start(self):
+        if self._threads is not None:
+            return self
+        self._threads = []
+        for index, stage in enumerate(self.stages):
+            threads = []
+            for worker in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(index,),
+                                          name=f"pipeline-{stage.name}-{worker + 1}", daemon=True)
+                thread.start()
+                threads.append(thread)
+            self._threads.append(threads)
+        logger.debug(f"流水线已启动: {' -> '.join(stage.name for stage in self.stages)}")
+        return self
+
+    def _put(self, index, job):
+        job.enqueued_at = time.perf_counter()
+        # 队列已满时阻塞，形成反压
+        self._queues[index].put(job)
+        self.stats[index].record_enqueue(self._queues[index].qsize())
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        stats = self.stats[index]
+        stage_queue = self._queues[index]
+        while True:
+            job = stage_queue.get()
+            if job is _STOP:
+                break
+            if stage.fan_out:
+                self._run_fan_out(index, job)
+                continue
+            start = time.perf_counter()
+            error = False
+            try:
+                with job.run.metrics.activate(), job.run.metrics.span(self._span_name(stage, job)):
+                    result = stage.func(job.item)
+            except Exception as e:
+                logger.error(f"流水线阶段 {stage.name} 出错 ({job.label or '主任务'}): {e}")
+                logger.error(traceback.format_exc())
+                result = None
+                error = True
+            seconds = time.perf_counter() - start
+            stats.record(seconds, start - job.enqueued_at, stage_queue.qsize(),
+                         dropped=(result is None and not error), error=error)
+
+            if result is None or index == len(self.stages) - 1:
+                job.run._finish(job.label, result)
+            else:
+                job.item = result
+                self._put(index + 1, job)
+
+    @staticmethod
+    def _span_name(stage, job):
+        return stage.name if job.label is None else f"{job.label}/{stage.name}"
+
+    def _run_fan_out(self, index, job):
+        """分流阶段：生成器产生的每个结果作为新任务送入下一阶段；耗时不包括等待下游队列的时间"""
+        stage = self.stages[index]
+        start = time.perf_counter()
+        blocked = 0.0
+        produced = 0
+        error = False
+        last = index == len(self.stages) - 1
+        try:
+            with job.run.metrics.activate(), job.run.metrics.span(self._span_name(stage, job)):
+                for result in stage.func(job.item):
+                    if result is None:
+                        continue
+                    produced += 1
+                    child = PipelineJob(result, job.run, getattr(result, "label", None))
+                    if last:
+                        job.run._finish(child.label, result)
+                        continue
+                    put_start = time.perf_counter()
+                    self._put(index + 1, child)
+                    blocked += time.perf_counter() - put_start
+        except Exception as e:
+            logger.error(f"流水线阶段 {stage.name} 出错: {e}")
+            logger.error(traceback.format_exc())
+            error = True
+        # 子任务都已登记，再结束分流前的任务，保证全部完成之前不会提前返回
+        job.run._finish(record=False)
+        self.stats[index].record(time.perf_counter() - start - blocked, start - job.enqueued_at,
+                                 self._queues[index].qsize(), dropped=(produced == 0 and not error), error=error)
+
+    def submit(self, item, metrics=NULL_CYCLE):
+        """提交一个任务，立即返回PipelineRun"""
+        self.start()
+        run = PipelineRun(metrics)
+        self._put(0, PipelineJob(item, run, getattr(item, "label", None)))
+        return run
+
+    def process(self, item, metrics=NULL_CYCLE):
+        """提交一个任务并等待它和分流出的所有任务完成，返回 {任务标签: 结果}"""
+        return self.submit(item, metrics).wait()
+
+    def summary(self):
+        return "; ".join(stats.summary() for stats in self.stats)
+
+    def close(self):
+        """按阶段顺序停止工作线程，已提交的任务会先处理完"""
+        if self._threads is None:
+            return
+        for index, threads in enumerate(self._threads):
+            for _ in threads:
+                self._queues[index].put(_STOP)
+            for thread in threads:
+                thread.join()
+        self._threads = None
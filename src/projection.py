@@ -0,0 +1,271 @@
+"""
+Screen-space projection lookup tables
+Precomputes pixel -> grid index / interpolation weights for a map view and caches them on disk as memory-mapped arrays
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import numpy as np
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 查找表缓存目录
+PROJECTION_CACHE_DIR = "projection_cache"
+# 查找表格式版本，格式变化时递增以使旧缓存失效
+LUT_VERSION = 1
+# 视图比例以该参考尺寸为准，其他输出尺寸按比例缩放
+REFERENCE_SIZE = (1920, 1080)
+# 计算局部畸变时使用的经纬度增量（度）
+DISTORTION_STEP = 0.01
+# 采样时每次从内存映射的查找表中展开的行数，限制临时数组的大小
+SAMPLE_CHUNK_ROWS = 128
+
+# Patterson圆柱投影系数（Šavrič et al. 2014，与d3-geo-projection一致）
+PATTERSON_K1 = 1.0148
+PATTERSON_K2 = 0.23185
+PATTERSON_K3 = -0.14499
+PATTERSON_K4 = 0.02406
+PATTERSON_YM = 1.790857183
+
+# 进程内缓存，同一视图的后续帧直接复用
+_lut_cache = {}
+
+
+class ViewSpec:
+    """地图视图：投影名称、中心经纬度（度）和d3比例"""
+
+    def __init__(self, projection="patterson", lon=0.0, lat=0.0, scale=185.0):
+        self.projection = projection
+        self.lon = float(lon)
+        self.lat = float(lat)
+        self.scale = float(scale)
+
+    def as_dict(self):
+        return {"projection": self.projection, "lon": self.lon, "lat": self.lat, "scale": self.scale}
+
+    def __repr__(self):
+        return f"ViewSpec({self.projection}, {self.lon:.2f}, {self.lat:.2f}, {self.scale:.0f})"
+
+
+def parse_view(url):
+    """从Earth Nullschool的URL片段中解析视图，例如 patterson=0.00,0.00,185"""
+    match = re.search(r"(\w+)=(-?[\d.]+),(-?[\d.]+),([\d.]+)", url.split("#", 1)[-1])
+    if not match or match.group(1) not in PROJECTIONS:
+        raise ValueError(f"无法从URL中解析地图视图: {url}")
+    return ViewSpec(match.group(1), match.group(2), match.group(3), match.group(4))
+
+
+def _patterson_forward(lam, phi):
+    phi2 = phi * phi
+    return lam, phi * (PATTERSON_K1 + phi2 * phi2 * (PATTERSON_K2 + phi2 * (PATTERSON_K3 + PATTERSON_K4 * phi2)))
+
+
+def _patterson_inverse(x, y):
+    y = np.clip(y, -PATTERSON_YM, PATTERSON_YM)
+    phi = y.copy()
+    # Newton迭代，固定次数即可收敛到float精度
+    for _ in range(8):
+        phi2 = phi * phi
+        f = phi * (PATTERSON_K1 + phi2 * phi2 * (PATTERSON_K2 + phi2 * (PATTERSON_K3 + PATTERSON_K4 * phi2))) - y
+        df = PATTERSON_K1 + phi2 * phi2 * (5 * PATTERSON_K2 + phi2 * (7 * PATTERSON_K3 + 9 * PATTERSON_K4 * phi2))
+        phi -= f / df
+    return x, phi
+
+
+def _equirectangular_forward(lam, phi):
+    return lam, phi
+
+
+def _equirectangular_inverse(x, y):
+    return x, y
+
+
+# 投影名称 -> (正算, 反算, 原始坐标中y的最大值)
+PROJECTIONS = {
+    "patterson": (_patterson_forward, _patterson_inverse, PATTERSON_YM),
+    "equirectangular": (_equirectangular_forward, _equirectangular_inverse, np.pi / 2),
+}
+
+
+class ScreenProjection:
+    """d3风格的投影：旋转 -> 原始投影 -> 缩放平移到屏幕像素"""
+
+    def __init__(self, view, width, height):
+        self.view = view
+        self.width = width
+        self.height = height
+        self.forward_raw, self.inverse_raw, self.y_max = PROJECTIONS[view.projection]
+        self.scale = view.scale * min(width / REFERENCE_SIZE[0], height / REFERENCE_SIZE[1])
+        self.delta_phi = np.radians(-view.lat)
+
+    def project(self, lon, lat):
+        """经纬度（度） -> 屏幕像素坐标"""
+        lam = np.radians(lon - self.view.lon)
+        phi = np.radians(lat)
+        cos_phi = np.cos(phi)
+        x, y, z = np.cos(lam) * cos_phi, np.sin(lam) * cos_phi, np.sin(phi)
+        cos_d, sin_d = np.cos(self.delta_phi), np.sin(self.delta_phi)
+        lam_r = np.arctan2(y, x * cos_d - z * sin_d)
+        phi_r = np.arcsin(np.clip(z * cos_d + x * sin_d, -1, 1))
+        px, py = self.forward_raw(lam_r, phi_r)
+        return self.width / 2 + self.scale * px, self.height / 2 - self.scale * py
+
+    def invert(self, sx, sy):
+        """屏幕像素坐标 -> (经度, 纬度, 是否在地图范围内)"""
+        px = (sx - self.width / 2) / self.scale
+        py = (self.height / 2 - sy) / self.scale
+        inside = (np.abs(px) <= np.pi) & (np.abs(py) <= self.y_max)
+        lam_r, phi_r = self.inverse_raw(px, py)
+        cos_phi = np.cos(phi_r)
+        x, y, z = np.cos(lam_r) * cos_phi, np.sin(lam_r) * cos_phi, np.sin(phi_r)
+        cos_d, sin_d = np.cos(self.delta_phi), np.sin(self.delta_phi)
+        lam = np.arctan2(y, x * cos_d + z * sin_d)
+        phi = np.arcsin(np.clip(z * cos_d - x * sin_d, -1, 1))
+        lon = np.mod(np.degrees(lam) + self.view.lon + 180, 360) - 180
+        return lon, np.degrees(phi), inside
+
+
+class ProjectionLUT:
+    """
+    每个屏幕像素对应的网格索引(i0, j0)、双线性权重(tx, ty)、地图掩码，
+    以及把风速(m/s)换算成屏幕位移所需的局部畸变系数（像素/度）。
+    """
+
+    ARRAYS = ("i0", "j0", "tx", "ty", "mask", "distortion")
+
+    def __init__(self, arrays, grid_shape):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.grid_shape = grid_shape
+        self.height, self.width = self.mask.shape
+        self._wind_cache = None
+
+    def _row_chunks(self):
+        for top in range(0, self.height, SAMPLE_CHUNK_ROWS):
+            yield slice(top, min(top + SAMPLE_CHUNK_ROWS, self.height))
+
+    def sample(self, field):
+        """
+        按查找表对网格场做双线性采样，得到屏幕尺寸的数组。
+        按行分块直接读取内存映射的i0/j0/tx/ty，邻点索引和权重只在当前块内展开，不常驻内存。
+        """
+        ny, nx = self.grid_shape
+        flat = np.asarray(field, dtype=np.float32).ravel()
+        result = np.empty((self.height, self.width), dtype=np.float32)
+        for rows in self._row_chunks():
+            i0 = self.i0[rows].astype(np.intp)
+            i1 = i0 + 1
+            i1[i1 == nx] = 0  # 经度方向首尾相接
+            j0 = self.j0[rows].astype(np.intp)
+            row0 = j0 * nx
+            row1 = np.minimum(j0 + 1, ny - 1) * nx
+            tx = self.tx[rows].astype(np.float32)
+            ty = self.ty[rows].astype(np.float32)
+            upper = flat[row0 + i0]
+            upper += (flat[row0 + i1] - upper) * tx
+            lower = flat[row1 + i0]
+            lower += (flat[row1 + i1] - lower) * tx
+            result[rows] = upper + (lower - upper) * ty
+        return result
+
+    def sample_wind(self, grid):
+        """采样u、v分量，同一网格只计算一次"""
+        if self._wind_cache is None or self._wind_cache[0] is not grid:
+            self._wind_cache = (grid, self.sample(grid.u), self.sample(grid.v))
+        return self._wind_cache[1], self._wind_cache[2]
+
+    def screen_velocity(self, grid, degrees_per_step):
+        """每个像素处每步的屏幕位移(dx, dy)，地图范围外为0"""
+        u, v = self.sample_wind(grid)
+        dx = np.empty((self.height, self.width), dtype=np.float32)
+        dy = np.empty((self.height, self.width), dtype=np.float32)
+        for rows in self._row_chunks():
+            # 畸变系数同样按块转换，避免一次展开4×H×W的float32数组
+            d = self.distortion[rows].astype(np.float32)
+            u_step = u[rows] * degrees_per_step
+            v_step = v[rows] * degrees_per_step
+            dx[rows] = d[..., 0] * u_step + d[..., 2] * v_step
+            dy[rows] = d[..., 1] * u_step + d[..., 3] * v_step
+        return dx, dy
+
+
+def build_lut(view, width, height, grid):
+    """计算查找表"""
+    projection = ScreenProjection(view, width, height)
+    sx = np.arange(width, dtype=np.float64)[np.newaxis, :] + 0.5
+    sy = np.arange(height, dtype=np.float64)[:, np.newaxis] + 0.5
+    sx, sy = np.broadcast_arrays(sx, sy)
+    lon, lat, inside = projection.invert(sx, sy)
+
+    fx = np.mod((lon - grid.lo1) / grid.dx, grid.nx)
+    fy = np.clip((grid.la1 - lat) / grid.dy, 0, grid.ny - 1)
+    i0 = np.floor(fx)
+    j0 = np.floor(fy)
+
+    # 数值求导：经度/纬度各前进一个小增量后的屏幕位移（同cambecc/earth的distortion）
+    h = DISTORTION_STEP
+    h_lon = np.where(lon < 0, h, -h)
+    h_lat = np.where(lat < 0, h, -h)
+    x0, y0 = projection.project(lon, lat)
+    x_lon, y_lon = projection.project(lon + h_lon, lat)
+    x_lat, y_lat = projection.project(lon, lat + h_lat)
+    k = np.maximum(np.cos(np.radians(lat)), 1e-3)
+    distortion = np.stack([
+        (x_lon - x0) / h_lon / k,
+        (y_lon - y0) / h_lon / k,
+        (x_lat - x0) / h_lat,
+        (y_lat - y0) / h_lat,
+    ], axis=-1)
+
+    return {
+        "i0": i0.astype(np.int16),
+        "j0": j0.astype(np.int16),
+        "tx": (fx - i0).astype(np.float16),
+        "ty": (fy - j0).astype(np.float16),
+        "mask": inside,
+        "distortion": np.where(inside[..., np.newaxis], distortion, 0).astype(np.float16),
+    }
+
+
+def lut_cache_key(view, width, height, grid):
+    """缓存键：视图参数、输出尺寸和网格几何共同决定查找表"""
+    params = {
+        "version": LUT_VERSION,
+        "view": view.as_dict(),
+        "size": [width, height],
+        "grid": [grid.nx, grid.ny, grid.lo1, grid.la1, grid.dx, grid.dy],
+    }
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def load_or_build_lut(view, width, height, grid, cache_dir=PROJECTION_CACHE_DIR):
+    """优先使用内存/磁盘缓存的查找表，否则计算并以.npy保存，之后以内存映射方式加载"""
+    key = lut_cache_key(view, width, height, grid)
+    if key in _lut_cache:
+        return _lut_cache[key]
+
+    lut_dir = os.path.join(cache_dir, f"{view.projection}-{width}x{height}-{key}")
+    if not os.path.isdir(lut_dir):
+        logger.info(f"计算投影查找表: {view}, 尺寸={width}x{height}")
+        arrays = build_lut(view, width, height, grid)
+        # 先写入临时目录再整体重命名，避免其他进程读到写了一半的缓存
+        tmp_dir = f"{lut_dir}.tmp{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        try:
+            os.rename(tmp_dir, lut_dir)
+        except OSError:
+            # 其他进程已经写好了同一份缓存
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.info(f"投影查找表已缓存到: {os.path.abspath(lut_dir)}")
+    else:
+        logger.debug(f"使用已缓存的投影查找表: {lut_dir}")
+
+    arrays = {name: np.load(os.path.join(lut_dir, f"{name}.npy"), mmap_mode="r") for name in ProjectionLUT.ARRAYS}
+    lut = ProjectionLUT(arrays, (grid.ny, grid.nx))
+    _lut_cache[key] = lut
+    return lut
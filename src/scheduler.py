@@ -0,0 +1,152 @@
+"""
+Model-run-aware update scheduler
+Schedules fetches just after the wind source is expected to publish new data and polls sparsely in between
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger("wind_wallpaper")
+
+# GFS每天4次起报（UTC），1.0度产品通常在起报后约3.5小时可用
+GFS_CYCLE_HOURS = (0, 6, 12, 18)
+GFS_PUBLICATION_DELAY = timedelta(hours=3, minutes=30)
+# earth的"current"数据按预报时效每3小时切换一次
+FORECAST_STEP_HOURS = 3
+FORECAST_STEP_DELAY = timedelta(minutes=5)
+# 预期有新数据后，在这个窗口内重试，直到观察到数据变化；每次没有变化后间隔乘以DENSE_BACKOFF（10、20、40分钟……），
+# 连续多个窗口都没有变化（数据源停更）时只在预期时间点获取，直到再次观察到变化
+DENSE_WINDOW = timedelta(minutes=90)
+DENSE_INTERVAL = 10 * 60  # 秒
+DENSE_BACKOFF = 2
+# 其他时间的最长轮询间隔（兜底）
+SPARSE_INTERVAL = 3 * 3600  # 秒
+MIN_DELAY = 1  # 秒
+# earth的URL片段以数据时间开头："current"或具体时次，例如 "2026/01/01/0300Z"
+EARTH_DATE_PATTERN = re.compile(r"^(current|\d{4}/\d{1,2}/\d{1,2}/\d{4}Z)(?:/|$)")
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def forecast_step_token(now=None, step_hours=FORECAST_STEP_HOURS):
+    """最近一个已到的预报时次（UTC），按earth URL片段中的日期格式，例如 "2026/01/01/0300Z" """
+    now = now or utc_now()
+    step = now.replace(hour=now.hour - now.hour % step_hours, minute=0, second=0, microsecond=0)
+    return f"{step:%Y/%m/%d/%H%M}Z"
+
+
+def _split_earth_date(fragment):
+    match = EARTH_DATE_PATTERN.match(fragment)
+    if match is None:
+        return None, fragment
+    return match.group(1), fragment[match.end():]
+
+
+def data_refresh_fragment(current, target, now=None):
+    """
+    要让earth页面显示target视图并重新拉取数据时应设置的URL片段；current是页面当前的片段。
+    earth只在片段的解析结果变化时才拉取数据，所以日期总是与current不同：当前已是最新时次时用"current"，
+    否则用最新时次（两者是同一份数据）。target指定了其他固定日期时原样返回。
+    """
+    current_date, _ = _split_earth_date(current or "")
+    date, rest = _split_earth_date(target)
+    step = forecast_step_token(now)
+    if date not in (None, "current", step):
+        return target
+    date = "current" if current_date == step else step
+    return f"{date}/{rest}" if rest else date
+
+
+class ModelRunScheduler:
+    """按上游数据的发布时间安排更新；clock可替换为假时钟用于测试"""
+
+    def __init__(self, cycle_hours=GFS_CYCLE_HOURS, publication_delay=GFS_PUBLICATION_DELAY,
+                 forecast_step_hours=FORECAST_STEP_HOURS, step_delay=FORECAST_STEP_DELAY,
+                 dense_window=DENSE_WINDOW, dense_interval=DENSE_INTERVAL, dense_backoff=DENSE_BACKOFF,
+                 sparse_interval=SPARSE_INTERVAL, clock=utc_now):
+        self.cycle_hours = tuple(cycle_hours)
+        self.publication_delay = publication_delay
+        self.forecast_step_hours = forecast_step_hours
+        self.step_delay = step_delay
+        self.dense_window = dense_window
+        self.dense_interval = dense_interval
+        self.dense_backoff = dense_backoff
+        self.sparse_interval = sparse_interval
+        self.clock = clock
+        self._confirmed = None  # 已观察到数据变化的预期时间点
+        self._misses = 0  # 上次观察到数据变化之后连续没有变化的获取次数
+
+    def _expected_on(self, day):
+        """某一天（UTC）内所有预期出现新数据的时间点"""
+        midnight = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        times = [midnight + timedelta(hours=hour) + self.publication_delay for hour in self.cycle_hours]
+        if self.forecast_step_hours:
+            times += [midnight + timedelta(hours=hour) + self.step_delay
+                      for hour in range(0, 24, self.forecast_step_hours)]
+        return times
+
+    def expected_changes(self, start, end):
+        """[start, end) 区间内预期出现新数据的时间点（已排序）"""
+        times = set()
+        day = (start - timedelta(days=1)).date()
+        while day <= end.date():
+            times.update(t for t in self._expected_on(day) if start <= t < end)
+            day += timedelta(days=1)
+        return sorted(times)
+
+    def last_expected(self, now):
+        times = self.expected_changes(now - timedelta(days=1), now + timedelta(microseconds=1))
+        return times[-1] if times else None
+
+    def next_expected(self, now):
+        times = self.expected_changes(now + timedelta(microseconds=1), now + timedelta(days=2))
+        return times[0] if times else None
+
+    def in_dense_window(self, now):
+        """刚到预期发布时间、还没有观察到新数据"""
+        last = self.last_expected(now)
+        return last is not None and now < last + self.dense_window and self._confirmed != last
+
+    def next_delay(self):
+        """距下次获取数据的秒数"""
+        now = self.clock()
+        next_time = self.next_expected(now)
+        if self.in_dense_window(now):
+            # 预期时间点的获取没有发现新数据（发布延迟），按退避间隔重试，不晚于下一个预期时间点
+            delay = min(self.sparse_interval, self.dense_interval * self.dense_backoff ** max(0, self._misses - 1))
+            reason = f"等待新数据发布 (连续 {self._misses} 次没有变化)"
+            if next_time is not None and now + timedelta(seconds=delay) > next_time:
+                delay = (next_time - now).total_seconds()
+                reason = f"预计 {next_time:%H:%M} UTC 有新数据"
+        else:
+            delay = (next_time - now).total_seconds() if next_time is not None else self.sparse_interval
+            reason = f"预计 {next_time:%H:%M} UTC 有新数据" if next_time is not None else "稀疏轮询"
+        if delay > self.sparse_interval:
+            delay = self.sparse_interval
+            reason = "稀疏轮询"
+        delay = max(MIN_DELAY, delay)
+        logger.debug(f"下次更新在 {delay:.0f} 秒后 ({reason})")
+        return delay
+
+    def record_result(self, changed):
+        """记录一次获取的结果；changed为True表示得到了新数据，本次发布窗口不再重试，否则下次重试的间隔加倍"""
+        if changed:
+            self._confirmed = self.last_expected(self.clock())
+            self._misses = 0
+        else:
+            self._misses += 1
+
+
+class FixedIntervalScheduler:
+    """固定间隔更新（旧行为）"""
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def next_delay(self):
+        return self.interval
+
+    def record_result(self, changed):
+        pass
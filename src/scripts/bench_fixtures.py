@@ -0,0 +1,64 @@
+"""
+基准测试共用的合成数据
+生成earth格式的u/v风场记录和合成截图，不依赖网络
+"""
+import os
+import sys
+import numpy as np
+from PIL import Image
+
+# 让脚本可以直接导入src目录下的模块
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import wind_data
+
+
+def synthetic_wind_records(nx=360, ny=181, ref_time="2026-01-01T00:00:00.000Z", seed=0):
+    """生成带有西风带、信风和若干涡旋的earth格式风场记录"""
+    rng = np.random.default_rng(seed)
+    lon = np.radians(np.arange(nx) * (360.0 / nx))
+    lat = np.radians(90 - np.arange(ny) * (180.0 / (ny - 1)))
+    lon2, lat2 = np.meshgrid(lon, lat)
+
+    u = 12 * np.sin(2 * lat2) * np.cos(lat2) + 3 * np.sin(3 * lon2) * np.cos(lat2)
+    v = 4 * np.cos(2 * lon2) * np.cos(lat2)
+    for _ in range(6):
+        clon, clat = rng.uniform(0, 2 * np.pi), rng.uniform(-1.0, 1.0)
+        d2 = (lon2 - clon) ** 2 + (lat2 - clat) ** 2
+        strength = rng.uniform(10, 25) * np.exp(-d2 / 0.02)
+        u += -strength * (lat2 - clat) * 6
+        v += strength * (lon2 - clon) * 6
+
+    header = {
+        "parameterCategory": 2,
+        "nx": nx, "ny": ny,
+        "lo1": 0.0, "la1": 90.0,
+        "dx": 360.0 / nx, "dy": 180.0 / (ny - 1),
+        "refTime": ref_time,
+        "forecastTime": 0,
+    }
+    return [
+        {"header": dict(header, parameterNumber=2), "data": np.round(u, 2).ravel().tolist()},
+        {"header": dict(header, parameterNumber=3), "data": np.round(v, 2).ravel().tolist()},
+    ]
+
+
+def synthetic_wind_grid(nx=360, ny=181, seed=0):
+    return wind_data.parse_wind_records(synthetic_wind_records(nx, ny, seed=seed))
+
+
+def synthetic_screenshot(width, height, seed=0):
+    """生成与风流场截图特征相近的图像：深色背景上的平滑色场和细碎的流线噪声"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 4 * np.pi, width, dtype=np.float32)
+    y = np.linspace(0, 2 * np.pi, height, dtype=np.float32)[:, None]
+    field = (np.sin(x + y * 0.7) * np.cos(y * 1.3 - x * 0.2) + 1) * 0.5
+    rgb = np.empty((height, width, 3), dtype=np.float32)
+    rgb[..., 0] = 20 + 120 * field
+    rgb[..., 1] = 30 + 80 * (1 - field)
+    rgb[..., 2] = 60 + 60 * field
+    streaks = rng.random((height, width), dtype=np.float32) > 0.97
+    rgb[streaks] = 230
+    return Image.fromarray(rgb.astype(np.uint8), "RGB")
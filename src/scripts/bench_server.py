@@ -0,0 +1,163 @@
+"""
+Local wind page server for benchmarks
+Serves a canned earth-style wind page and its u/v data so capture and download paths can be measured without the network
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bench_fixtures import synthetic_wind_records
+import wind_data
+
+# "current"和具体时次的数据文件都返回同一份风场数据
+DATA_FILE_PATTERN = re.compile(r"/data/weather/.*\.json")
+
+# 页面结构与真实站点保持一致：.mapContainer 中的 canvas#overlay，数据文件路径匹配就绪检测的资源模式
+WIND_PAGE_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>earth - benchmark</title>
+<style>
+body { margin: 0; background: #000; overflow: hidden; }
+.mapContainer { position: absolute; left: 0; top: 0; right: 0; bottom: 0; }
+canvas { position: absolute; left: 0; top: 0; }
+ul.menu { position: absolute; z-index: 2; margin: 8px; color: #fff; font: 14px sans-serif; }
+</style>
+</head>
+<body>
+<ul class="menu"><li>风流场</li><li>温度</li></ul>
+<div class="mapContainer"><canvas id="map"></canvas><canvas id="overlay"></canvas></div>
+<script>
+var DATA_PATH = "__DATA_PATH__";
+var map = document.getElementById("map");
+var overlay = document.getElementById("overlay");
+
+function resize() {
+    map.width = overlay.width = window.innerWidth;
+    map.height = overlay.height = window.innerHeight;
+    var ctx = map.getContext("2d");
+    ctx.fillStyle = "#0b1a2a";
+    ctx.fillRect(0, 0, map.width, map.height);
+}
+
+function draw(records) {
+    var u = records[0].data, v = records[1].data, header = records[0].header;
+    var nx = header.nx, ny = header.ny;
+    var ctx = overlay.getContext("2d");
+    ctx.clearRect(0, 0, overlay.width, overlay.height);
+    var sx = overlay.width / nx, sy = overlay.height / ny;
+    for (var j = 0; j < ny; j += 3) {
+        for (var i = 0; i < nx; i += 3) {
+            var k = j * nx + i, speed = Math.sqrt(u[k] * u[k] + v[k] * v[k]);
+            var x = i * sx, y = j * sy;
+            ctx.strokeStyle = "hsl(" + Math.max(0, 240 - speed * 8) + ", 90%, 60%)";
+            ctx.beginPath();
+            ctx.moveTo(x, y);
+            ctx.lineTo(x + u[k] * sx * 0.4, y - v[k] * sy * 0.4);
+            ctx.stroke();
+        }
+    }
+}
+
+// 与earth相同：片段以具体时次开头时读取该时次的数据文件，片段没有变化时（例如只触发hashchange）不重新拉取数据
+var loadedHash = null;
+
+function dataPath() {
+    var match = /^#(\\d{4}\\/\\d{1,2}\\/\\d{1,2})\\/(\\d{4}Z)(\\/|$)/.exec(location.hash);
+    return match ? "/data/weather/" + match[1] + "/" + match[2] + "-wind-surface-level-gfs-1.0.json" : DATA_PATH;
+}
+
+function load() {
+    loadedHash = location.hash;
+    fetch(dataPath(), { cache: "no-cache" }).then(function(r) { return r.json(); }).then(draw);
+}
+
+window.addEventListener("hashchange", function() {
+    if (location.hash !== loadedHash) {
+        load();
+    }
+});
+window.addEventListener("resize", function() { resize(); load(); });
+resize();
+load();
+</script>
+</body>
+</html>
+"""
+
+
+class WindPageServer:
+    """在后台线程中运行的本地HTTP服务器，提供风流场页面和风场数据（支持ETag条件请求）"""
+
+    def __init__(self, records=None, host="127.0.0.1", port=0, latency=0.0):
+        self.payload = json.dumps(records or synthetic_wind_records()).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.payload).hexdigest() + '"'
+        self.page = WIND_PAGE_HTML.replace("__DATA_PATH__", wind_data.WIND_DATA_PATH).encode("utf-8")
+        self.latency = latency  # 每个请求额外的模拟网络延迟（秒）
+        self.request_count = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.request_count += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                path = self.path.split("?", 1)[0]
+                if path in ("/", "/index.html") or path.endswith("/"):
+                    self._send(200, "text/html; charset=utf-8", server.page)
+                elif DATA_FILE_PATTERN.fullmatch(path):
+                    if self.headers.get("If-None-Match") == server.etag:
+                        self._send(304, None, b"")
+                    else:
+                        self._send(200, "application/json", server.payload, etag=server.etag)
+                else:
+                    self._send(404, "text/plain", b"not found")
+
+            def _send(self, status, content_type, body, etag=None):
+                self.send_response(status)
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def page_url(self):
+        return self.base_url + "/#current/wind/surface/level/patterson=0.00,0.00,185"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,107 @@
+"""
+多进程截图池的扩展性基准测试
+在本地风流场页面上用1..N个工作进程截取同一组视图，测量每批的耗时和相对单进程的加速比；需要ChromeDriver
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from bench_server import WindPageServer  # 先导入：bench_server经bench_fixtures把src目录加入sys.path
+from benchmark_pipeline import measure, result, git_revision
+from capture_pool import CapturePool, MAX_WORKER_MEMORY_MB
+from capture_session import CaptureSession, CaptureView
+
+
+def make_views(count):
+    return [CaptureView(f"view{index}", f"current/wind/surface/level/orthographic=0.00,{index * 10:.2f},300")
+            for index in range(count)]
+
+
+def benchmark_session(server, views, size, repeat, chromedriver):
+    """基线：单个进程内的截图会话依次截取所有视图"""
+    session = CaptureSession(chromedriver, server.page_url, window_size=size)
+
+    def run():
+        failed = [capture for capture in session.capture_views(views) if not capture.ok]
+        if failed:
+            raise RuntimeError(f"截图失败: {failed}")
+
+    try:
+        return result("session", measure(run, repeat), views=len(views), workers=0)
+    finally:
+        session.close()
+
+
+def benchmark_pool(server, views, size, repeat, chromedriver, workers, memory_mb):
+    pool = CapturePool(chromedriver, server.page_url, window_size=size, workers=workers, max_memory_mb=memory_mb)
+
+    def run():
+        failed = [capture for capture in pool.capture(views) if not capture.ok]
+        if failed:
+            raise RuntimeError(f"截图失败: {failed}")
+
+    try:
+        # 预热一轮包括启动所有浏览器，不计入结果
+        entry = result("pool", measure(run, repeat), views=len(views), workers=workers)
+        entry["worker_stats"] = [vars(stats) for stats in pool.stats]
+        return entry
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程截图池的扩展性基准测试")
+    parser.add_argument("--chromedriver", required=True, help="ChromeDriver路径")
+    parser.add_argument("--views", type=int, default=8, help="每批截取的视图数")
+    parser.add_argument("--max-workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--latency", type=float, default=0.05, help="本地服务器每个请求的模拟网络延迟（秒）")
+    parser.add_argument("--memory-mb", type=int, default=MAX_WORKER_MEMORY_MB)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_capture_pool.json", help="结果文件 (JSON)")
+    args = parser.parse_args()
+
+    chromedriver = os.path.abspath(args.chromedriver)
+    if not os.path.exists(chromedriver):
+        print(f"ChromeDriver不存在: {chromedriver}")
+        return 1
+    size = tuple(int(value) for value in args.resolution.lower().split("x"))
+    views = make_views(args.views)
+
+    results = []
+    with WindPageServer(latency=args.latency) as server:
+        results.append(benchmark_session(server, views, size, args.repeat, chromedriver))
+        for workers in range(1, args.max_workers + 1):
+            results.append(benchmark_pool(server, views, size, args.repeat, chromedriver, workers, args.memory_mb))
+
+    baseline = next(entry for entry in results if entry["name"] == "pool" and entry["workers"] == 1)["median"]
+    print(f"\n{'工作进程':<10}{'中位数(s)':>12}{'加速比':>10}{'效率':>10}")
+    for entry in results:
+        if entry["name"] != "pool":
+            continue
+        speedup = baseline / entry["median"]
+        print(f"{entry['workers']:<10}{entry['median']:>12.2f}{speedup:>10.2f}{speedup / entry['workers']:>10.0%}")
+
+    report = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "resolution": args.resolution,
+            "latency": args.latency,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+动态壁纸注入脚本的CPU耗时基准测试
+在本地风流场页面中加入N个带文字的节点，比较旧脚本（全DOM文字扫描 + 每5秒重复隐藏/全屏）与新脚本（样式表 + MutationObserver）的页面内耗时；需要ChromeDriver
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from bench_server import WindPageServer  # 先导入：bench_server经bench_fixtures把src目录加入sys.path
+from benchmark_pipeline import git_revision
+from capture_session import CaptureSession
+from live_page_scripts import SETUP_JS, STATUS_JS
+
+LEGACY_INTERVAL = 5  # 旧脚本的定时器间隔（秒）
+
+# 向页面加入N个节点，模拟真实站点的菜单、图例和数值标签
+INFLATE_JS = """
+var count = arguments[0];
+var root = document.createElement('div');
+root.className = 'bench-filler';
+for (var i = 0; i < count; i += 10) {
+    var group = document.createElement('div');
+    group.className = 'group';
+    for (var j = 0; j < 10 && i + j < count; j++) {
+        var span = document.createElement('span');
+        span.textContent = (j % 3 === 0 ? '风速 ' : '温度 ') + (i + j);
+        group.appendChild(span);
+    }
+    root.appendChild(group);
+}
+document.body.appendChild(root);
+return document.getElementsByTagName('*').length;
+"""
+
+# 模拟页面自身的一次DOM更新（例如数值标签刷新）
+MUTATE_JS = """
+var node = document.createElement('span');
+node.textContent = '风速 ' + arguments[0];
+document.querySelector('.bench-filler').appendChild(node);
+"""
+
+# 旧版注入脚本中的函数（只去掉了日志输出），挂到window上以便逐个计时
+LEGACY_JS = """
+function switchToWindFlow() {
+    var bottomButtons = document.querySelectorAll('.bottom-toolbar button, .bottom-bar button, .toolbar button');
+    var allButtons = document.querySelectorAll('button, [role="button"], .btn, .button');
+    var windElements = [];
+    var allElements = document.querySelectorAll('*');
+    for (var i = 0; i < allElements.length; i++) {
+        if (allElements[i].textContent &&
+            (allElements[i].textContent.includes('风') ||
+             allElements[i].textContent.includes('流场'))) {
+            windElements.push(allElements[i]);
+        }
+    }
+    var toolbarButtons = document.querySelectorAll('.toolbar button, .toolbar-item');
+    if (toolbarButtons.length >= 2) {
+        toolbarButtons[1].click();
+    }
+    var layerControls = document.querySelectorAll('.layer-control, .layer-panel, .sidebar-left');
+    if (layerControls.length > 0) {
+        var layerItems = layerControls[0].querySelectorAll('li, .layer-item');
+        for (var i = 0; i < layerItems.length; i++) {
+            if (layerItems[i].textContent &&
+                (layerItems[i].textContent.includes('风') || layerItems[i].textContent.includes('流场'))) {
+                layerItems[i].click();
+                break;
+            }
+        }
+    }
+    return windElements.length;
+}
+
+function hideAllUIElements() {
+    var header = document.querySelector('header, .header, .navbar, .nav-bar, .top-bar');
+    if (header) {
+        header.style.display = 'none';
+    }
+    var uiElements = [
+        'header', '.header', '.navbar', '.nav-bar', '.top-bar',
+        'footer', '.footer', '.bottom-bar',
+        '.sidebar', '.sidebar-left', '.sidebar-right',
+        '.panel', '.control-panel', '.layer-panel',
+        '.logo', '.brand', '.title', '.app-title',
+        '.toolbar', '.toolbar-top', '.toolbar-bottom',
+        '.menu', '.menu-bar', '.nav-menu',
+        '.search', '.search-box', '.search-bar',
+        '.zoom-control', '.map-controls', '.leaflet-control',
+        '.legend', '.map-legend', '.color-legend',
+        '.info-box', '.info-panel', '.popup',
+        '.attribution', '.copyright', '.credits'
+    ];
+    uiElements.forEach(function(selector) {
+        var elements = document.querySelectorAll(selector);
+        for (var i = 0; i < elements.length; i++) {
+            elements[i].style.display = 'none';
+        }
+    });
+    var groups = ['button, .btn, .button, input, select, .control', '.top, .top-container, .header-container',
+                  'h1, h2, h3, .title, .heading', '.logo, .brand, img[src*="logo"]'];
+    groups.forEach(function(selector) {
+        var elements = document.querySelectorAll(selector);
+        for (var i = 0; i < elements.length; i++) {
+            elements[i].style.display = 'none';
+        }
+    });
+}
+
+function makeMapFullscreen() {
+    var mapContainers = [
+        '.map-container', '.map', '#map',
+        '.leaflet-container', '.mapContainer',
+        'div[class*="map"]', 'div[id*="map"]',
+        '.amap-container', '.bmap-container', '.tmap-container'
+    ];
+    var mapContainer = null;
+    for (var i = 0; i < mapContainers.length; i++) {
+        var containers = document.querySelectorAll(mapContainers[i]);
+        if (containers.length > 0) {
+            mapContainer = containers[0];
+            break;
+        }
+    }
+    if (!mapContainer) {
+        return false;
+    }
+    mapContainer.style.position = 'fixed';
+    mapContainer.style.top = '0';
+    mapContainer.style.left = '0';
+    mapContainer.style.width = '100vw';
+    mapContainer.style.height = '100vh';
+    mapContainer.style.zIndex = '9999';
+    document.body.style.backgroundColor = 'black';
+    document.body.style.margin = '0';
+    document.body.style.padding = '0';
+    document.body.style.overflow = 'hidden';
+    return true;
+}
+
+function checkPageStatus() {
+    var windElements = [];
+    var elements = document.querySelectorAll('*');
+    for (var i = 0; i < elements.length; i++) {
+        if (elements[i].textContent &&
+            (elements[i].textContent.includes('风流场') ||
+             elements[i].textContent.includes('风向') ||
+             elements[i].textContent.includes('风速'))) {
+            windElements.push({
+                tag: elements[i].tagName,
+                text: elements[i].textContent.trim(),
+                visible: elements[i].offsetParent !== null
+            });
+        }
+    }
+    return windElements.slice(0, 10).length;
+}
+
+window.__legacy = {
+    switchToWindFlow: switchToWindFlow,
+    tick: function() { hideAllUIElements(); makeMapFullscreen(); },
+    status: checkPageStatus
+};
+"""
+
+# 在页面内计时，返回毫秒
+TIME_JS = """
+var start = performance.now();
+%s;
+return performance.now() - start;
+"""
+
+
+def timed(driver, statement, repeat):
+    samples = [driver.execute_script(TIME_JS % statement) for _ in range(repeat)]
+    return statistics.median(samples)
+
+
+def open_page(session, url, nodes):
+    # 同一URL只改片段时浏览器不会重新加载，先离开页面，保证每次测试都从干净的DOM开始
+    session.driver.get("about:blank")
+    session.driver.get(url)
+    time.sleep(1)
+    return session.driver.execute_script(INFLATE_JS, nodes)
+
+
+def benchmark_legacy(session, url, nodes, repeat):
+    elements = open_page(session, url, nodes)
+    driver = session.driver
+    driver.execute_script(LEGACY_JS)
+    switch_ms = timed(driver, "window.__legacy.switchToWindFlow()", 1)
+    tick_ms = timed(driver, "window.__legacy.tick()", repeat)
+    status_ms = timed(driver, "window.__legacy.status()", repeat)
+    return {
+        "name": "legacy",
+        "nodes": nodes,
+        "elements": elements,
+        "setup_ms": switch_ms + tick_ms,
+        "tick_ms": tick_ms,
+        "status_ms": status_ms,
+        # 每5秒一次，一小时720次
+        "per_hour_ms": tick_ms * 3600 / LEGACY_INTERVAL,
+    }
+
+
+def benchmark_observer(session, url, nodes, repeat, mutations):
+    elements = open_page(session, url, nodes)
+    driver = session.driver
+    driver.execute_script("return " + SETUP_JS.strip().rstrip(";"))
+    time.sleep(2.5)  # 等待脚本中延迟2秒的隐藏和全屏
+    for index in range(mutations):
+        driver.execute_script(MUTATE_JS, index)
+        time.sleep(0.05)
+    time.sleep(0.2)
+    stats = driver.execute_script("return window.__windWallpaperStats")
+    status_ms = timed(driver, STATUS_JS.strip().rstrip(";"), repeat)
+    per_mutation_ms = stats["observerMs"] / max(1, stats["observerCalls"])
+    return {
+        "name": "observer",
+        "nodes": nodes,
+        "elements": elements,
+        "setup_ms": stats["setupMs"],
+        "mutations": mutations,
+        "observer_calls": stats["observerCalls"],
+        "observer_ms": stats["observerMs"],
+        "per_mutation_ms": per_mutation_ms,
+        "fullscreen_runs": stats["fullscreenRuns"],
+        "status_ms": status_ms,
+        # 假设页面每秒变化一次（真实站点在数据刷新之外几乎不修改DOM，这是偏高的估计）
+        "per_hour_ms": per_mutation_ms * 3600,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="动态壁纸注入脚本的CPU耗时基准测试")
+    parser.add_argument("--chromedriver", required=True, help="ChromeDriver路径")
+    parser.add_argument("--nodes", default="1000,10000,50000", help="加入页面的节点数（逗号分隔）")
+    parser.add_argument("--mutations", type=int, default=20, help="新脚本测试中模拟的DOM变化次数")
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="bench_injected_js.json", help="结果文件 (JSON)")
+    args = parser.parse_args()
+
+    chromedriver = os.path.abspath(args.chromedriver)
+    if not os.path.exists(chromedriver):
+        print(f"ChromeDriver不存在: {chromedriver}")
+        return 1
+    size = tuple(int(value) for value in args.resolution.lower().split("x"))
+    node_counts = [int(value) for value in args.nodes.split(",")]
+
+    results = []
+    with WindPageServer() as server:
+        session = CaptureSession(chromedriver, server.page_url, window_size=size)
+        session.start()
+        try:
+            for nodes in node_counts:
+                results.append(benchmark_legacy(session, server.page_url, nodes, args.repeat))
+                results.append(benchmark_observer(session, server.page_url, nodes, args.repeat, args.mutations))
+        finally:
+            session.close()
+
+    print(f"\n{'脚本':<10}{'节点':>8}{'初始化(ms)':>14}{'状态检查(ms)':>14}{'每小时(ms)':>14}")
+    for entry in results:
+        print(f"{entry['name']:<10}{entry['elements']:>8}{entry['setup_ms']:>14.1f}"
+              f"{entry['status_ms']:>14.1f}{entry['per_hour_ms']:>14.0f}")
+
+    report = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "resolution": args.resolution,
+            "repeat": args.repeat,
+            "legacy_interval": LEGACY_INTERVAL,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+粒子渲染器基准测试
+测量不同粒子数量下渲染一帧静态壁纸的耗时
+"""
+import argparse
+import time
+from bench_fixtures import synthetic_wind_grid
+from particle_renderer import ParticleRenderer, PARTICLE_STEPS
+
+
+def benchmark(width, height, particle_counts, steps, repeat):
+    grid = synthetic_wind_grid()
+    print(f"分辨率: {width}x{height}, 步数: {steps}, 重复: {repeat}")
+    print(f"{'粒子数':>10} {'每帧(ms)':>12} {'每步(ms)':>12}")
+    for count in particle_counts:
+        best = None
+        for _ in range(repeat):
+            renderer = ParticleRenderer(grid, width, height, particle_count=count, seed=0)
+            start = time.perf_counter()
+            renderer.render(steps)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{count:>10} {best * 1000:>12.1f} {best * 1000 / steps:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="粒子渲染器基准测试")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--steps", type=int, default=PARTICLE_STEPS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--particles", type=int, nargs="+", default=[5000, 10000, 30000, 60000, 100000])
+    args = parser.parse_args()
+    benchmark(args.width, args.height, args.particles, args.steps, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+壁纸更新流程基准测试
+在多种分辨率下测量合成、编码和端到端更新的耗时，浏览器截图针对本地的风流场页面；结果保存为JSON，便于比较不同版本
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from bench_fixtures import synthetic_screenshot
+from bench_server import WindPageServer
+
+RESOLUTIONS = ["1280x720", "1920x1080", "2560x1440", "3840x2160"]
+FORMATS = ["bmp", "png", "jpeg"]
+REGRESSION_THRESHOLD = 0.15  # 中位数比基准慢15%以上视为退化
+
+
+def load_wallpaper_module(work_dir):
+    """在临时工作目录中导入主程序（日志、壁纸文件和投影缓存都写在该目录下）"""
+    os.chdir(work_dir)
+    import wind_wallpaper_new
+    # 主程序的异常处理会等待用户输入，基准测试中恢复默认行为
+    sys.excepthook = sys.__excepthook__
+    for handler in logging.getLogger("wind_wallpaper").handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            handler.setLevel(logging.WARNING)
+    return wind_wallpaper_new
+
+
+def use_geometry(module, resolution):
+    module.DISPLAY_GEOMETRY = resolution
+    module._output_layout = None
+    module.close_capture_session()
+    return module.get_output_layout()
+
+
+def measure(func, repeat, warmup=1):
+    """运行func若干次，返回每次的耗时（秒）；预热的结果不计入"""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index in range(warmup + repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            if index >= warmup:
+                samples.append(elapsed)
+    return samples
+
+
+def result(name, samples, **params):
+    entry = {"name": name}
+    entry.update(params)
+    entry.update({
+        "repeat": len(samples),
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+    })
+    print(f"{name:<16} {' '.join(f'{k}={v}' for k, v in params.items()):<36} "
+          f"中位数 {entry['median'] * 1000:>9.1f} ms  最小 {entry['min'] * 1000:>9.1f} ms")
+    return entry
+
+
+def benchmark_composite(module, resolutions, repeat):
+    from pipeline import WindFrame
+
+    results = []
+    for resolution in resolutions:
+        layout = use_geometry(module, resolution)
+        screenshot = synthetic_screenshot(*layout.master_size)
+
+        def run():
+            frame = WindFrame("2026-01-01 00:00", screenshot, source="benchmark")
+            if module.create_wind_wallpaper(frame) is None:
+                raise RuntimeError("create_wind_wallpaper失败")
+
+        results.append(result("composite", measure(run, repeat), resolution=resolution))
+    return results
+
+
+def benchmark_encode(module, resolutions, formats, repeat):
+    from pipeline import WindFrame
+    from wallpaper_output import encode_image
+
+    results = []
+    for resolution in resolutions:
+        layout = use_geometry(module, resolution)
+        frame = WindFrame("2026-01-01 00:00", synthetic_screenshot(*layout.master_size), source="benchmark")
+        with contextlib.redirect_stdout(io.StringIO()):
+            wallpaper = module.create_wind_wallpaper(frame)
+        for fmt in formats:
+            sizes = []
+            samples = measure(lambda: sizes.append(len(encode_image(wallpaper, fmt)[0])), repeat)
+            results.append(result("encode", samples, resolution=resolution, format=fmt))
+            results[-1]["bytes"] = sizes[-1]
+    return results
+
+
+def benchmark_update_data(module, server, resolutions, repeat):
+    """数据模式的端到端更新：下载（本地服务器）、渲染、合成、编码、设置壁纸"""
+    module.DATA_SOURCE = "data"
+    module.WIND_DATA_BASE_URL = server.base_url
+    results = []
+    for resolution in resolutions:
+        use_geometry(module, resolution)
+
+        def run():
+            if not module.update_wallpaper(force=True):
+                raise RuntimeError("数据模式更新失败")
+
+        results.append(result("update_data", measure(run, repeat), resolution=resolution))
+    return results
+
+
+def benchmark_browser(module, server, resolutions, repeat, chromedriver):
+    """浏览器模式：冷启动截图（包括启动Chrome）和复用会话的端到端更新"""
+    module.DATA_SOURCE = "browser"
+    module.CHROME_DRIVER_PATH = chromedriver
+    module.WEATHER_URL = server.page_url
+    results = []
+    for resolution in resolutions:
+        use_geometry(module, resolution)
+
+        def cold_fetch():
+            module.close_capture_session()
+            if module.fetch_wind_data() is None:
+                raise RuntimeError("fetch_wind_data失败")
+
+        def warm_update():
+            if not module.update_wallpaper(force=True):
+                raise RuntimeError("浏览器模式更新失败")
+
+        results.append(result("fetch_cold", measure(cold_fetch, repeat, warmup=0), resolution=resolution))
+        results.append(result("update_browser", measure(warm_update, repeat), resolution=resolution))
+    module.close_capture_session()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def result_key(entry):
+    return tuple(sorted((k, v) for k, v in entry.items()
+                        if k not in ("repeat", "min", "median", "mean", "max", "bytes")))
+
+
+def compare(results, baseline_path, threshold):
+    """与基准结果比较，返回退化的项目数"""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {result_key(entry): entry for entry in json.load(file)["results"]}
+    regressions = 0
+    print(f"\n与基准比较: {baseline_path}")
+    for entry in results:
+        old = baseline.get(result_key(entry))
+        if old is None:
+            continue
+        ratio = entry["median"] / old["median"] if old["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- 退化"
+            regressions += 1
+        params = " ".join(f"{k}={v}" for k, v in result_key(entry) if k != "name")
+        print(f"{entry['name']:<16} {params:<36} {old['median'] * 1000:>9.1f} -> {entry['median'] * 1000:>9.1f} ms"
+              f" ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="壁纸更新流程基准测试")
+    parser.add_argument("--resolutions", nargs="+", default=RESOLUTIONS)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", choices=["composite", "encode", "update", "browser"],
+                        default=["composite", "encode", "update"], help="要运行的基准测试")
+    parser.add_argument("--chromedriver", default=None, help="ChromeDriver路径，运行browser基准测试时需要")
+    parser.add_argument("--output", default="bench_pipeline.json", help="结果文件 (JSON)")
+    parser.add_argument("--compare", default=None, help="与之前保存的结果文件比较")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    chromedriver = os.path.abspath(args.chromedriver) if args.chromedriver else None
+    work_dir = tempfile.mkdtemp(prefix="wind_bench_")
+    module = load_wallpaper_module(work_dir)
+
+    # 基准测试不修改桌面壁纸，只确认壁纸文件已写入
+    module.WALLPAPER_BACKEND = "none"
+
+    results = []
+    with WindPageServer() as server:
+        if "composite" in args.only:
+            results += benchmark_composite(module, args.resolutions, args.repeat)
+        if "encode" in args.only:
+            results += benchmark_encode(module, args.resolutions, args.formats, args.repeat)
+        if "update" in args.only:
+            results += benchmark_update_data(module, server, args.resolutions, args.repeat)
+        if "browser" in args.only:
+            if chromedriver and os.path.exists(chromedriver):
+                results += benchmark_browser(module, server, args.resolutions, args.repeat, chromedriver)
+            else:
+                print("未指定有效的ChromeDriver，跳过browser基准测试")
+    module.close_update_pipeline()
+
+    report = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {output_path}")
+
+    if compare_path:
+        regressions = compare(results, compare_path, args.threshold)
+        if regressions:
+            print(f"{regressions} 项比基准慢 {args.threshold * 100:.0f}% 以上")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Update short-circuit state
+Remembers HTTP validators and the content hash of the last applied wind data so unchanged cycles can be skipped
+"""
+import hashlib
+import logging
+
+logger = logging.getLogger("wind_wallpaper")
+
+
+def content_hash(data):
+    """计算数据内容的哈希，作为数据标识"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class UpdateState:
+    """记录上次成功更新的数据标识；数据未变化时跳过合成、编码和设置壁纸"""
+
+    def __init__(self):
+        self.content_key = None  # 上次成功应用的数据标识
+        self.validators = None  # 上次成功应用的数据对应的ETag/Last-Modified
+        self.pending_validators = None  # 本次下载得到、尚未确认应用的验证信息
+        self.update_count = 0
+        self.skip_count = 0
+
+    def conditional_validators(self):
+        """用于条件请求的验证信息"""
+        return self.validators
+
+    def is_unchanged(self, content_key):
+        return content_key is not None and content_key == self.content_key
+
+    def record_update(self, content_key):
+        """壁纸成功更新后调用"""
+        self.content_key = content_key
+        if self.pending_validators is not None:
+            self.validators = self.pending_validators
+            self.pending_validators = None
+        self.update_count += 1
+
+    def record_skip(self):
+        self.skip_count += 1
+        logger.info(f"风场数据未变化，跳过壁纸更新 (累计跳过 {self.skip_count} 次，已更新 {self.update_count} 次)")
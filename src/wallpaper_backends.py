@@ -0,0 +1,271 @@
+"""
+Wallpaper apply backends
+Sets the desktop wallpaper through one of several platform backends; the first one that works is probed once and reused until it fails
+"""
+import ctypes
+import logging
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import traceback
+
+logger = logging.getLogger("wind_wallpaper")
+
+SPI_SETDESKWALLPAPER = 0x0014
+SPIF_UPDATEINIFILE = 0x01
+SPIF_SENDCHANGE = 0x02
+DESKTOP_KEY = "Control Panel\\Desktop"
+SPAN_STYLE = "22"
+# 进入跨区模式前用户原来的壁纸样式保存在这里，退出跨区时恢复
+SAVED_STYLE_KEY = "Software\\RealWindyDesk\\SavedWallpaperStyle"
+
+
+class WallpaperBackend:
+    """壁纸设置后端：available()只做廉价的能力检查，apply()失败时抛出异常"""
+
+    name = None
+
+    def available(self):
+        return True
+
+    def apply(self, path, span=False):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return self.name
+
+
+def _read_registry_value(key, name):
+    import winreg
+    try:
+        return winreg.QueryValueEx(key, name)[0]
+    except FileNotFoundError:
+        return None
+
+
+def _set_windows_style(span, set_path=None):
+    """
+    只在进入或退出跨区模式时写入桌面壁纸样式，平时不改动用户选择的填充/适应/拉伸等样式。
+    进入跨区（样式22）前把原来的WallpaperStyle/TileWallpaper保存到本程序自己的注册表键中（重启后仍可恢复），
+    退出跨区时恢复；可同时写入壁纸路径
+    """
+    import winreg
+    access = winreg.KEY_QUERY_VALUE | winreg.KEY_SET_VALUE
+    registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, DESKTOP_KEY, 0, access)
+    try:
+        saved_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, SAVED_STYLE_KEY, 0, access)
+    except FileNotFoundError:
+        saved_key = None
+    try:
+        style = _read_registry_value(registry_key, "WallpaperStyle")
+        tile = _read_registry_value(registry_key, "TileWallpaper")
+        saved_style = _read_registry_value(saved_key, "WallpaperStyle") if saved_key is not None else None
+        if span and style != SPAN_STYLE:
+            if saved_style is None:
+                if saved_key is None:
+                    saved_key = winreg.CreateKeyEx(winreg.HKEY_CURRENT_USER, SAVED_STYLE_KEY, 0, access)
+                winreg.SetValueEx(saved_key, "WallpaperStyle", 0, winreg.REG_SZ, style or "")
+                winreg.SetValueEx(saved_key, "TileWallpaper", 0, winreg.REG_SZ, tile or "")
+            winreg.SetValueEx(registry_key, "WallpaperStyle", 0, winreg.REG_SZ, SPAN_STYLE)
+            winreg.SetValueEx(registry_key, "TileWallpaper", 0, winreg.REG_SZ, "0")
+            logger.info(f"已切换到跨区壁纸样式 (原样式 {style}, 平铺 {tile})")
+        elif not span and saved_style is not None:
+            # 用户在跨区期间自己改过样式时保留用户的选择
+            if style == SPAN_STYLE:
+                saved_tile = _read_registry_value(saved_key, "TileWallpaper")
+                if saved_style:
+                    winreg.SetValueEx(registry_key, "WallpaperStyle", 0, winreg.REG_SZ, saved_style)
+                if saved_tile:
+                    winreg.SetValueEx(registry_key, "TileWallpaper", 0, winreg.REG_SZ, saved_tile)
+                logger.info(f"已恢复原来的壁纸样式 (样式 {saved_style}, 平铺 {saved_tile})")
+            winreg.DeleteValue(saved_key, "WallpaperStyle")
+            winreg.DeleteValue(saved_key, "TileWallpaper")
+        if set_path is not None:
+            winreg.SetValueEx(registry_key, "Wallpaper", 0, winreg.REG_SZ, set_path)
+    finally:
+        if saved_key is not None:
+            winreg.CloseKey(saved_key)
+        winreg.CloseKey(registry_key)
+
+
+class WindowsApiBackend(WallpaperBackend):
+    """SystemParametersInfoW(SPI_SETDESKWALLPAPER)"""
+
+    name = "windows"
+
+    def available(self):
+        return sys.platform == "win32"
+
+    def apply(self, path, span=False):
+        # 只在进入或退出跨区模式时改动样式，退出后恢复用户原来的样式
+        try:
+            _set_windows_style(span)
+        except Exception as e:
+            logger.warning(f"设置壁纸样式失败: {e}")
+        result = ctypes.windll.user32.SystemParametersInfoW(SPI_SETDESKWALLPAPER, 0, path,
+                                                            SPIF_UPDATEINIFILE | SPIF_SENDCHANGE)
+        if not result:
+            raise Exception(f"SystemParametersInfoW返回{result}")
+
+
+class WindowsRegistryBackend(WallpaperBackend):
+    """写入注册表后通知桌面刷新"""
+
+    name = "windows-registry"
+
+    def available(self):
+        return sys.platform == "win32"
+
+    def apply(self, path, span=False):
+        _set_windows_style(span, set_path=path)
+        ctypes.windll.user32.SendMessageW(0xFFFF, 0x0112, 0xF, 0)
+
+
+class PowerShellBackend(WallpaperBackend):
+    """通过PowerShell调用user32（启动开销最大，只作为最后的手段）"""
+
+    name = "powershell"
+
+    def available(self):
+        return sys.platform == "win32" and shutil.which("powershell") is not None
+
+    def apply(self, path, span=False):
+        escaped = path.replace("\\", "\\\\")
+        ps_command = f'powershell -command "Add-Type -TypeDefinition \\"using System; using System.Runtime.InteropServices; public class Wallpaper {{ [DllImport(\\"user32.dll\\")] public static extern int SystemParametersInfo(int uAction, int uParam, string lpvParam, int fuWinIni); }}\\"; [Wallpaper]::SystemParametersInfo(20, 0, \'{escaped}\', 3)"'
+        result = subprocess.run(ps_command, shell=True, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"PowerShell返回{result.returncode}: {result.stderr.strip()}")
+
+
+class GsettingsBackend(WallpaperBackend):
+    """GNOME/Cinnamon等基于gsettings的桌面"""
+
+    name = "gsettings"
+    SCHEMA = "org.gnome.desktop.background"
+
+    def available(self):
+        return sys.platform.startswith("linux") and shutil.which("gsettings") is not None \
+            and bool(os.environ.get("DBUS_SESSION_BUS_ADDRESS") or os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+    def _set(self, key, value):
+        subprocess.run(["gsettings", "set", self.SCHEMA, key, value], check=True, capture_output=True, text=True)
+
+    def apply(self, path, span=False):
+        uri = pathlib.Path(path).absolute().as_uri()
+        self._set("picture-options", "spanned" if span else "zoom")
+        self._set("picture-uri", uri)
+        try:
+            # GNOME 42及以后的深色模式使用单独的键
+            self._set("picture-uri-dark", uri)
+        except subprocess.CalledProcessError:
+            pass
+
+
+class FehBackend(WallpaperBackend):
+    """X11窗口管理器下用feh设置根窗口背景"""
+
+    name = "feh"
+
+    def available(self):
+        return sys.platform.startswith("linux") and shutil.which("feh") is not None and bool(os.environ.get("DISPLAY"))
+
+    def apply(self, path, span=False):
+        command = ["feh", "--no-fehbg"] + (["--no-xinerama", "--bg-fill"] if span else ["--bg-fill"]) + [path]
+        subprocess.run(command, check=True, capture_output=True, text=True)
+
+
+class FileSinkBackend(WallpaperBackend):
+    """把壁纸文件复制到指定位置，由其他程序（动态壁纸工具、远程桌面等）读取"""
+
+    name = "file"
+
+    def __init__(self, target):
+        self.target = target
+
+    def available(self):
+        return self.target is not None
+
+    def apply(self, path, span=False):
+        target = os.path.abspath(self.target)
+        if os.path.splitext(target)[1] == "":
+            target = os.path.join(target, os.path.basename(path))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = target + ".partial"
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, target)
+
+
+class NullBackend(WallpaperBackend):
+    """不修改桌面，只确认壁纸文件已写入（用于无桌面环境和基准测试）"""
+
+    name = "none"
+
+    def apply(self, path, span=False):
+        if not os.path.exists(path):
+            raise Exception(f"壁纸文件不存在: {path}")
+
+
+# 自动选择时的探测顺序
+AUTO_BACKENDS = ["windows", "windows-registry", "powershell", "gsettings", "feh"]
+BACKEND_NAMES = AUTO_BACKENDS + ["file", "none"]
+
+
+def create_backends(name="auto", sink_path=None):
+    """按名称创建后端列表；"auto"返回按探测顺序排列的所有平台后端"""
+    factories = {
+        "windows": WindowsApiBackend,
+        "windows-registry": WindowsRegistryBackend,
+        "powershell": PowerShellBackend,
+        "gsettings": GsettingsBackend,
+        "feh": FehBackend,
+        "file": lambda: FileSinkBackend(sink_path),
+        "none": NullBackend,
+    }
+    if name == "auto":
+        return [factories[backend]() for backend in AUTO_BACKENDS]
+    if name not in factories:
+        raise ValueError(f"不支持的壁纸设置方式: {name}")
+    return [factories[name]()]
+
+
+class WallpaperApplier:
+    """
+    设置壁纸：第一次按顺序探测后端，记住第一个成功的后端，之后直接使用它。
+    缓存的后端失败时才重新探测一遍。
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.backend = None
+        self.probe_count = 0
+
+    def _probe(self, path, span):
+        self.probe_count += 1
+        for backend in self.backends:
+            if not backend.available():
+                logger.debug(f"壁纸设置方式不可用: {backend}")
+                continue
+            try:
+                backend.apply(path, span)
+            except Exception as e:
+                logger.warning(f"壁纸设置方式 {backend} 失败: {e}")
+                logger.debug(traceback.format_exc())
+                continue
+            logger.info(f"壁纸设置方式: {backend} (第{self.probe_count}次探测)")
+            return backend
+        return None
+
+    def apply(self, path, span=False):
+        """设置壁纸，返回使用的后端；全部失败时返回None"""
+        if self.backend is not None:
+            try:
+                self.backend.apply(path, span)
+                return self.backend
+            except Exception as e:
+                logger.warning(f"壁纸设置方式 {self.backend} 失败，重新探测: {e}")
+                logger.debug(traceback.format_exc())
+                self.backend = None
+        self.backend = self._probe(path, span)
+        return self.backend
@@ -0,0 +1,165 @@
+"""
+Wallpaper output stage
+Encodes each composed wallpaper exactly once in the selected format and publishes it atomically into alternating slots; an optional backup copy is written off the critical path
+"""
+import io
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 格式名称 -> (Pillow格式, 扩展名)
+WALLPAPER_FORMATS = {
+    "bmp": ("BMP", ".bmp"),
+    "png": ("PNG", ".png"),
+    "jpeg": ("JPEG", ".jpg"),
+}
+PNG_COMPRESS_LEVEL = 1  # 快速压缩，文件稍大但编码耗时只有默认级别的几分之一
+JPEG_QUALITY = 90
+# 壁纸文件交替写入的两个槽位：桌面正在读取的文件不会被覆盖，路径变化也让桌面不再使用缓存的旧图
+WALLPAPER_SLOTS = ("a", "b")
+
+
+def publish_atomic(path, data):
+    """
+    先写入同目录下的临时文件并刷新到磁盘，再原子地重命名为path。
+    读取path的程序只会看到旧文件或完整的新文件。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".wallpaper-", suffix=".partial", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def encode_image(image, fmt, jpeg_quality=JPEG_QUALITY):
+    """把图像编码为指定格式，返回 (字节, 编码耗时秒数)"""
+    pil_format, _ = WALLPAPER_FORMATS[fmt]
+    options = {}
+    if fmt == "png":
+        options["compress_level"] = PNG_COMPRESS_LEVEL
+    elif fmt == "jpeg":
+        options["quality"] = jpeg_quality
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+class EncodeStats:
+    """按格式统计编码次数、耗时和输出大小"""
+
+    def __init__(self):
+        self.formats = {}
+
+    def record(self, fmt, seconds, size):
+        entry = self.formats.setdefault(fmt, {"count": 0, "total_seconds": 0.0, "total_bytes": 0})
+        entry["count"] += 1
+        entry["total_seconds"] += seconds
+        entry["total_bytes"] += size
+        entry["last_seconds"] = seconds
+        entry["last_bytes"] = size
+
+    def summary(self):
+        lines = []
+        for fmt, entry in self.formats.items():
+            avg_ms = entry["total_seconds"] / entry["count"] * 1000
+            avg_kb = entry["total_bytes"] / entry["count"] / 1024
+            lines.append(f"{fmt}: {entry['count']}次, 平均编码 {avg_ms:.1f} ms, 平均大小 {avg_kb:.0f} KB")
+        return "; ".join(lines)
+
+
+class WallpaperWriter:
+    """壁纸输出：关键路径上只编码一次，原子地写入两个槽位中当前未使用的一个，备份在后台线程中写入"""
+
+    def __init__(self, path, fmt="bmp", jpeg_quality=JPEG_QUALITY, backup_format=None):
+        if fmt not in WALLPAPER_FORMATS:
+            raise ValueError(f"不支持的壁纸格式: {fmt}")
+        if backup_format is not None and backup_format not in WALLPAPER_FORMATS:
+            raise ValueError(f"不支持的备份格式: {backup_format}")
+        self.base_path = os.path.splitext(path)[0]
+        self.format = fmt
+        self.jpeg_quality = jpeg_quality
+        self.backup_format = backup_format
+        self.stats = EncodeStats()
+        self._backup_executor = None
+        self.published_path = None  # 最近一次完整写入的壁纸文件
+
+    def path_for(self, fmt):
+        return self.base_path + WALLPAPER_FORMATS[fmt][1]
+
+    def slot_path(self, slot):
+        return f"{self.base_path}_{slot}{WALLPAPER_FORMATS[self.format][1]}"
+
+    @property
+    def path(self):
+        """最近发布的壁纸文件；还没有发布过时为第一个槽位"""
+        return self.published_path or self.slot_path(WALLPAPER_SLOTS[0])
+
+    def _next_slot_path(self):
+        """下一次写入的槽位：与最近发布的不同；刚启动时选择较旧的一个（上次运行时桌面可能正在使用较新的）"""
+        paths = [self.slot_path(slot) for slot in WALLPAPER_SLOTS]
+        if self.published_path in paths:
+            return paths[1 - paths.index(self.published_path)]
+        return min(paths, key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0.0)
+
+    def _encode_and_write(self, image, fmt, path=None):
+        data, seconds = encode_image(image, fmt, self.jpeg_quality)
+        path = path or self.path_for(fmt)
+        publish_atomic(path, data)
+        self.stats.record(fmt, seconds, len(data))
+        logger.info(f"壁纸已保存为{WALLPAPER_FORMATS[fmt][0]}格式: {path} (编码 {seconds * 1000:.1f} ms, {len(data) / 1024:.0f} KB)")
+        return path
+
+    def _write_backup(self, image):
+        try:
+            self._encode_and_write(image, self.backup_format)
+        except Exception as e:
+            logger.warning(f"保存备份壁纸失败: {e}")
+
+    def write(self, image):
+        """编码并发布壁纸，返回完整写入的文件路径"""
+        wallpaper_dir = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(wallpaper_dir):
+            logger.info(f"创建目录: {wallpaper_dir}")
+            os.makedirs(wallpaper_dir)
+
+        path = self._encode_and_write(image, self.format, self._next_slot_path())
+        self.published_path = path
+
+        if self.backup_format and self.backup_format != self.format:
+            if self._backup_executor is None:
+                self._backup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wallpaper-backup")
+            self._backup_executor.submit(self._write_backup, image)
+        return path
+
+    def view_path(self, name):
+        return f"{self.base_path}_{name}.png"
+
+    def write_view(self, name, png_bytes):
+        """把额外视图的截图原样写入（浏览器返回的已是PNG，不再解码和重新编码），返回文件路径"""
+        path = self.view_path(name)
+        publish_atomic(path, png_bytes)
+        logger.info(f"视图 {name} 已保存: {path} ({len(png_bytes) / 1024:.0f} KB)")
+        return path
+
+    def close(self):
+        """等待未完成的备份写入"""
+        if self._backup_executor is not None:
+            self._backup_executor.shutdown(wait=True)
+            self._backup_executor = None
@@ -0,0 +1,192 @@
+"""
+Browserless wind field ingestion
+Downloads earth-style JSON u/v component grids over HTTP and parses them into NumPy arrays
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+import requests
+from PIL import Image
+
+logger = logging.getLogger("wind_wallpaper")
+
+# 风场数据源（earth项目的JSON格式，可以替换为本地测试服务器）
+WIND_DATA_BASE_URL = "https://earth.nullschool.net"
+WIND_DATA_PATH = "/data/weather/current/current-wind-surface-level-gfs-1.0.json"
+
+# GRIB2参数编号：类别2（动量），2=U分量，3=V分量
+PARAMETER_CATEGORY_MOMENTUM = 2
+PARAMETER_NUMBER_U = 2
+PARAMETER_NUMBER_V = 3
+
+# 风速配色（m/s -> RGB），与Earth Nullschool的风速图层相近
+SPEED_COLOR_STOPS = [
+    (0, (37, 74, 255)),
+    (3, (0, 150, 254)),
+    (6, (18, 196, 200)),
+    (9, (0, 200, 120)),
+    (12, (150, 222, 60)),
+    (16, (255, 224, 0)),
+    (20, (255, 140, 0)),
+    (25, (240, 40, 40)),
+    (35, (180, 0, 140)),
+]
+
+# 复用HTTP连接
+_http_session = None
+
+
+def get_http_session():
+    global _http_session
+    if _http_session is None:
+        _http_session = requests.Session()
+    return _http_session
+
+
+class WindGrid:
+    """规则经纬度网格上的u/v风场，数据按行从北(la1)向南排列"""
+
+    def __init__(self, u, v, lo1, la1, dx, dy, ref_time=None, forecast_hours=0):
+        self.u = u
+        self.v = v
+        self.lo1 = lo1
+        self.la1 = la1
+        self.dx = dx
+        self.dy = dy
+        self.ref_time = ref_time
+        self.forecast_hours = forecast_hours
+
+    @property
+    def nx(self):
+        return self.u.shape[1]
+
+    @property
+    def ny(self):
+        return self.u.shape[0]
+
+    def valid_time(self):
+        """数据的有效时间（UTC）"""
+        if self.ref_time is None:
+            return None
+        return self.ref_time + timedelta(hours=self.forecast_hours)
+
+    def speed(self):
+        return np.hypot(self.u, self.v)
+
+    def interpolate(self, lon, lat):
+        """对任意经纬度数组做双线性插值，返回(u, v)"""
+        fx = np.mod((np.asarray(lon, dtype=np.float32) - self.lo1) / self.dx, self.nx)
+        fy = np.clip((self.la1 - np.asarray(lat, dtype=np.float32)) / self.dy, 0, self.ny - 1)
+
+        i0 = np.floor(fx).astype(np.intp)
+        j0 = np.floor(fy).astype(np.intp)
+        i1 = (i0 + 1) % self.nx
+        j1 = np.minimum(j0 + 1, self.ny - 1)
+        tx = (fx - i0).astype(np.float32)
+        ty = (fy - j0).astype(np.float32)
+
+        def bilinear(field):
+            top = field[j0, i0] * (1 - tx) + field[j0, i1] * tx
+            bottom = field[j1, i0] * (1 - tx) + field[j1, i1] * tx
+            return top * (1 - ty) + bottom * ty
+
+        return bilinear(self.u), bilinear(self.v)
+
+
+def parse_wind_records(records):
+    """解析earth格式的JSON记录列表（包含U、V两条记录）"""
+    components = {}
+    for record in records:
+        header = record.get("header", {})
+        if header.get("parameterCategory") != PARAMETER_CATEGORY_MOMENTUM:
+            continue
+        components[header.get("parameterNumber")] = record
+
+    if PARAMETER_NUMBER_U not in components or PARAMETER_NUMBER_V not in components:
+        raise ValueError("风场数据中缺少U或V分量")
+
+    header = components[PARAMETER_NUMBER_U]["header"]
+    nx, ny = int(header["nx"]), int(header["ny"])
+
+    def to_array(record):
+        data = np.array(record["data"], dtype=np.float32)
+        if data.size != nx * ny:
+            raise ValueError(f"风场数据长度 {data.size} 与网格尺寸 {nx}x{ny} 不符")
+        return np.nan_to_num(data.reshape(ny, nx))
+
+    ref_time = None
+    if header.get("refTime"):
+        ref_time = datetime.fromisoformat(header["refTime"].replace("Z", "+00:00"))
+
+    return WindGrid(
+        to_array(components[PARAMETER_NUMBER_U]),
+        to_array(components[PARAMETER_NUMBER_V]),
+        float(header["lo1"]),
+        float(header["la1"]),
+        float(header["dx"]),
+        float(header["dy"]),
+        ref_time=ref_time,
+        forecast_hours=int(header.get("forecastTime", 0)),
+    )
+
+
+def fetch_wind_payload(base_url=WIND_DATA_BASE_URL, path=WIND_DATA_PATH, timeout=30, validators=None):
+    """
+    下载风场数据的原始内容，返回 (内容, 验证信息)。
+    validators为上次的ETag/Last-Modified，服务器返回304（数据未变化）时内容为None。
+    """
+    url = base_url.rstrip("/") + path
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    logger.info(f"下载风场数据: {url}")
+    response = get_http_session().get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        logger.info("服务器返回304，风场数据未变化")
+        return None, validators
+    response.raise_for_status()
+    new_validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    return response.content, new_validators
+
+
+def parse_wind_payload(content):
+    return parse_wind_records(json.loads(content))
+
+
+def fetch_wind_grid(base_url=WIND_DATA_BASE_URL, path=WIND_DATA_PATH, timeout=30):
+    """通过HTTP下载风场数据并解析为WindGrid"""
+    content, _ = fetch_wind_payload(base_url, path, timeout)
+    grid = parse_wind_payload(content)
+    logger.info(f"风场数据已解析: 网格={grid.nx}x{grid.ny}, 时间={grid.valid_time()}")
+    return grid
+
+
+def speed_to_rgb(speed):
+    """按SPEED_COLOR_STOPS将风速映射为RGB数组"""
+    stops = np.array([s for s, _ in SPEED_COLOR_STOPS], dtype=np.float32)
+    colors = np.array([c for _, c in SPEED_COLOR_STOPS], dtype=np.float32)
+    rgb = np.empty(speed.shape + (3,), dtype=np.uint8)
+    for channel in range(3):
+        rgb[..., channel] = np.interp(speed, stops, colors[:, channel])
+    return rgb
+
+
+def render_speed_map(grid, width, height, reduce=1):
+    """将风场渲染为等距圆柱投影的风速着色图；reduce>1时先在低分辨率下计算再双线性放大"""
+    sample_width = max(1, -(-width // reduce))
+    sample_height = max(1, -(-height // reduce))
+    lon = -180 + (np.arange(sample_width, dtype=np.float32) + 0.5) * (360.0 / sample_width)
+    lat = 90 - (np.arange(sample_height, dtype=np.float32) + 0.5) * (180.0 / sample_height)
+    u, v = grid.interpolate(lon[np.newaxis, :], lat[:, np.newaxis])
+    image = Image.fromarray(speed_to_rgb(np.hypot(u, v)), "RGB")
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.BILINEAR)
+    return image
@@ -4,21 +4,63 @@ Embeds the Earth Nullschool wind flow visualization directly into the desktop ba
 """
 import sys
 import os
+import re
 import logging
 import traceback
 from datetime import datetime
 import time
-import requests
+import json
 import argparse
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel
-from PyQt5.QtCore import Qt, QTimer, QUrl, QSize, QPoint
+from PyQt5.QtCore import Qt, QTimer, QUrl, QSize, QPoint, QObject, pyqtSignal
 from PyQt5.QtGui import QIcon, QFont
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings, QWebEngineProfile
+from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings, QWebEngineProfile, QWebEnginePage, QWebEngineScript
+from PyQt5.QtWebEngineCore import QWebEngineUrlRequestInterceptor
+from scheduler import ModelRunScheduler, FixedIntervalScheduler, data_refresh_fragment
+from live_page_scripts import SETUP_JS, STATUS_JS, frame_governor_js, set_frame_rate_js
+from desktop_state import query_desktop_state
 
 # Configuration
 LOG_FILE = "wind_flow_live_wallpaper.log"
 WEATHER_URL = "https://earth.nullschool.net/zh-cn/#current/wind/surface/level/patterson=0.00,0.00,185"  # Earth Nullschool wind visualization
-UPDATE_INTERVAL = 3600  # Refresh interval (seconds), 1 hour
+UPDATE_INTERVAL = 3600  # Refresh interval (seconds) when SCHEDULE_MODE is "interval", 1 hour
+SCHEDULE_MODE = "model-run"  # "model-run": refresh when new GFS data is expected, "interval": fixed UPDATE_INTERVAL
+PROBE_TIMEOUT = 10  # Reachability probe timeout (seconds); the probe runs in the background while the page loads
+PROFILE_NAME = "wind_flow_live_wallpaper"  # Persistent QtWebEngine profile; its disk cache survives restarts
+CACHE_DIR = None  # HTTP disk cache directory, None uses the profile's default location
+CACHE_MAX_MB = 256  # Maximum size of the HTTP disk cache (MB)
+CACHE_BUST = "data"  # "data": revalidate only wind data requests, "none": plain HTTP caching, "all": clear the cache at startup
+DATA_URL_PATTERN = re.compile(r"/data/weather/.*\.json")  # Wind data requests (same pattern as the screenshot readiness check)
+REFRESH_MODE = "data"  # "data": re-fetch only the wind data inside the loaded page, "reload": full page reload
+DATA_CHECK_PATH = "/data/weather/current/current-wind-surface-level-gfs-1.0.json"  # HEAD-checked before each scheduled refresh; a new ETag/Last-Modified means new data
+REFRESH_TIMEOUT = 20  # Seconds to wait for the page to request new data before falling back to a full reload
+MAX_FPS = 30  # Animation frame-rate cap while the wallpaper is visible, 0 = display refresh rate
+OCCLUDED_FPS = 0  # Frame rate while the wallpaper is fully covered by other windows, 0 = freeze the page
+IDLE_PAUSE = 0  # Freeze the page after this many seconds without user input, 0 = never (kiosks never get input)
+GOVERNOR_INTERVAL = 2  # Seconds between visibility / lock / idle checks (on Linux logind is queried at most every desktop_state.LOGIND_POLL_INTERVAL)
+
+# 数据刷新：清除资源记录后把URL片段的日期切换到最新数据时间（scheduler.data_refresh_fragment），
+# earth只在片段变化时重新拉取数据；页面本身、WebGL上下文和注入的脚本保持不变
+CURRENT_FRAGMENT_JS = "location.hash.slice(1);"
+DATA_REFRESH_JS = """
+(function(fragment) {
+    performance.clearResourceTimings();
+    location.hash = fragment;
+    return true;
+})(%s);
+"""
+# 数据刷新的进度：是否已有风场数据请求，以及这些请求是否都已完成
+DATA_REFRESH_STATUS_JS = """
+(function(pattern) {
+    var re = new RegExp(pattern);
+    var entries = performance.getEntriesByType('resource').filter(function(e) { return re.test(e.name); });
+    return {
+        requests: entries.length,
+        done: entries.length > 0 && entries.every(function(e) { return e.responseEnd > 0; })
+    };
+})(%s);
+""" % json.dumps(DATA_URL_PATTERN.pattern)
 
 # 创建日志记录器
 logging.basicConfig(
@@ -31,6 +73,75 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+class NetworkProbe(QObject):
+    """网络连通性探测：用Qt网络栈异步发送HEAD请求，不阻塞界面线程；同一个QNetworkAccessManager复用连接"""
+
+    # URL, HTTP状态码（没有响应时为0）, 耗时（秒）, 错误信息（成功时为空）, 数据版本（ETag或Last-Modified，没有时为空）
+    finished = pyqtSignal(str, int, float, str, str)
+
+    def __init__(self, parent=None, timeout=PROBE_TIMEOUT):
+        super().__init__(parent)
+        self.manager = QNetworkAccessManager(self)
+        self.timeout = timeout
+        self.last_latency = None
+
+    def probe(self, url):
+        request = QNetworkRequest(QUrl(url))
+        request.setAttribute(QNetworkRequest.FollowRedirectsAttribute, True)
+        started = time.perf_counter()
+        reply = self.manager.head(request)
+        # 超时后中止请求，结果以错误的形式返回
+        timeout_timer = QTimer(reply)
+        timeout_timer.setSingleShot(True)
+        timeout_timer.timeout.connect(reply.abort)
+        timeout_timer.start(int(self.timeout * 1000))
+        reply.finished.connect(lambda: self._on_finished(url, reply, started))
+
+    def _on_finished(self, url, reply, started):
+        latency = time.perf_counter() - started
+        status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) or 0
+        if reply.error() == QNetworkReply.NoError:
+            error = ""
+        elif reply.error() == QNetworkReply.OperationCanceledError:
+            error = f"超过{self.timeout}秒没有响应"
+        else:
+            error = reply.errorString()
+        validator = bytes(reply.rawHeader(b"ETag") or reply.rawHeader(b"Last-Modified")).decode("latin-1")
+        reply.deleteLater()
+        self.last_latency = latency
+        self.finished.emit(url, int(status), latency, error, validator)
+
+
+class DataCacheBuster(QWebEngineUrlRequestInterceptor):
+    """只让风场数据请求绕过缓存（向服务器重新验证），脚本、地图等静态资源仍从磁盘缓存读取"""
+
+    def interceptRequest(self, info):
+        if DATA_URL_PATTERN.search(info.requestUrl().path()):
+            info.setHttpHeader(b"Cache-Control", b"no-cache")
+
+
+def create_web_profile(parent):
+    """创建持久化的命名配置：磁盘HTTP缓存有大小上限，重启后仍可使用"""
+    profile = QWebEngineProfile(PROFILE_NAME, parent)
+    if CACHE_DIR:
+        profile.setCachePath(os.path.abspath(CACHE_DIR))
+    profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+    profile.setHttpCacheMaximumSize(CACHE_MAX_MB * 1024 * 1024)
+    profile.setPersistentCookiesPolicy(QWebEngineProfile.AllowPersistentCookies)
+    if CACHE_BUST == "all":
+        logger.info("清除HTTP缓存")
+        profile.clearHttpCache()
+    elif CACHE_BUST == "data":
+        interceptor = DataCacheBuster(profile)
+        if hasattr(profile, "setUrlRequestInterceptor"):
+            profile.setUrlRequestInterceptor(interceptor)
+        else:
+            profile.setRequestInterceptor(interceptor)  # Qt 5.13之前
+    logger.info(f"浏览器配置: {PROFILE_NAME}, 缓存目录={profile.cachePath()}, "
+                f"上限={CACHE_MAX_MB} MB, 缓存策略={CACHE_BUST}")
+    return profile
+
+
 class WindFlowLiveWallpaper(QMainWindow):
     """风流场实时动态壁纸"""
 
@@ -67,11 +178,22 @@ class WindFlowLiveWallpaper(QMainWindow):
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.layout.setSpacing(0)
 
-        # 创建Web视图
+        # 创建Web视图（使用持久化的命名配置，页面脚本和地图数据从磁盘缓存读取）
+        # 配置的父对象是应用程序，保证它在页面之后才被销毁
+        self.web_profile = create_web_profile(QApplication.instance())
         self.web_view = QWebEngineView()
+        self.web_view.setPage(QWebEnginePage(self.web_profile, self.web_view))
+
+        # 帧率限制在页面脚本之前注入，完整刷新后仍然有效
+        governor_script = QWebEngineScript()
+        governor_script.setName("wind-frame-governor")
+        governor_script.setSourceCode(frame_governor_js(MAX_FPS))
+        governor_script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        governor_script.setWorldId(QWebEngineScript.MainWorld)
+        governor_script.setRunsOnSubFrames(False)
+        self.web_view.page().scripts().insert(governor_script)
 
         # 配置Web视图
-        self.web_view.page().profile().clearHttpCache()  # 清除HTTP缓存
         self.web_view.settings().setAttribute(QWebEngineSettings.JavascriptEnabled, True)
         self.web_view.settings().setAttribute(QWebEngineSettings.PluginsEnabled, True)
         self.web_view.settings().setAttribute(QWebEngineSettings.AutoLoadImages, True)
@@ -89,16 +211,46 @@ class WindFlowLiveWallpaper(QMainWindow):
         self.status_label.setFixedHeight(40)
         self.layout.addWidget(self.status_label)
 
-        # 创建定时器，用于定期刷新页面
+        # 创建定时器，在预计有新数据时刷新页面
+        if SCHEDULE_MODE == "model-run":
+            self.scheduler = ModelRunScheduler()
+        else:
+            self.scheduler = FixedIntervalScheduler(UPDATE_INTERVAL)
         self.refresh_timer = QTimer(self)
-        self.refresh_timer.timeout.connect(self.refresh_page)
-        self.refresh_timer.start(UPDATE_INTERVAL * 1000)  # 毫秒
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.on_refresh_timer)
+        self.data_check_url = QUrl(WEATHER_URL).resolved(QUrl(DATA_CHECK_PATH)).toString()
+        self.data_validator = None  # 上次检查到的风场数据版本
+        self.data_check_scheduled = False  # 正在进行的数据检查是否由定时刷新发起（否则只记录启动时的版本）
+        self.schedule_next_refresh()
 
         # 创建定时器，用于隐藏状态标签
         self.status_timer = QTimer(self)
         self.status_timer.timeout.connect(self.hide_status)
         self.status_timer.setSingleShot(True)
 
+        # 数据刷新的进度轮询，以及完整刷新时的计时
+        self.page_ready = False
+        self.refresh_started = None
+        self.reload_started = None
+        self.blank_started = None
+        self.refresh_poll_timer = QTimer(self)
+        self.refresh_poll_timer.timeout.connect(self.poll_data_refresh)
+
+        # 渲染状态：visible按MAX_FPS渲染，occluded（被完全遮挡）按OCCLUDED_FPS渲染或冻结，idle和locked冻结页面
+        self.render_state = None
+        self.render_state_since = time.perf_counter()
+        self.page_frozen = False
+        self.deferred_refresh = None  # 冻结期间到期的刷新，值为是否完整刷新
+        self.governor_timer = QTimer(self)
+        self.governor_timer.timeout.connect(self.update_render_state)
+        if GOVERNOR_INTERVAL > 0:
+            self.governor_timer.start(int(GOVERNOR_INTERVAL * 1000))
+
+        # 网络探测在后台进行，与页面加载并行
+        self.network_probe = NetworkProbe(self)
+        self.network_probe.finished.connect(self.on_probe_finished)
+
         # 加载中国气象网风流场页面
         self.load_wind_flow_page()
 
@@ -112,18 +264,6 @@ class WindFlowLiveWallpaper(QMainWindow):
             self.status_label.show()
             self.status_timer.start(10000)  # Hide status label after 10 seconds
 
-            # 测试网络连接
-            try:
-                logger.info(f"测试网络连接到 {WEATHER_URL}")
-                test_response = requests.head(WEATHER_URL, timeout=10)
-                logger.info(f"网络连接测试结果: 状态码 {test_response.status_code}")
-                if test_response.status_code >= 400:
-                    logger.warning(f"网站返回错误状态码: {test_response.status_code}")
-                    self.status_label.setText(f"网站返回错误状态码: {test_response.status_code}，尝试继续加载...")
-            except Exception as net_e:
-                logger.warning(f"网络连接测试失败: {net_e}")
-                self.status_label.setText(f"网络连接测试失败: {net_e}，尝试继续加载...")
-
             # 配置Web视图
             logger.info("配置Web视图")
             settings = self.web_view.settings()
@@ -139,10 +279,6 @@ class WindFlowLiveWallpaper(QMainWindow):
             page.profile().setHttpUserAgent(user_agent)
             logger.info(f"设置用户代理: {user_agent}")
 
-            # 清除缓存
-            logger.info("清除缓存")
-            page.profile().clearHttpCache()
-
             # 加载中国气象网雷达页面
             logger.info(f"开始加载URL: {WEATHER_URL}")
             self.web_view.load(QUrl(WEATHER_URL))
@@ -155,13 +291,35 @@ class WindFlowLiveWallpaper(QMainWindow):
 
             # 连接错误信号
             page.loadStarted.connect(lambda: logger.info("页面开始加载"))
+            page.loadStarted.connect(self.on_load_started)
             page.loadFinished.connect(lambda ok: logger.info(f"页面加载完成: {'成功' if ok else '失败'}"))
 
+            # 页面已开始加载，同时在后台测试网络连接
+            logger.info(f"测试网络连接到 {WEATHER_URL}")
+            self.network_probe.probe(WEATHER_URL)
+            self.network_probe.probe(self.data_check_url)
+
         except Exception as e:
             logger.error(f"加载页面失败: {e}")
             logger.error(traceback.format_exc())
             self.status_label.setText(f"加载页面失败: {e}")
 
+    def on_probe_finished(self, url, status, latency, error, validator):
+        """网络探测完成（页面加载不等待探测结果，这里只记录并提示）"""
+        if url == self.data_check_url:
+            self.on_data_checked(status, error, validator)
+            return
+        if status and status < 400:
+            logger.info(f"网络连接测试结果: 状态码 {status}, 耗时 {latency * 1000:.0f} ms")
+        elif status:
+            logger.warning(f"网站返回错误状态码: {status} (耗时 {latency * 1000:.0f} ms)")
+            self.status_label.setText(f"网站返回错误状态码: {status}，页面继续加载...")
+            self.status_label.show()
+        else:
+            logger.warning(f"网络连接测试失败: {error} (耗时 {latency * 1000:.0f} ms)")
+            self.status_label.setText(f"网络连接测试失败: {error}，页面继续加载...")
+            self.status_label.show()
+
     def on_load_progress(self, progress):
         """Page loading progress update"""
         logger.debug(f"Page loading progress: {progress}%")
@@ -169,8 +327,24 @@ class WindFlowLiveWallpaper(QMainWindow):
             logger.info(f"Page loading progress: {progress}%")
         self.status_label.setText(f"Loading Earth Nullschool wind visualization... {progress}%")
 
+    def on_load_started(self):
+        """完整加载开始：旧页面被销毁，从这里开始计算空白时间"""
+        self.page_ready = False
+        # 完整加载取代正在进行的数据刷新
+        self.refresh_poll_timer.stop()
+        self.refresh_started = None
+        if self.reload_started is not None and self.blank_started is None:
+            self.blank_started = time.perf_counter()
+
     def on_page_loaded(self, success):
         """Process after page loading is complete"""
+        self.page_ready = success
+        if self.reload_started is not None:
+            now = time.perf_counter()
+            blank = now - self.blank_started if self.blank_started is not None else 0.0
+            logger.info(f"完整刷新{'完成' if success else '失败'}: 耗时 {now - self.reload_started:.2f} 秒, "
+                        f"空白时间约 {blank:.2f} 秒")
+            self.reload_started = self.blank_started = None
         if success:
             logger.info("Page loaded successfully, injecting JavaScript code")
             self.status_label.setText("Page loaded successfully, processing...")
@@ -178,281 +352,12 @@ class WindFlowLiveWallpaper(QMainWindow):
             # 获取页面HTML源码进行调试
             self.web_view.page().toHtml(self.debug_html)
 
-            # 注入JavaScript代码，切换到风流场视图并隐藏不需要的元素
-            js_code = """
-            // 调试函数：记录页面信息
-            function logPageInfo() {
-                console.log('页面标题:', document.title);
-                console.log('页面URL:', window.location.href);
-
-                // 记录所有可点击元素
-                var clickableElements = document.querySelectorAll('a, button, li, div[onclick], span[onclick]');
-                console.log('可点击元素数量:', clickableElements.length);
-                for (var i = 0; i < Math.min(clickableElements.length, 20); i++) {
-                    console.log('元素', i, ':', clickableElements[i].tagName, clickableElements[i].textContent.trim());
-                }
-
-                // 记录所有菜单项
-                var menuItems = document.querySelectorAll('.menu-item, .nav-item, li');
-                console.log('菜单项数量:', menuItems.length);
-                for (var i = 0; i < Math.min(menuItems.length, 20); i++) {
-                    if (menuItems[i].textContent) {
-                        console.log('菜单项', i, ':', menuItems[i].textContent.trim());
-                    }
-                }
-            }
-
-            // 函数：切换到风流场视图
-            function switchToWindFlow() {
-                console.log('尝试切换到风流场视图...');
-
-                // 根据截图分析，尝试查找底部的风流场按钮或选项
-                var windFlowButtons = [];
-
-                // 查找底部工具栏中的按钮
-                var bottomButtons = document.querySelectorAll('.bottom-toolbar button, .bottom-bar button, .toolbar button');
-                console.log('底部按钮数量:', bottomButtons.length);
-
-                // 查找所有按钮和可点击元素
-                var allButtons = document.querySelectorAll('button, [role="button"], .btn, .button');
-                console.log('所有按钮数量:', allButtons.length);
-
-                // 查找所有包含"风"字的元素
-                var windElements = [];
-                var allElements = document.querySelectorAll('*');
-                for (var i = 0; i < allElements.length; i++) {
-                    if (allElements[i].textContent &&
-                        (allElements[i].textContent.includes('风') ||
-                         allElements[i].textContent.includes('流场'))) {
-                        windElements.push(allElements[i]);
-                    }
-                }
-                console.log('包含"风"字的元素数量:', windElements.length);
-
-                // 尝试点击风流场相关元素
-                for (var i = 0; i < windElements.length; i++) {
-                    try {
-                        console.log('尝试点击元素:', windElements[i].textContent);
-                        windElements[i].click();
-                        console.log('已点击风流场相关元素');
-                        break;
-                    } catch (e) {
-                        console.error('点击失败:', e);
-                    }
-                }
-
-                // 特定网站的处理：根据截图，尝试查找并点击特定位置的按钮
-                try {
-                    // 尝试查找底部工具栏中的按钮
-                    var toolbarButtons = document.querySelectorAll('.toolbar button, .toolbar-item');
-                    if (toolbarButtons.length > 0) {
-                        console.log('找到工具栏按钮数量:', toolbarButtons.length);
-                        // 尝试点击可能的风流场按钮（通常在底部工具栏）
-                        for (var i = 0; i < toolbarButtons.length; i++) {
-                            console.log('工具栏按钮', i, ':', toolbarButtons[i].textContent);
-                        }
-
-                        // 根据截图，风流场按钮可能在底部工具栏的左侧
-                        if (toolbarButtons.length >= 2) {
-                            console.log('尝试点击第二个工具栏按钮');
-                            toolbarButtons[1].click();
-                        }
-                    }
-
-                    // 尝试查找左侧的图层控制面板
-                    var layerControls = document.querySelectorAll('.layer-control, .layer-panel, .sidebar-left');
-                    if (layerControls.length > 0) {
-                        console.log('找到图层控制面板');
-                        var layerItems = layerControls[0].querySelectorAll('li, .layer-item');
-                        for (var i = 0; i < layerItems.length; i++) {
-                            if (layerItems[i].textContent &&
-                                (layerItems[i].textContent.includes('风') ||
-                                 layerItems[i].textContent.includes('流场'))) {
-                                console.log('找到风流场图层选项:', layerItems[i].textContent);
-                                layerItems[i].click();
-                                break;
-                            }
-                        }
-                    }
-                } catch (e) {
-                    console.error('特定网站处理失败:', e);
-                }
-            }
-
-            // 函数：隐藏所有UI元素，只保留地图
-            function hideAllUIElements() {
-                console.log('隐藏所有UI元素...');
-
-                // 隐藏顶部标题栏和logo
-                var header = document.querySelector('header, .header, .navbar, .nav-bar, .top-bar');
-                if (header) {
-                    console.log('隐藏顶部标题栏');
-                    header.style.display = 'none';
-                }
-
-                // 隐藏所有可能的UI元素
-                var uiElements = [
-                    'header', '.header', '.navbar', '.nav-bar', '.top-bar',
-                    'footer', '.footer', '.bottom-bar',
-                    '.sidebar', '.sidebar-left', '.sidebar-right',
-                    '.panel', '.control-panel', '.layer-panel',
-                    '.logo', '.brand', '.title', '.app-title',
-                    '.toolbar', '.toolbar-top', '.toolbar-bottom',
-                    '.menu', '.menu-bar', '.nav-menu',
-                    '.search', '.search-box', '.search-bar',
-                    '.zoom-control', '.map-controls', '.leaflet-control',
-                    '.legend', '.map-legend', '.color-legend',
-                    '.info-box', '.info-panel', '.popup',
-                    '.attribution', '.copyright', '.credits'
-                ];
-
-                // 隐藏所有匹配的元素
-                uiElements.forEach(function(selector) {
-                    var elements = document.querySelectorAll(selector);
-                    for (var i = 0; i < elements.length; i++) {
-                        console.log('隐藏元素:', selector);
-                        elements[i].style.display = 'none';
-                    }
-                });
-
-                // 隐藏所有按钮和控件
-                var controls = document.querySelectorAll('button, .btn, .button, input, select, .control');
-                for (var i = 0; i < controls.length; i++) {
-                    controls[i].style.display = 'none';
-                }
-
-                // 特别处理：隐藏顶部的标题和logo（根据截图）
-                var topElements = document.querySelectorAll('.top, .top-container, .header-container');
-                for (var i = 0; i < topElements.length; i++) {
-                    topElements[i].style.display = 'none';
-                }
-
-                // 查找并隐藏所有可能的标题文本
-                var titleElements = document.querySelectorAll('h1, h2, h3, .title, .heading');
-                for (var i = 0; i < titleElements.length; i++) {
-                    titleElements[i].style.display = 'none';
-                }
-
-                // 查找并隐藏所有可能的logo
-                var logoElements = document.querySelectorAll('.logo, .brand, img[src*="logo"]');
-                for (var i = 0; i < logoElements.length; i++) {
-                    logoElements[i].style.display = 'none';
-                }
-            }
-
-            // 函数：使地图全屏显示
-            function makeMapFullscreen() {
-                console.log('使地图全屏显示...');
-
-                // 查找地图容器
-                var mapContainers = [
-                    '.map-container', '.map', '#map',
-                    '.leaflet-container', '.mapContainer',
-                    'div[class*="map"]', 'div[id*="map"]',
-                    '.amap-container', '.bmap-container', '.tmap-container'
-                ];
-
-                var mapContainer = null;
-
-                // 尝试查找地图容器
-                for (var i = 0; i < mapContainers.length; i++) {
-                    var containers = document.querySelectorAll(mapContainers[i]);
-                    if (containers.length > 0) {
-                        mapContainer = containers[0];
-                        console.log('找到地图容器:', mapContainers[i]);
-                        break;
-                    }
-                }
-
-                // 如果找不到地图容器，尝试查找最大的容器
-                if (!mapContainer) {
-                    console.log('未找到地图容器，尝试查找最大的容器');
-                    var allDivs = document.querySelectorAll('div');
-                    var largestDiv = null;
-                    var largestArea = 0;
-
-                    for (var i = 0; i < allDivs.length; i++) {
-                        var rect = allDivs[i].getBoundingClientRect();
-                        var area = rect.width * rect.height;
-                        if (area > largestArea) {
-                            largestArea = area;
-                            largestDiv = allDivs[i];
-                        }
-                    }
-
-                    if (largestDiv) {
-                        mapContainer = largestDiv;
-                        console.log('使用最大的div作为地图容器');
-                    }
-                }
-
-                // 如果找到地图容器，使其全屏显示
-                if (mapContainer) {
-                    console.log('设置地图容器为全屏');
-
-                    // 保存原始样式
-                    var originalStyle = {
-                        position: mapContainer.style.position,
-                        top: mapContainer.style.top,
-                        left: mapContainer.style.left,
-                        width: mapContainer.style.width,
-                        height: mapContainer.style.height,
-                        zIndex: mapContainer.style.zIndex
-                    };
-
-                    // 设置为全屏
-                    mapContainer.style.position = 'fixed';
-                    mapContainer.style.top = '0';
-                    mapContainer.style.left = '0';
-                    mapContainer.style.width = '100vw';
-                    mapContainer.style.height = '100vh';
-                    mapContainer.style.zIndex = '9999';
-
-                    // 设置页面背景为黑色
-                    document.body.style.backgroundColor = 'black';
-                    document.body.style.margin = '0';
-                    document.body.style.padding = '0';
-                    document.body.style.overflow = 'hidden';
-
-                    return true;
-                } else {
-                    console.log('未找到地图容器');
-                    return false;
-                }
-            }
-
-            // 主函数
-            function main() {
-                // 记录页面信息
-                logPageInfo();
-
-                // 切换到风流场视图
-                switchToWindFlow();
-
-                // 等待一段时间，让风流场加载
-                setTimeout(function() {
-                    // 隐藏所有UI元素
-                    hideAllUIElements();
-
-                    // 使地图全屏显示
-                    makeMapFullscreen();
-
-                    console.log('处理完成');
-                }, 2000);
-            }
-
-            // 执行主函数
-            main();
-
-            // 设置定期检查，确保UI元素保持隐藏
-            setInterval(function() {
-                hideAllUIElements();
-                makeMapFullscreen();
-            }, 5000);
-            """
-
+            # 注入JavaScript代码，切换到风流场视图并隐藏不需要的元素（只注入一次，之后由MutationObserver维持）
             # 执行JavaScript代码
-            self.web_view.page().runJavaScript(js_code, self.on_js_executed)
+            self.web_view.page().runJavaScript(SETUP_JS, self.on_js_executed)
+
+            # 加载期间不冻结页面，加载完成后按当前的渲染状态处理
+            self.apply_render_state()
         else:
             logger.error("页面加载失败")
             self.status_label.setText("页面加载失败，请检查网络连接")
@@ -528,7 +433,7 @@ class WindFlowLiveWallpaper(QMainWindow):
                 self.status_label.setText("处理页面失败，请按F5刷新")
 
                 # 尝试重新加载页面
-                QTimer.singleShot(5000, self.refresh_page)
+                QTimer.singleShot(5000, lambda: self.refresh_page(full=True))
         except Exception as e:
             logger.error(f"处理JavaScript执行结果时出错: {e}")
             logger.error(traceback.format_exc())
@@ -538,45 +443,7 @@ class WindFlowLiveWallpaper(QMainWindow):
         """检查页面状态"""
         try:
             # 注入JavaScript代码，检查页面状态
-            js_check = """
-            // 检查页面状态
-            function checkPageStatus() {
-                // 检查是否有地图容器
-                var mapContainer = document.querySelector('.mapContainer') ||
-                                   document.querySelector('div[class*="map"]') ||
-                                   document.querySelector('div[id*="map"]');
-
-                // 检查是否有风流场相关元素
-                var windElements = [];
-                var elements = document.querySelectorAll('*');
-                for (var i = 0; i < elements.length; i++) {
-                    if (elements[i].textContent &&
-                        (elements[i].textContent.includes('风流场') ||
-                         elements[i].textContent.includes('风向') ||
-                         elements[i].textContent.includes('风速'))) {
-                        windElements.push({
-                            tag: elements[i].tagName,
-                            text: elements[i].textContent.trim(),
-                            visible: elements[i].offsetParent !== null
-                        });
-                    }
-                }
-
-                var result = {
-                    url: window.location.href,
-                    title: document.title,
-                    hasMapContainer: mapContainer !== null,
-                    windElements: windElements.slice(0, 10)  // 只返回前10个元素
-                };
-
-                console.log('页面状态检查结果:', result);
-                return result;
-            }
-
-            checkPageStatus();
-            """
-
-            self.web_view.page().runJavaScript(js_check, self.on_check_status)
+            self.web_view.page().runJavaScript(STATUS_JS, self.on_check_status)
         except Exception as e:
             logger.error(f"检查页面状态时出错: {e}")
             logger.error(traceback.format_exc())
@@ -587,12 +454,16 @@ class WindFlowLiveWallpaper(QMainWindow):
             if result:
                 logger.info("页面状态检查结果:")
                 for key, value in result.items():
-                    if key != 'windElements':
-                        logger.info(f"  {key}: {value}")
-                    else:
+                    if key == 'windElements':
                         logger.info(f"  风流场相关元素数量: {len(value)}")
                         for i, elem in enumerate(value):
                             logger.info(f"    元素{i+1}: {elem['tag']} - {elem['text']} - 可见: {elem['visible']}")
+                    elif key == 'injectedStats' and value:
+                        logger.info(f"  注入脚本耗时: 初始化 {value['setupMs']:.1f} ms, "
+                                    f"DOM变化检查 {value['observerCalls']:.0f} 次共 {value['observerMs']:.1f} ms, "
+                                    f"全屏设置 {value['fullscreenRuns']:.0f} 次")
+                    else:
+                        logger.info(f"  {key}: {value}")
 
                 # Check if wind flow visualization loaded successfully
                 if result.get('hasMapContainer', False):
@@ -613,22 +484,179 @@ class WindFlowLiveWallpaper(QMainWindow):
         """隐藏状态标签"""
         self.status_label.hide()
 
-    def refresh_page(self):
-        """刷新页面"""
+    def schedule_next_refresh(self):
+        """按调度器安排下一次刷新"""
+        delay = self.scheduler.next_delay()
+        self.refresh_timer.start(int(delay * 1000))  # 毫秒
+        logger.info(f"下次刷新在 {delay:.0f} 秒后")
+
+    def on_refresh_timer(self):
+        """定时刷新：先用HEAD请求检查风场数据是否有新版本，结果决定是否刷新页面和下次刷新的时间"""
+        self.data_check_scheduled = True
+        self.network_probe.probe(self.data_check_url)
+
+    def on_data_checked(self, status, error, validator):
+        if not self.data_check_scheduled:
+            # 页面加载时的检查：记录页面当前数据的版本
+            if status and status < 400 and validator:
+                self.data_validator = validator
+            return
+        self.data_check_scheduled = False
+        if not status or status >= 400:
+            # 无法确认，按数据未变化处理，调度器会在发布窗口内稍后重试
+            logger.warning(f"检查风场数据失败: {error or status}")
+            changed = False
+        elif not validator:
+            logger.info("风场数据没有版本信息，直接刷新")
+            changed = True
+        else:
+            changed = validator != self.data_validator
+            self.data_validator = validator
+            logger.info(f"风场数据{'有新版本' if changed else '没有变化'}: {validator}")
+        if changed:
+            self.refresh_page()
+        self.scheduler.record_result(changed)
+        self.schedule_next_refresh()
+
+    def refresh_page(self, full=False):
+        """刷新：默认只在已加载的页面中重新获取风场数据，失败时才完整重新加载"""
+        if self.page_frozen:
+            # 冻结的页面不执行脚本，恢复渲染后再刷新
+            logger.info("页面已冻结，恢复渲染后再刷新")
+            self.deferred_refresh = bool(full or self.deferred_refresh)
+            return
+        if full or REFRESH_MODE == "reload" or not self.page_ready:
+            self.reload_page()
+            return
+        if self.refresh_started is not None:
+            logger.info("数据刷新仍在进行，忽略本次刷新")
+            return
+        logger.info("刷新风场数据（不重新加载页面）")
+        self.refresh_started = time.perf_counter()
+        self.web_view.page().runJavaScript(CURRENT_FRAGMENT_JS, self.on_current_fragment)
+
+    def on_current_fragment(self, current):
+        if not isinstance(current, str):
+            logger.warning("无法读取页面的URL片段，改为完整刷新")
+            self.refresh_started = None
+            self.reload_page()
+            return
+        fragment = data_refresh_fragment(current, WEATHER_URL.partition("#")[2])
+        logger.debug(f"切换URL片段: #{current} -> #{fragment}")
+        self.web_view.page().runJavaScript(DATA_REFRESH_JS % json.dumps(fragment), self.on_data_refresh_started)
+
+    def on_data_refresh_started(self, result):
+        if not result:
+            logger.warning("无法在页面中触发数据刷新，改为完整刷新")
+            self.refresh_started = None
+            self.reload_page()
+            return
+        self.refresh_poll_timer.start(250)
+
+    def poll_data_refresh(self):
+        self.web_view.page().runJavaScript(DATA_REFRESH_STATUS_JS, self.on_data_refresh_status)
+
+    def on_data_refresh_status(self, status):
+        if self.refresh_started is None:
+            return
+        elapsed = time.perf_counter() - self.refresh_started
+        if status and status.get("done"):
+            self.refresh_poll_timer.stop()
+            self.refresh_started = None
+            logger.info(f"数据刷新完成: 耗时 {elapsed:.2f} 秒, 数据请求 {status.get('requests')} 个, 空白时间 0 秒")
+        elif status and status.get("requests"):
+            # 数据请求已发出、仍在下载：页面在正常工作，重新加载也不会更快，只在明显卡住时才放弃
+            if elapsed > 3 * REFRESH_TIMEOUT:
+                self.refresh_poll_timer.stop()
+                self.refresh_started = None
+                logger.warning(f"风场数据在 {elapsed:.0f} 秒内没有下载完成，改为完整刷新")
+                self.reload_page()
+        elif elapsed > REFRESH_TIMEOUT:
+            self.refresh_poll_timer.stop()
+            self.refresh_started = None
+            logger.warning(f"切换URL片段后 {REFRESH_TIMEOUT} 秒内页面没有请求风场数据，改为完整刷新")
+            self.reload_page()
+
+    def reload_page(self):
+        """完整重新加载页面"""
         logger.info("刷新页面")
         self.status_label.setText("正在刷新页面...")
         self.status_label.show()
+        self.reload_started = time.perf_counter()
+        self.blank_started = None
         self.web_view.reload()
         self.status_timer.start(10000)  # 10秒后隐藏状态标签
 
+    def detect_render_state(self):
+        """根据锁屏、空闲时间和遮挡情况决定渲染状态"""
+        desktop = query_desktop_state(int(self.winId()))
+        if desktop.locked:
+            return "locked"
+        if IDLE_PAUSE > 0 and desktop.idle_seconds is not None and desktop.idle_seconds >= IDLE_PAUSE:
+            return "idle"
+        # 平台无法检测遮挡时，至少处理窗口被最小化或没有映射到屏幕上的情况
+        window = self.windowHandle()
+        if desktop.covered or window is None or not window.isExposed() or self.isMinimized():
+            return "occluded"
+        return "visible"
+
+    def update_render_state(self):
+        """定期检查渲染状态，变化时调整帧率或冻结页面"""
+        state = self.detect_render_state()
+        if state == self.render_state:
+            return
+        now = time.perf_counter()
+        if self.render_state is not None:
+            logger.info(f"渲染状态: {self.render_state} -> {state} (持续 {now - self.render_state_since:.0f} 秒)")
+        self.render_state = state
+        self.render_state_since = now
+        self.apply_render_state()
+
+    def apply_render_state(self):
+        if self.render_state is None or self.render_state == "visible":
+            fps = MAX_FPS
+        elif self.render_state == "occluded" and OCCLUDED_FPS > 0:
+            fps = OCCLUDED_FPS
+        elif self.page_ready:
+            self.set_page_frozen(True)
+            return
+        else:
+            fps = MAX_FPS
+        self.set_page_frozen(False)
+        self.web_view.page().runJavaScript(set_frame_rate_js(fps))
+        logger.debug(f"动画帧率限制: {fps or '不限'} fps")
+
+    def set_page_frozen(self, frozen):
+        """
+        冻结或恢复页面。Qt 5.14起先隐藏页面再进入Frozen生命周期状态，脚本、定时器和渲染全部停止；
+        更早的版本只能暂停页面的动画帧。
+        """
+        if frozen == self.page_frozen:
+            return
+        self.page_frozen = frozen
+        page = self.web_view.page()
+        if hasattr(page, "setLifecycleState"):
+            if frozen:
+                page.setVisible(False)
+                page.setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+            else:
+                page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+                page.setVisible(True)
+        else:
+            page.runJavaScript(set_frame_rate_js(0, paused=frozen))
+        logger.info("页面已冻结" if frozen else "页面已恢复渲染")
+        if not frozen and self.deferred_refresh is not None:
+            full, self.deferred_refresh = self.deferred_refresh, None
+            self.refresh_page(full=full)
+
     def keyPressEvent(self, event):
         """按键事件处理"""
         # 按ESC键退出程序
         if event.key() == Qt.Key_Escape:
             self.close()
-        # 按F5键刷新页面
+        # 按F5键刷新数据，Ctrl+F5完整刷新页面
         elif event.key() == Qt.Key_F5:
-            self.refresh_page()
+            self.refresh_page(full=bool(event.modifiers() & Qt.ControlModifier))
         # 按F1键显示/隐藏状态标签
         elif event.key() == Qt.Key_F1:
             if self.status_label.isVisible():
@@ -670,6 +698,21 @@ def parse_arguments():
     parser.add_argument("--verbose", action="store_true", help="启用详细日志")
     parser.add_argument("--url", default=WEATHER_URL, help=f"指定要加载的URL (默认: {WEATHER_URL})")
     parser.add_argument("--interval", type=int, default=UPDATE_INTERVAL, help=f"刷新间隔（秒）(默认: {UPDATE_INTERVAL})")
+    parser.add_argument("--schedule", choices=["model-run", "interval"], default=SCHEDULE_MODE,
+                        help=f"刷新时机: model-run=按GFS数据发布时间, interval=固定间隔 (默认: {SCHEDULE_MODE})")
+    parser.add_argument("--refresh-mode", choices=["data", "reload"], default=REFRESH_MODE,
+                        help=f"刷新方式: data=只重新获取风场数据, reload=完整重新加载页面 (默认: {REFRESH_MODE})")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="HTTP磁盘缓存目录 (默认: 配置的默认位置)")
+    parser.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_MB,
+                        help=f"HTTP磁盘缓存上限 (MB) (默认: {CACHE_MAX_MB})")
+    parser.add_argument("--cache-bust", choices=["data", "none", "all"], default=CACHE_BUST,
+                        help=f"缓存策略: data=只重新验证风场数据, none=普通HTTP缓存, all=启动时清除缓存 (默认: {CACHE_BUST})")
+    parser.add_argument("--max-fps", type=int, default=MAX_FPS,
+                        help=f"可见时的动画帧率上限，0为不限制 (默认: {MAX_FPS})")
+    parser.add_argument("--occluded-fps", type=int, default=OCCLUDED_FPS,
+                        help=f"被其他窗口完全遮挡时的帧率，0为冻结页面 (默认: {OCCLUDED_FPS})")
+    parser.add_argument("--idle-pause", type=int, default=IDLE_PAUSE,
+                        help=f"无用户输入超过此秒数后冻结页面，0为不冻结 (默认: {IDLE_PAUSE})")
     parser.add_argument("--test", action="store_true", help="测试模式，不设置为桌面背景")
     return parser.parse_args()
 
@@ -685,7 +728,16 @@ def main():
             print("已启用详细日志模式")
 
         # 更新全局变量
-        global WEATHER_URL, UPDATE_INTERVAL
+        global WEATHER_URL, UPDATE_INTERVAL, SCHEDULE_MODE, CACHE_DIR, CACHE_MAX_MB, CACHE_BUST, REFRESH_MODE
+        global MAX_FPS, OCCLUDED_FPS, IDLE_PAUSE
+        REFRESH_MODE = args.refresh_mode
+        MAX_FPS = args.max_fps
+        OCCLUDED_FPS = args.occluded_fps
+        IDLE_PAUSE = args.idle_pause
+        SCHEDULE_MODE = args.schedule
+        CACHE_DIR = args.cache_dir
+        CACHE_MAX_MB = args.cache_max_mb
+        CACHE_BUST = args.cache_bust
         if args.url != WEATHER_URL:
             WEATHER_URL = args.url
             print(f"使用自定义URL: {WEATHER_URL}")
@@ -698,7 +750,12 @@ def main():
         logger.info("启动中国气象网风流场实时动态壁纸")
         logger.info("="*50)
         logger.info(f"URL: {WEATHER_URL}")
-        logger.info(f"刷新间隔: {UPDATE_INTERVAL}秒")
+        if SCHEDULE_MODE == "model-run":
+            logger.info("刷新时机: 按GFS数据发布时间")
+        else:
+            logger.info(f"刷新间隔: {UPDATE_INTERVAL}秒")
+        logger.info(f"帧率上限: {MAX_FPS or '不限'} fps, 遮挡时: {OCCLUDED_FPS or '冻结'}, "
+                    f"空闲冻结: {f'{IDLE_PAUSE}秒' if IDLE_PAUSE else '否'}")
         logger.info(f"测试模式: {'是' if args.test else '否'}")
 
         # 检查依赖项
@@ -707,25 +764,7 @@ def main():
             input("按Enter键退出...")
             return 1
 
-        # 测试网络连接
-        try:
-            logger.info(f"测试网络连接到 {WEATHER_URL}")
-            test_response = requests.head(WEATHER_URL, timeout=10)
-            logger.info(f"网络连接测试结果: 状态码 {test_response.status_code}")
-            if test_response.status_code >= 400:
-                logger.warning(f"网站返回错误状态码: {test_response.status_code}")
-                print(f"警告: 网站返回错误状态码: {test_response.status_code}")
-                response = input("是否继续? (y/n): ")
-                if response.lower() != 'y':
-                    return 1
-        except Exception as e:
-            logger.warning(f"网络连接测试失败: {e}")
-            print(f"警告: 网络连接测试失败: {e}")
-            response = input("是否继续? (y/n): ")
-            if response.lower() != 'y':
-                return 1
-
-        # 创建应用程序
+        # 创建应用程序（网络连接在窗口中与页面加载并行测试，结果显示在状态栏）
         app = QApplication(sys.argv)
 
         # 创建主窗口
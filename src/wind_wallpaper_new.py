@@ -1,15 +1,11 @@
 import requests
 import json
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import ctypes
 import os
 import time
 import math
-import schedule
 import re
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -18,6 +14,25 @@ from datetime import datetime
 import logging
 import sys
 import traceback
+import atexit
+import argparse
+import asyncio
+from capture_session import CaptureSession, CaptureView, CAPTURE_MODES, wait_for_render_ready
+from capture_pool import CapturePool, MAX_WORKER_MEMORY_MB
+import wind_data
+from particle_renderer import ParticleRenderer, render_wind_particles
+from update_state import UpdateState, content_hash
+from pipeline import WindFrame, StagedPipeline, PipelineStage, decode_png, save_debug_image
+from wallpaper_output import WallpaperWriter, WALLPAPER_FORMATS, WALLPAPER_SLOTS
+from animation import ANIMATION_FORMATS, write_animation
+from wallpaper_backends import WallpaperApplier, BACKEND_NAMES, create_backends
+from monitors import OutputLayout, discover_monitors, parse_geometry
+from overlay import TextOverlay
+from daemon import WallpaperDaemon
+from scheduler import ModelRunScheduler, FixedIntervalScheduler
+import metrics
+from metrics import MetricsRecorder
+import projection
 
 # 配置日志记录
 LOG_FILE = "wind_wallpaper.log"
@@ -60,55 +75,152 @@ sys.excepthook = log_uncaught_exceptions
 
 # Configuration
 WEATHER_URL = "https://earth.nullschool.net/zh-cn/#current/wind/surface/level/patterson=0.00,0.00,185"  # Earth Nullschool wind visualization
-WALLPAPER_PATH = "wind_wallpaper.png"  # Wallpaper save path
+WALLPAPER_PATH = "wind_wallpaper.bmp"  # Wallpaper base path; written alternately to wind_wallpaper_a/_b with the WALLPAPER_FORMAT extension
+WALLPAPER_FORMAT = "bmp"  # Wallpaper encoding: "bmp" (raw), "png" (fast compression) or "jpeg"
+JPEG_QUALITY = 90  # Quality used when WALLPAPER_FORMAT is "jpeg"
+WALLPAPER_BACKEND = "auto"  # How the wallpaper is applied: "auto" (probe once), "windows", "gsettings", "feh", "file", "none", ...
+WALLPAPER_SINK = None  # Target file or directory for the "file" backend
+WALLPAPER_BACKUP_FORMAT = None  # Optional second format written in the background, e.g. "png"
 SCREENSHOT_PATH = "wind_screenshot.png"  # Screenshot save path
-UPDATE_INTERVAL = 1800  # Update interval (seconds), 30 minutes
+UPDATE_INTERVAL = 1800  # Update interval (seconds) when SCHEDULE_MODE is "interval", 30 minutes
+SCHEDULE_MODE = "model-run"  # "model-run": follow the GFS publication times, "interval": fixed UPDATE_INTERVAL
 CHROME_DRIVER_PATH = "chromedriver.exe"  # Chrome driver path, modify according to actual situation
+RENDER_READY_TIMEOUT = 20  # Upper bound for waiting until the map has finished rendering (seconds)
+DATA_SOURCE = "browser"  # "browser": screenshot via Chrome, "data": download the u/v grid directly
+CAPTURE_VIEWS = []  # Extra views captured in the same browser session, "name=fragment[@selector]", e.g. "850hPa=current/wind/isobaric/850hPa/orthographic"
+CAPTURE_MODE = "hash"  # How extra views are shown: "hash" (one tab, switch URL fragment) or "tabs" (one tab per view, loaded in parallel)
+CAPTURE_WORKERS = 1  # Browser worker processes for extra views; 1 captures them in the main browser session
+WORKER_MEMORY_MB = MAX_WORKER_MEMORY_MB  # Memory limit per worker (MB, summed RSS of chromedriver, Chrome and its child processes); a worker restarts its browser above it
+WIND_DATA_BASE_URL = wind_data.WIND_DATA_BASE_URL  # Base URL of the earth-style wind data (can point to a local server)
+PROJECTION_CACHE_DIR = projection.PROJECTION_CACHE_DIR  # Cached screen-space projection lookup tables
+ANIMATION_FORMAT = None  # Also write an animated wallpaper: "apng", or "webp"/"mp4"/"webm" (needs ffmpeg)
+ANIMATION_PATH = "wind_animation"  # Animated wallpaper path without extension
+ANIMATION_FRAMES = 48  # Frames per animation
+ANIMATION_FPS = 12  # Animation frame rate
+SAVE_DEBUG_IMAGES = False  # Also write the captured/rendered image to SCREENSHOT_PATH for debugging
+METRICS_FILE = None  # JSON-lines file with per-stage timings of every update cycle, e.g. "wind_wallpaper_metrics.jsonl"
+DISPLAY_GEOMETRY = None  # Override monitor detection, e.g. "3840x2160" or "2560x1440+0+0,1920x1080+2560+0"
+
+# 输出显示器布局（首次使用时检测，或使用DISPLAY_GEOMETRY指定）
+_output_layout = None
+
+def get_output_layout():
+    global _output_layout
+    if _output_layout is None:
+        if DISPLAY_GEOMETRY:
+            monitors = parse_geometry(DISPLAY_GEOMETRY)
+            logger.info(f"使用指定的显示器几何: {monitors}")
+        else:
+            monitors = discover_monitors()
+        _output_layout = OutputLayout(monitors)
+        logger.info(f"输出布局: {_output_layout}")
+    return _output_layout
+
+# 长期存活的截图会话（浏览器和页面在多次更新之间保持预热）
+_capture_session = None
+
+def get_capture_session():
+    global _capture_session
+    if _capture_session is None:
+        # 按最大显示器的尺寸截图，其他显示器的壁纸由它缩小得到
+        _capture_session = CaptureSession(CHROME_DRIVER_PATH, WEATHER_URL, window_size=get_output_layout().master_size)
+    return _capture_session
+
+def close_capture_session():
+    global _capture_session
+    if _capture_session is not None:
+        _capture_session.close()
+        _capture_session = None
+
+# 程序退出时关闭浏览器
+atexit.register(close_capture_session)
+
+# 额外视图的多进程截图池（CAPTURE_WORKERS大于1时使用，首次使用时启动）
+_capture_pool = None
+
+def get_capture_pool():
+    global _capture_pool
+    if _capture_pool is None:
+        _capture_pool = CapturePool(CHROME_DRIVER_PATH, WEATHER_URL, window_size=get_output_layout().master_size,
+                                    workers=CAPTURE_WORKERS, max_memory_mb=WORKER_MEMORY_MB)
+    return _capture_pool
+
+def close_capture_pool():
+    global _capture_pool
+    if _capture_pool is not None:
+        _capture_pool.close()
+        _capture_pool = None
+
+atexit.register(close_capture_pool)
+
+# 记录上次应用的数据，数据未变化时跳过更新
+update_state = UpdateState()
+
+# 每个更新周期的分阶段耗时（METRICS_FILE为None时不记录）
+metrics_recorder = MetricsRecorder()
+
+# 壁纸文字图层（字体和来源信息只在首次使用时加载和绘制）
+text_overlay = TextOverlay()
+
+# 壁纸输出（首次使用时按当前配置创建）
+_wallpaper_writer = None
+
+def get_wallpaper_writer():
+    global _wallpaper_writer
+    if _wallpaper_writer is None:
+        _wallpaper_writer = WallpaperWriter(WALLPAPER_PATH, WALLPAPER_FORMAT, JPEG_QUALITY, WALLPAPER_BACKUP_FORMAT)
+    return _wallpaper_writer
+
+def close_wallpaper_writer():
+    if _wallpaper_writer is not None:
+        _wallpaper_writer.close()
+        if _wallpaper_writer.stats.formats:
+            logger.info(f"壁纸编码统计: {_wallpaper_writer.stats.summary()}")
+
+atexit.register(close_wallpaper_writer)
+
+# 壁纸设置方式（首次设置壁纸时探测）
+_wallpaper_applier = None
+
+def get_wallpaper_applier():
+    global _wallpaper_applier
+    if _wallpaper_applier is None:
+        _wallpaper_applier = WallpaperApplier(create_backends(WALLPAPER_BACKEND, WALLPAPER_SINK))
+    return _wallpaper_applier
 
 # 获取实时风流场数据（通过截图方式）
 def fetch_wind_data():
-    driver = None
+    session = get_capture_session()
     try:
         logger.info("开始获取风流场数据")
-        logger.info("步骤1: 启动Chrome浏览器")
-        print("\n步骤1: 启动Chrome浏览器...")
-
-        # 配置Chrome选项
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")  # 无头模式
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")  # 解决内存不足问题
-        chrome_options.add_argument("--disable-extensions")  # 禁用扩展
-        chrome_options.add_argument("--disable-browser-side-navigation")  # 避免超时错误
-        chrome_options.add_argument("--disable-features=VizDisplayCompositor")  # 避免渲染问题
-
-        logger.debug(f"Chrome选项: {chrome_options.arguments}")
-
-        # 创建Chrome浏览器实例
-        chrome_driver_path = os.path.abspath(CHROME_DRIVER_PATH)
-        logger.info(f"使用驱动: {chrome_driver_path}")
-        print(f"使用驱动: {chrome_driver_path}")
-
-        try:
-            service = Service(CHROME_DRIVER_PATH)
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-            logger.info("Chrome浏览器已启动")
+        logger.info("步骤1: 检查Chrome浏览器会话")
+        print("\n步骤1: 检查Chrome浏览器会话...")
+
+        logger.info(f"使用驱动: {os.path.abspath(CHROME_DRIVER_PATH)}")
+        with metrics.span("chrome_start"):
+            driver_started = session.ensure_driver()
+        metrics.annotate(chrome_started=driver_started)
+        if driver_started:
             print("✓ Chrome浏览器已启动")
-        except Exception as e:
-            logger.error(f"启动Chrome浏览器失败: {e}")
-            logger.error(traceback.format_exc())
-            raise Exception(f"启动Chrome浏览器失败: {e}")
+        else:
+            logger.info("复用已有的Chrome浏览器")
+            print("✓ 复用已有的Chrome浏览器")
+        driver = session.driver
 
-        # 访问中国气象网雷达页面
-        logger.info(f"步骤2: 访问中国气象网 {WEATHER_URL}")
-        print(f"\n步骤2: 访问中国气象网 {WEATHER_URL}...")
+        # 访问风流场页面（已加载时直接复用）
+        logger.info(f"步骤2: 访问 {WEATHER_URL}")
+        print(f"\n步骤2: 访问 {WEATHER_URL}...")
 
         try:
-            driver.get(WEATHER_URL)
-            logger.info("页面已加载")
-            print("✓ 页面已加载")
+            with metrics.span("page_load"):
+                page_reloaded = session.ensure_page()
+            metrics.annotate(page_reloaded=page_reloaded)
+            driver = session.driver
+            if page_reloaded:
+                logger.info("页面已加载")
+                print("✓ 页面已加载")
+            else:
+                print("✓ 复用已加载的页面")
         except Exception as e:
             logger.error(f"访问网站失败: {e}")
             logger.error(traceback.format_exc())
@@ -118,9 +230,10 @@ def fetch_wind_data():
         logger.info("步骤3: 等待页面元素加载")
         print("\n步骤3: 等待页面元素加载...")
         try:
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".mapContainer"))
-            )
+            with metrics.span("map_container"):
+                WebDriverWait(driver, 30).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, ".mapContainer"))
+                )
             logger.info("地图容器已加载")
             print("✓ 地图容器已加载")
         except Exception as e:
@@ -169,85 +282,94 @@ def fetch_wind_data():
                 print(f"✗ 查找替代元素失败: {inner_e}")
                 raise Exception("无法加载页面元素，请检查网站结构是否已更改")
 
-        # 点击风流场选项
+        # 点击风流场选项（复用的页面已经处于风流场视图）
         logger.info("步骤4: 切换到风流场视图")
         print("\n步骤4: 切换到风流场视图...")
-        try:
-            # 首先尝试使用XPath查找
-            logger.debug("尝试使用XPath查找风流场选项")
-            wind_options = driver.find_elements(By.XPATH, "//li[contains(text(), '风流场')]")
-
-            if wind_options:
-                wind_option = wind_options[0]
-                logger.info(f"找到风流场选项: {wind_option.text}")
-                print(f"✓ 找到风流场选项: {wind_option.text}")
-            else:
-                logger.info("使用备用方法查找风流场选项")
-                print("使用备用方法查找风流场选项...")
-
-                # 尝试查找所有列表项
-                logger.debug("尝试查找所有列表项")
-                all_options = driver.find_elements(By.TAG_NAME, "li")
-                logger.debug(f"找到 {len(all_options)} 个列表项")
-
-                # 记录所有列表项的文本，帮助调试
-                for i, opt in enumerate(all_options[:20]):  # 只记录前20个，避免日志过大
-                    logger.debug(f"列表项 {i+1}: {opt.text}")
-
-                wind_option = None
-
-                for option in all_options:
-                    if '风' in option.text or '流场' in option.text:
-                        wind_option = option
-                        logger.info(f"找到可能的风流场选项: {option.text}")
-                        print(f"✓ 找到可能的风流场选项: {option.text}")
-                        break
-
-                if not wind_option:
-                    # 如果仍然找不到，尝试点击可能的按钮或链接
-                    logger.debug("尝试查找按钮或链接")
-                    buttons = driver.find_elements(By.TAG_NAME, "button")
-                    links = driver.find_elements(By.TAG_NAME, "a")
-                    logger.debug(f"找到 {len(buttons)} 个按钮和 {len(links)} 个链接")
-
-                    for element in buttons + links:
-                        if '风' in element.text or '流场' in element.text:
-                            wind_option = element
-                            logger.info(f"找到可能的风流场按钮/链接: {element.text}")
-                            print(f"✓ 找到可能的风流场按钮/链接: {element.text}")
+        if not page_reloaded:
+            logger.info("页面已处于风流场视图，跳过切换")
+            print("✓ 页面已处于风流场视图，跳过切换")
+        else:
+            try:
+                # 首先尝试使用XPath查找
+                logger.debug("尝试使用XPath查找风流场选项")
+                wind_options = driver.find_elements(By.XPATH, "//li[contains(text(), '风流场')]")
+
+                if wind_options:
+                    wind_option = wind_options[0]
+                    logger.info(f"找到风流场选项: {wind_option.text}")
+                    print(f"✓ 找到风流场选项: {wind_option.text}")
+                else:
+                    logger.info("使用备用方法查找风流场选项")
+                    print("使用备用方法查找风流场选项...")
+
+                    # 尝试查找所有列表项
+                    logger.debug("尝试查找所有列表项")
+                    all_options = driver.find_elements(By.TAG_NAME, "li")
+                    logger.debug(f"找到 {len(all_options)} 个列表项")
+
+                    # 记录所有列表项的文本，帮助调试
+                    for i, opt in enumerate(all_options[:20]):  # 只记录前20个，避免日志过大
+                        logger.debug(f"列表项 {i+1}: {opt.text}")
+
+                    wind_option = None
+
+                    for option in all_options:
+                        if '风' in option.text or '流场' in option.text:
+                            wind_option = option
+                            logger.info(f"找到可能的风流场选项: {option.text}")
+                            print(f"✓ 找到可能的风流场选项: {option.text}")
                             break
 
-                if not wind_option:
-                    logger.error("找不到风流场选项")
-                    raise Exception("找不到风流场选项")
+                    if not wind_option:
+                        # 如果仍然找不到，尝试点击可能的按钮或链接
+                        logger.debug("尝试查找按钮或链接")
+                        buttons = driver.find_elements(By.TAG_NAME, "button")
+                        links = driver.find_elements(By.TAG_NAME, "a")
+                        logger.debug(f"找到 {len(buttons)} 个按钮和 {len(links)} 个链接")
+
+                        for element in buttons + links:
+                            if '风' in element.text or '流场' in element.text:
+                                wind_option = element
+                                logger.info(f"找到可能的风流场按钮/链接: {element.text}")
+                                print(f"✓ 找到可能的风流场按钮/链接: {element.text}")
+                                break
+
+                    if not wind_option:
+                        logger.error("找不到风流场选项")
+                        raise Exception("找不到风流场选项")
+
+                # 点击风流场选项
+                logger.info("点击风流场选项")
+                print("点击风流场选项...")
+                try:
+                    driver.execute_script("arguments[0].scrollIntoView(true);", wind_option)
+                    logger.debug("已滚动到风流场选项")
+                    driver.execute_script("arguments[0].click();", wind_option)
+                    logger.info("已点击风流场选项")
+                    print("✓ 已点击风流场选项")
+                except Exception as click_e:
+                    logger.error(f"点击风流场选项时出错: {click_e}")
+                    logger.error(traceback.format_exc())
+                    raise Exception(f"点击风流场选项失败: {click_e}")
 
-            # 点击风流场选项
-            logger.info("点击风流场选项")
-            print("点击风流场选项...")
-            try:
-                driver.execute_script("arguments[0].scrollIntoView(true);", wind_option)
-                logger.debug("已滚动到风流场选项")
-                driver.execute_script("arguments[0].click();", wind_option)
-                logger.info("已点击风流场选项")
-                print("✓ 已点击风流场选项")
-            except Exception as click_e:
-                logger.error(f"点击风流场选项时出错: {click_e}")
+            except Exception as e:
+                logger.error(f"切换到风流场视图失败: {e}")
                 logger.error(traceback.format_exc())
-                raise Exception(f"点击风流场选项失败: {click_e}")
-
-        except Exception as e:
-            logger.error(f"切换到风流场视图失败: {e}")
-            logger.error(traceback.format_exc())
-            print(f"✗ 切换到风流场视图失败: {e}")
-            logger.info("尝试直接查找地图元素")
-            print("尝试直接查找地图元素...")
+                print(f"✗ 切换到风流场视图失败: {e}")
+                logger.info("尝试直接查找地图元素")
+                print("尝试直接查找地图元素...")
 
         # 等待风流场数据加载
         logger.info("步骤5: 等待风流场数据加载")
         print("\n步骤5: 等待风流场数据加载...")
-        time.sleep(10)  # 增加等待时间，确保数据完全加载
-        logger.info("等待完成")
-        print("✓ 等待完成")
+        with metrics.span("render_wait"):
+            ready, ready_seconds, canvas_signature = wait_for_render_ready(driver, timeout=RENDER_READY_TIMEOUT,
+                                                                           since=session.data_since)
+        metrics.annotate(render_ready=ready)
+        if ready:
+            print(f"✓ 页面渲染已就绪，耗时 {ready_seconds:.2f} 秒")
+        else:
+            print(f"✗ 等待渲染就绪超时 ({ready_seconds:.2f} 秒)，继续截图")
 
         # 获取当前时间作为风向数据的时间戳
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
@@ -285,7 +407,8 @@ def fetch_wind_data():
             logger.info("正在截取...")
             print("正在截取...")
             try:
-                screenshot = map_element.screenshot_as_png
+                with metrics.span("screenshot"):
+                    screenshot = map_element.screenshot_as_png
                 logger.info("截图已获取")
                 print("✓ 截图已获取")
             except Exception as ss_e:
@@ -293,19 +416,6 @@ def fetch_wind_data():
                 logger.error(traceback.format_exc())
                 raise Exception(f"元素截图失败: {ss_e}")
 
-            # 保存截图
-            try:
-                with open(SCREENSHOT_PATH, "wb") as file:
-                    file.write(screenshot)
-
-                screenshot_path = os.path.abspath(SCREENSHOT_PATH)
-                logger.info(f"风流场截图已保存到: {screenshot_path}")
-                print(f"✓ 风流场截图已保存到: {screenshot_path}")
-            except Exception as save_e:
-                logger.error(f"保存截图失败: {save_e}")
-                logger.error(traceback.format_exc())
-                raise Exception(f"保存截图失败: {save_e}")
-
         except Exception as e:
             logger.error(f"截取风流场图失败: {e}")
             logger.error(traceback.format_exc())
@@ -316,169 +426,193 @@ def fetch_wind_data():
             try:
                 # 截取整个页面
                 logger.debug("截取整个页面")
-                screenshot = driver.get_screenshot_as_png()
-
-                # 保存截图
-                with open(SCREENSHOT_PATH, "wb") as file:
-                    file.write(screenshot)
-
-                screenshot_path = os.path.abspath(SCREENSHOT_PATH)
-                logger.info(f"整页截图已保存到: {screenshot_path}")
-                print(f"✓ 整页截图已保存到: {screenshot_path}")
+                with metrics.span("screenshot_page"):
+                    screenshot = driver.get_screenshot_as_png()
+                logger.info("整页截图已获取")
+                print("✓ 整页截图已获取")
             except Exception as e2:
                 logger.error(f"截取整个页面也失败了: {e2}")
                 logger.error(traceback.format_exc())
                 print(f"✗ 截取整个页面也失败了: {e2}")
                 raise Exception("无法获取任何截图")
 
-        logger.info("步骤7: 关闭浏览器")
-        print("\n步骤7: 关闭浏览器...")
-        driver.quit()
-        logger.info("浏览器已关闭")
-        print("✓ 浏览器已关闭")
+        # 浏览器保持运行，下次更新直接复用
+        logger.info(f"步骤7: 保持浏览器会话 (累计重启 {session.respawn_count} 次)")
+        print("\n步骤7: 保持浏览器会话，供下次更新复用")
 
-        # 返回时间戳（作为风向描述）和截图路径
-        logger.info(f"获取风流场数据成功: 时间={current_time}, 截图={SCREENSHOT_PATH}")
-        return current_time, SCREENSHOT_PATH, None
+        # 数据标识：渲染稳定时使用覆盖层画布签名（只随风场数据变化），否则使用截图内容的哈希
+        if ready and canvas_signature:
+            content_key = "canvas:" + canvas_signature
+        else:
+            content_key = content_hash(screenshot)
+
+        # 返回时间戳（作为风向描述）、截图和数据标识；截图由解码阶段在内存中解码
+        frame = WindFrame(current_time, None, content_key, source="browser")
+        frame.png_bytes = screenshot
+        if ANIMATION_FORMAT:
+            frame.animation_source = browser_animation_frames
+        logger.info(f"获取风流场数据成功: {frame}, 数据标识={content_key[:24]}")
+        return frame
     except Exception as e:
         logger.error(f"获取风流场数据失败: {e}")
         logger.error(traceback.format_exc())
         print(f"\n✗ 获取风流场数据失败: {e}")
 
-        if driver:
-            try:
-                driver.quit()
-                logger.info("浏览器已关闭")
-                print("浏览器已关闭")
-            except Exception as quit_e:
-                logger.error(f"关闭浏览器时出错: {quit_e}")
-                print("关闭浏览器时出错")
-
-        return None, None, None
-
-# 创建风流场壁纸
-def create_wind_wallpaper(timestamp, screenshot_path, _):
-    global WALLPAPER_PATH  # 声明全局变量，必须在函数开始时声明
-    try:
-        logger.info(f"开始创建风流场壁纸，使用截图: {screenshot_path}")
-        print(f"正在打开截图: {screenshot_path}")
-
-        # 检查截图文件是否存在
-        if not os.path.exists(screenshot_path):
-            logger.error(f"截图文件不存在: {screenshot_path}")
-            raise FileNotFoundError(f"截图文件不存在: {screenshot_path}")
-
-        # 打开截图
-        try:
-            screenshot = Image.open(screenshot_path)
-            img_size = f"{screenshot.width}x{screenshot.height}"
-            img_format = screenshot.format
-            logger.info(f"截图已打开: 尺寸={img_size}, 格式={img_format}")
-            print(f"截图尺寸: {img_size}, 格式: {img_format}")
-        except Exception as img_e:
-            logger.error(f"打开截图失败: {img_e}")
-            logger.error(traceback.format_exc())
-            raise Exception(f"打开截图失败: {img_e}")
+        # 出错后丢弃当前会话，下次更新时重新启动浏览器
+        session.close()
+        print("浏览器已关闭")
 
-        # 创建壁纸画布（1920x1080，适应常见屏幕分辨率）
-        logger.debug("创建壁纸画布 (1920x1080)")
-        wallpaper = Image.new("RGB", (1920, 1080), "white")
+        return None
 
-        # 计算截图在壁纸中的位置（居中）
-        x = (1920 - screenshot.width) // 2
-        y = (1080 - screenshot.height) // 2
-        logger.debug(f"截图位置: x={x}, y={y}")
+# 获取实时风流场数据（直接下载u/v网格，不需要浏览器）
+# force为False时发送条件请求，数据未变化则不再渲染
+def fetch_wind_grid_data(force=False):
+    try:
+        logger.info("开始获取风流场数据（数据模式）")
+        print("\n正在下载风场网格数据...")
+        validators = None if force else update_state.conditional_validators()
+        with metrics.span("download"):
+            content, update_state.pending_validators = wind_data.fetch_wind_payload(WIND_DATA_BASE_URL, validators=validators)
+        metrics.annotate(not_modified=content is None)
 
-        # 将截图粘贴到壁纸上
-        try:
-            wallpaper.paste(screenshot, (x, y))
-            logger.debug("截图已粘贴到壁纸上")
-        except Exception as paste_e:
-            logger.error(f"粘贴截图失败: {paste_e}")
-            logger.error(traceback.format_exc())
-            raise Exception(f"粘贴截图失败: {paste_e}")
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M")
+        logger.info(f"当前时间: {current_time}")
 
-        # 添加时间戳和来源信息
-        logger.debug("添加时间戳和来源信息")
-        draw = ImageDraw.Draw(wallpaper)
+        content_key = update_state.content_key if content is None else content_hash(content)
+        if not force and update_state.is_unchanged(content_key):
+            print("✓ 风场数据未变化，无需重新渲染")
+            return WindFrame(current_time, None, content_key, source="data")
 
-        # 使用默认字体（如果没有指定字体文件）
-        font = None
-        try:
-            font = ImageFont.truetype("arial.ttf", 24)
-            logger.info("使用Arial字体")
-            print("使用Arial字体")
-        except IOError:
-            logger.debug("Arial字体不可用，尝试使用Windows系统字体")
-            try:
-                # 尝试使用Windows系统字体
-                font = ImageFont.truetype("C:\\Windows\\Fonts\\Arial.ttf", 24)
-                logger.info("使用Windows系统Arial字体")
-                print("使用Windows系统Arial字体")
-            except IOError:
-                logger.warning("无法加载Arial字体，使用默认字体")
-                font = ImageFont.load_default()
-                print("使用默认字体")
-
-        # 添加时间戳
-        timestamp_text = f"更新时间: {timestamp}"
-        logger.debug(f"添加时间戳: {timestamp_text}")
-        draw.text((20, 20), timestamp_text, fill="black", font=font)
-
-        # Add data source
-        source_text = "Data Source: Earth Nullschool (earth.nullschool.net)"
-        logger.debug(f"Adding data source: {source_text}")
-        draw.text((20, 50), source_text, fill="black", font=font)
-
-        # 确保目录存在
-        wallpaper_dir = os.path.dirname(os.path.abspath(WALLPAPER_PATH))
-        if not os.path.exists(wallpaper_dir):
-            logger.info(f"创建目录: {wallpaper_dir}")
-            os.makedirs(wallpaper_dir)
-            print(f"创建目录: {wallpaper_dir}")
-
-        # 保存壁纸 (使用BMP格式，Windows壁纸更兼容)
-        bmp_path = WALLPAPER_PATH.replace('.png', '.bmp')
-        try:
-            wallpaper.save(bmp_path, "BMP")
-            logger.info(f"壁纸已保存为BMP格式: {bmp_path}")
-            print(f"壁纸已保存为BMP格式: {bmp_path}")
-        except Exception as bmp_e:
-            logger.error(f"保存BMP格式壁纸失败: {bmp_e}")
-            logger.error(traceback.format_exc())
-            raise Exception(f"保存BMP格式壁纸失败: {bmp_e}")
+        with metrics.span("parse"):
+            grid = wind_data.parse_wind_payload(content)
+        print(f"✓ 风场数据已下载: 网格={grid.nx}x{grid.ny}, 时间={grid.valid_time()}")
 
-        # 同时保存PNG格式作为备份
+        # 用粒子平流渲染风流图，作为壁纸的主体图像
+        width, height = get_output_layout().master_size
+        print(f"正在渲染粒子风流图 ({width}x{height})...")
         try:
-            wallpaper.save(WALLPAPER_PATH)
-            logger.info(f"壁纸已保存为PNG格式: {WALLPAPER_PATH}")
-            print(f"壁纸已保存为PNG格式: {WALLPAPER_PATH}")
-        except Exception as png_e:
-            logger.warning(f"保存PNG格式壁纸失败: {png_e}")
-            print(f"警告: 保存PNG格式壁纸失败: {png_e}")
-            # 继续执行，因为BMP格式已保存成功
-
-        # 更新全局变量，使用BMP路径
-        old_path = WALLPAPER_PATH
-        WALLPAPER_PATH = bmp_path
-        logger.info(f"更新壁纸路径: {old_path} -> {WALLPAPER_PATH}")
+            with metrics.span("projection"):
+                view = projection.parse_view(WEATHER_URL)
+                lut = projection.load_or_build_lut(view, width, height, grid, PROJECTION_CACHE_DIR)
+        except ValueError as view_e:
+            logger.warning(f"{view_e}，使用等距圆柱投影")
+            lut = None
+        with metrics.span("render"):
+            image = render_wind_particles(grid, width, height, lut=lut)
+        print("✓ 粒子风流图已渲染")
+        if SAVE_DEBUG_IMAGES:
+            save_debug_image(image, SCREENSHOT_PATH)
+
+        frame = WindFrame(current_time, image, content_key, source="data")
+        if ANIMATION_FORMAT:
+            frame.animation_source = lambda count: ParticleRenderer(grid, width, height, lut=lut).frames(count)
+        return frame
+    except Exception as e:
+        logger.error(f"下载风场数据失败: {e}")
+        logger.error(traceback.format_exc())
+        print(f"\n✗ 下载风场数据失败: {e}")
+        return None
+
+# 浏览器模式的动画帧：按ANIMATION_FPS的间隔连续截取页面上的粒子动画
+def browser_animation_frames(count):
+    driver = get_capture_session().driver
+    map_elements = driver.find_elements(By.CSS_SELECTOR, ".mapContainer")
+    interval = 1.0 / ANIMATION_FPS
+    for _ in range(count):
+        start = time.perf_counter()
+        if map_elements:
+            png_bytes = map_elements[0].screenshot_as_png
+        else:
+            png_bytes = driver.get_screenshot_as_png()
+        yield decode_png(png_bytes)
+        time.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+# 根据DATA_SOURCE选择数据获取方式
+def acquire_wind_data(force=False):
+    if DATA_SOURCE == "data":
+        return fetch_wind_grid_data(force)
+    return fetch_wind_data()
+
+# 把截图合成为壁纸图像：居中放到主画布上，按显示器布局缩放拼接，再绘制时间戳和来源信息
+def compose_wallpaper(screenshot, timestamp):
+    # 创建壁纸画布（最大显示器的原生分辨率）
+    layout = get_output_layout()
+    canvas_width, canvas_height = layout.master_size
+    logger.debug(f"创建壁纸画布 ({canvas_width}x{canvas_height})")
+    wallpaper = Image.new("RGB", (canvas_width, canvas_height), "white")
+
+    # 计算截图在壁纸中的位置（居中）
+    x = (canvas_width - screenshot.width) // 2
+    y = (canvas_height - screenshot.height) // 2
+    logger.debug(f"截图位置: x={x}, y={y}")
+
+    # 将截图粘贴到壁纸上
+    try:
+        wallpaper.paste(screenshot, (x, y))
+        logger.debug("截图已粘贴到壁纸上")
+    except Exception as paste_e:
+        logger.error(f"粘贴截图失败: {paste_e}")
+        logger.error(traceback.format_exc())
+        raise Exception(f"粘贴截图失败: {paste_e}")
+
+    # 由主图像缩小得到各显示器的壁纸（多显示器时拼成一张跨屏壁纸）
+    with metrics.span("resample"):
+        wallpaper = layout.compose(wallpaper)
+
+    # 添加时间戳和来源信息（绘制在主显示器上；来源信息图层已缓存，只重绘时间戳）
+    timestamp_text = f"更新时间: {timestamp}"
+    logger.debug(f"添加时间戳和来源信息: {timestamp_text}")
+    with metrics.span("overlay"):
+        text_overlay.apply(wallpaper, layout.offset_of(layout.primary), timestamp_text, layout.primary.height)
+    return wallpaper
+
+# 创建风流场壁纸（直接使用内存中的图像），返回合成后的壁纸图像，失败时返回None
+# 这里只做合成，编码和保存由save_wind_wallpaper完成
+def create_wind_wallpaper(frame):
+    try:
+        logger.info(f"开始创建风流场壁纸: {frame}")
+        timestamp = frame.timestamp
+        screenshot = frame.image
+        if screenshot is None:
+            raise Exception("没有可用的风流场图像")
+        img_size = f"{screenshot.width}x{screenshot.height}"
+        logger.info(f"截图尺寸: {img_size}, 模式={screenshot.mode}")
+        print(f"截图尺寸: {img_size}")
+
+        layout = get_output_layout()
+        wallpaper = compose_wallpaper(screenshot, timestamp)
+        if layout.is_span:
+            logger.info(f"已生成跨屏壁纸: {wallpaper.width}x{wallpaper.height}, {len(layout.monitors)} 个显示器")
+            print(f"已生成跨屏壁纸: {wallpaper.width}x{wallpaper.height}")
 
         logger.info("创建风流场壁纸成功")
-        return True
+        frame.wallpaper = wallpaper
+        return wallpaper
     except Exception as e:
         logger.error(f"创建壁纸失败: {e}")
         logger.error(traceback.format_exc())
         print(f"创建壁纸失败: {e}")
-        return False
+        return None
 
-# 设置Windows桌面壁纸
-def set_wallpaper():
-    global WALLPAPER_PATH  # 声明全局变量，必须在函数开始时声明
+# 编码并保存壁纸（关键路径上只编码一次，备份格式在后台写入），返回文件路径，失败时返回None
+def save_wind_wallpaper(frame):
     try:
-        logger.info("开始设置Windows桌面壁纸")
+        frame.wallpaper_path = get_wallpaper_writer().write(frame.wallpaper)
+        print(f"壁纸已保存: {frame.wallpaper_path}")
+        return frame.wallpaper_path
+    except Exception as e:
+        logger.error(f"保存壁纸失败: {e}")
+        logger.error(traceback.format_exc())
+        print(f"保存壁纸失败: {e}")
+        return None
 
+# 设置桌面壁纸（wallpaper为内存中已合成的图像，仅用于记录信息，不再重新打开文件）
+# span为True时使用"跨区"样式，让一张壁纸覆盖所有显示器
+# 设置方式在第一次设置时探测并缓存，之后只在失败时重新探测
+def set_wallpaper(wallpaper=None, path=None, span=False):
+    try:
         # 检查壁纸文件是否存在
-        abs_path = os.path.abspath(WALLPAPER_PATH)
+        abs_path = os.path.abspath(path or get_wallpaper_writer().path)
         logger.debug(f"壁纸文件路径: {abs_path}")
 
         if not os.path.exists(abs_path):
@@ -486,146 +620,278 @@ def set_wallpaper():
             print(f"错误: 壁纸文件不存在: {abs_path}")
             return False
 
-        # 检查文件大小和类型
-        try:
-            file_size = os.path.getsize(abs_path) / 1024  # KB
-            logger.info(f"壁纸文件大小: {file_size:.2f} KB")
-
-            # 检查文件是否为有效的图像文件
-            try:
-                with Image.open(abs_path) as img:
-                    logger.info(f"壁纸图像信息: 格式={img.format}, 尺寸={img.width}x{img.height}, 模式={img.mode}")
-            except Exception as img_e:
-                logger.warning(f"无法验证壁纸图像: {img_e}")
-        except Exception as fs_e:
-            logger.warning(f"无法获取文件信息: {fs_e}")
+        logger.info(f"壁纸文件大小: {os.path.getsize(abs_path) / 1024:.2f} KB")
+        if wallpaper is not None:
+            logger.info(f"壁纸图像信息: 尺寸={wallpaper.width}x{wallpaper.height}, 模式={wallpaper.mode}")
 
         logger.info(f"正在设置壁纸: {abs_path}")
         print(f"正在设置壁纸: {abs_path}")
-
-        # 尝试使用不同的方法设置壁纸
-
-        # 方法1: 使用Windows API (SPI_SETDESKWALLPAPER = 20)
-        logger.debug("尝试方法1: 使用SystemParametersInfoW")
-        try:
-            result = ctypes.windll.user32.SystemParametersInfoW(20, 0, abs_path, 3)
-            if result:
-                logger.info("方法1成功: 使用SystemParametersInfoW设置壁纸")
-                print("方法1成功: 使用SystemParametersInfoW设置壁纸")
-                return True
-            else:
-                logger.warning(f"方法1失败: SystemParametersInfoW返回{result}")
-                print(f"方法1失败: SystemParametersInfoW返回{result}")
-        except Exception as m1_e:
-            logger.error(f"方法1异常: {m1_e}")
-            logger.error(traceback.format_exc())
-            print(f"方法1异常: {m1_e}")
-
-        # 方法2: 尝试使用另一种方式调用API
-        logger.debug("尝试方法2: 使用明确常量的SystemParametersInfoW")
-        try:
-            SPI_SETDESKWALLPAPER = 0x0014
-            SPIF_UPDATEINIFILE = 0x01
-            SPIF_SENDCHANGE = 0x02
-            result = ctypes.windll.user32.SystemParametersInfoW(
-                SPI_SETDESKWALLPAPER,
-                0,
-                abs_path,
-                SPIF_UPDATEINIFILE | SPIF_SENDCHANGE
-            )
-            if result:
-                logger.info("方法2成功: 使用明确常量的SystemParametersInfoW设置壁纸")
-                print("方法2成功: 使用明确常量的SystemParametersInfoW设置壁纸")
-                return True
-            else:
-                logger.warning(f"方法2失败: 明确常量的SystemParametersInfoW返回{result}")
-                print(f"方法2失败: 明确常量的SystemParametersInfoW返回{result}")
-        except Exception as m2_e:
-            logger.error(f"方法2异常: {m2_e}")
-            logger.error(traceback.format_exc())
-            print(f"方法2异常: {m2_e}")
-
-        # 方法3: 尝试使用注册表设置壁纸
-        logger.debug("尝试方法3: 使用注册表设置壁纸")
-        try:
-            import winreg
-            logger.debug("打开注册表键: Control Panel\\Desktop")
-            registry_key = winreg.OpenKey(
-                winreg.HKEY_CURRENT_USER,
-                "Control Panel\\Desktop",
-                0,
-                winreg.KEY_SET_VALUE
-            )
-
-            logger.debug("设置注册表值: WallpaperStyle=0")
-            winreg.SetValueEx(registry_key, "WallpaperStyle", 0, winreg.REG_SZ, "0")
-
-            logger.debug("设置注册表值: TileWallpaper=0")
-            winreg.SetValueEx(registry_key, "TileWallpaper", 0, winreg.REG_SZ, "0")
-
-            logger.debug(f"设置注册表值: Wallpaper={abs_path}")
-            winreg.SetValueEx(registry_key, "Wallpaper", 0, winreg.REG_SZ, abs_path)
-
-            logger.debug("关闭注册表键")
-            winreg.CloseKey(registry_key)
-
-            # 通知Windows更新设置
-            logger.debug("发送更新消息到Windows")
-            ctypes.windll.user32.SendMessageW(0xFFFF, 0x0112, 0xF, 0)
-            ctypes.windll.user32.SendMessageW(0xFFFF, 0x0112, 0xF, 0)
-
-            logger.info("方法3成功: 使用注册表设置壁纸")
-            print("方法3成功: 使用注册表设置壁纸")
-            return True
-        except Exception as reg_error:
-            logger.error(f"方法3失败: 注册表方法错误: {reg_error}")
-            logger.error(traceback.format_exc())
-            print(f"方法3失败: 注册表方法错误: {reg_error}")
-
-        # 如果所有方法都失败，尝试使用PowerShell
-        logger.debug("尝试方法4: 使用PowerShell")
-        try:
-            import subprocess
-            ps_command = f'powershell -command "Add-Type -TypeDefinition \\"using System; using System.Runtime.InteropServices; public class Wallpaper {{ [DllImport(\\"user32.dll\\")] public static extern int SystemParametersInfo(int uAction, int uParam, string lpvParam, int fuWinIni); }}\\"; [Wallpaper]::SystemParametersInfo(20, 0, \'{abs_path.replace("\\", "\\\\")}\', 3)"'
-            logger.debug(f"执行PowerShell命令: {ps_command}")
-
-            result = subprocess.run(ps_command, shell=True, capture_output=True, text=True)
-            if result.returncode == 0:
-                logger.info("方法4成功: 使用PowerShell设置壁纸")
-                print("方法4成功: 使用PowerShell设置壁纸")
-                return True
-            else:
-                logger.warning(f"方法4失败: PowerShell返回{result.returncode}")
-                logger.warning(f"错误输出: {result.stderr}")
-                print(f"方法4失败: PowerShell返回错误")
-        except Exception as ps_e:
-            logger.error(f"方法4异常: {ps_e}")
-            logger.error(traceback.format_exc())
-            print(f"方法4异常: {ps_e}")
-
-        logger.error("所有设置壁纸的方法都失败了")
-        print("所有设置壁纸的方法都失败了")
-        return False
+        backend = get_wallpaper_applier().apply(abs_path, span)
+        if backend is None:
+            logger.error("所有设置壁纸的方法都失败了")
+            print("所有设置壁纸的方法都失败了")
+            return False
+        metrics.annotate(apply_backend=backend.name)
+        print(f"壁纸已设置 (方式: {backend})")
+        return True
     except Exception as e:
         logger.error(f"设置壁纸失败: {e}")
         logger.error(traceback.format_exc())
         print(f"设置壁纸失败: {e}")
         return False
 
-# 主更新函数
-def update_wallpaper():
-    global WALLPAPER_PATH  # 声明全局变量，必须在函数开始时声明
+# 截取额外的视图（主视图截图之后）：CAPTURE_WORKERS为1时在主浏览器会话中截取，否则分发给截图池
+# 每截好一个视图就产生一个WindFrame，作为独立的任务进入流水线；单个视图失败不影响壁纸更新
+def capture_extra_views(frame):
+    views = [CaptureView.parse(text) for text in CAPTURE_VIEWS]
+    mode = f"{CAPTURE_WORKERS}个进程" if CAPTURE_WORKERS > 1 else CAPTURE_MODE
+    print(f"截取额外视图 ({mode}): {', '.join(view.name for view in views)}")
+    captures = []
+    with metrics.span("views"):
+        if CAPTURE_WORKERS > 1:
+            results = get_capture_pool().capture(views, RENDER_READY_TIMEOUT)
+        else:
+            results = get_capture_session().iter_capture_views(views, CAPTURE_MODE, RENDER_READY_TIMEOUT)
+        for capture in results:
+            captures.append(capture)
+            print(f"  {'✓' if capture.ok else '✗'} {capture.view.name}: {capture.seconds:.2f}秒")
+            if capture.ok:
+                yield WindFrame(frame.timestamp, content_key=frame.content_key, source=frame.source, view=capture)
+    failed = [capture.view.name for capture in captures if not capture.ok]
+    metrics.annotate(views_captured=len(captures) - len(failed), views_failed=len(failed),
+                     view_seconds={capture.view.name: round(capture.seconds, 3) for capture in captures})
+    if failed:
+        logger.warning(f"以下视图截图失败: {', '.join(failed)}")
+
+# 保存额外视图的截图
+def save_view_capture(frame):
+    capture = frame.view
+    get_wallpaper_writer().write_view(capture.view.name, capture.png_bytes)
+    capture.png_bytes = None
+
+# 流水线各阶段：每个阶段接收上一阶段的WindFrame，返回None表示该任务到此结束
+# 获取阶段先产生主壁纸，再逐个产生额外视图；主壁纸在后续阶段处理时，浏览器继续截取额外视图。
+# 输出动画（ANIMATION_FORMAT）且要用同一个浏览器录制主视图时，先截完额外视图再交出主壁纸，避免两个线程同时操作浏览器
+def acquire_stage(force):
     print("获取风流场数据...")
-    timestamp, screenshot_path, _ = fetch_wind_data()
-    if timestamp and screenshot_path:
-        print(f"获取成功，时间戳: {timestamp}")
-        if create_wind_wallpaper(timestamp, screenshot_path, None):
-            set_wallpaper()
-    else:
+    frame = acquire_wind_data(force)
+    if frame is None:
         print("由于数据获取失败，跳过壁纸更新")
+        return
+    print(f"获取成功，时间戳: {frame.timestamp}")
+    if not force and update_state.is_unchanged(frame.content_key):
+        metrics.annotate(skipped=True)
+        update_state.record_skip()
+        print(f"风场数据未变化，跳过壁纸更新 (累计跳过 {update_state.skip_count} 次)")
+        return
+    if frame.source != "browser" or not CAPTURE_VIEWS:
+        yield frame
+    elif ANIMATION_FORMAT and frame.animation_source is not None:
+        yield from capture_extra_views(frame)
+        yield frame
+    else:
+        yield frame
+        yield from capture_extra_views(frame)
+
+# 额外视图不解码、不合成、不设置为壁纸，只在编码阶段保存
+def decode_stage(frame):
+    if frame.view is None and frame.png_bytes is not None:
+        frame.image = decode_png(frame.png_bytes)
+        frame.png_bytes = None
+        if SAVE_DEBUG_IMAGES:
+            save_debug_image(frame.image, SCREENSHOT_PATH)
+    return frame
+
+def composite_stage(frame):
+    if frame.view is not None:
+        return frame
+    return frame if create_wind_wallpaper(frame) is not None else None
+
+def encode_stage(frame):
+    if frame.view is not None:
+        save_view_capture(frame)
+        return frame
+    if save_wind_wallpaper(frame) is None:
+        return None
+    return frame
+
+def apply_stage(frame):
+    if frame.view is not None:
+        return frame
+    if not set_wallpaper(frame.wallpaper, frame.wallpaper_path, span=get_output_layout().is_span):
+        return None
+    update_state.record_update(frame.content_key)
+    return frame
+
+# 输出动画壁纸：逐帧获取、合成并流式编码，内存中只保留当前帧；动画失败不影响静态壁纸
+def animate_stage(frame):
+    if frame.view is not None or frame.animation_source is None:
+        return frame
+    print(f"正在生成动画壁纸 ({ANIMATION_FORMAT}, {ANIMATION_FRAMES} 帧)...")
+    try:
+        frames = (compose_wallpaper(image, frame.timestamp) for image in frame.animation_source(ANIMATION_FRAMES))
+        path, count, seconds = write_animation(frames, ANIMATION_PATH, ANIMATION_FORMAT, ANIMATION_FPS)
+        metrics.annotate(animation_frames=count)
+        print(f"✓ 动画壁纸已保存: {path} ({count} 帧, {seconds:.1f}秒)")
+    except Exception as e:
+        logger.error(f"生成动画壁纸失败: {e}")
+        logger.error(traceback.format_exc())
+        print(f"✗ 生成动画壁纸失败: {e}")
+    finally:
+        frame.animation_source = None
+    return frame
+
+# 更新流水线（首次使用时启动工作线程）
+_update_pipeline = None
+
+def get_update_pipeline():
+    global _update_pipeline
+    if _update_pipeline is None:
+        _update_pipeline = StagedPipeline([
+            PipelineStage("acquire", acquire_stage, fan_out=True),
+            PipelineStage("decode", decode_stage),
+            PipelineStage("composite", composite_stage),
+            PipelineStage("encode", encode_stage),
+            PipelineStage("apply", apply_stage),
+        ] + ([PipelineStage("animate", animate_stage)] if ANIMATION_FORMAT else []))
+    return _update_pipeline
+
+def close_update_pipeline():
+    global _update_pipeline
+    if _update_pipeline is not None:
+        _update_pipeline.close()
+        logger.info(f"更新流水线统计: {_update_pipeline.summary()}")
+        _update_pipeline = None
+
+atexit.register(close_update_pipeline)
+
+# 根据SCHEDULE_MODE创建更新调度器
+def create_scheduler():
+    if SCHEDULE_MODE == "model-run":
+        logger.info("更新调度: 按GFS数据发布时间")
+        return ModelRunScheduler()
+    logger.info(f"更新调度: 每 {UPDATE_INTERVAL} 秒")
+    return FixedIntervalScheduler(UPDATE_INTERVAL)
+
+# 主更新函数，壁纸成功更新时返回True
+def update_wallpaper(force=False):
+    pipeline = get_update_pipeline()
+    cycle = metrics_recorder.start_cycle(source=DATA_SOURCE, forced=force)
+    results = pipeline.process(force, cycle)
+    frame = results.get(None)  # 主壁纸；额外视图以"view:名称"为键
+    failed_views = [label for label, result in results.items() if label is not None and result is None]
+    if failed_views:
+        logger.warning(f"以下视图保存失败: {', '.join(failed_views)}")
+    if frame is not None:
+        cycle.finish("updated")
+    else:
+        cycle.finish("skipped" if cycle.enabled and cycle.fields.get("skipped") else "failed")
+    logger.debug(f"更新流水线统计: {pipeline.summary()}")
+    return frame is not None
+
+# 解析命令行参数
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="实时风流场桌面壁纸")
+    parser.add_argument("--source", choices=["browser", "data"], default=DATA_SOURCE,
+                        help=f"数据获取方式: browser=浏览器截图, data=直接下载风场网格 (默认: {DATA_SOURCE})")
+    parser.add_argument("--view", action="append", dest="views", default=list(CAPTURE_VIEWS), metavar="NAME=FRAGMENT[@SELECTOR]",
+                        help="浏览器模式下额外截取的视图，可重复指定，例如 850hPa=current/wind/isobaric/850hPa/orthographic")
+    parser.add_argument("--views-file", default=None,
+                        help="从文件读取额外视图，每行一个 NAME=FRAGMENT[@SELECTOR]，#开头为注释")
+    parser.add_argument("--capture-mode", choices=CAPTURE_MODES, default=CAPTURE_MODE,
+                        help=f"额外视图的切换方式: hash=同一标签页切换URL片段, tabs=每个视图一个标签页并行加载 (默认: {CAPTURE_MODE})")
+    parser.add_argument("--capture-workers", type=int, default=CAPTURE_WORKERS,
+                        help=f"截取额外视图的浏览器进程数，1表示使用主浏览器会话 (默认: {CAPTURE_WORKERS})")
+    parser.add_argument("--worker-memory-mb", type=int, default=WORKER_MEMORY_MB,
+                        help=f"每个截图进程的浏览器内存上限 (MB，浏览器进程树的常驻内存之和)，超过后重启该进程的浏览器 (默认: {WORKER_MEMORY_MB})")
+    parser.add_argument("--data-url", default=WIND_DATA_BASE_URL,
+                        help=f"风场数据的基础URL (默认: {WIND_DATA_BASE_URL})")
+    parser.add_argument("--format", choices=sorted(WALLPAPER_FORMATS), default=WALLPAPER_FORMAT,
+                        help=f"壁纸文件格式 (默认: {WALLPAPER_FORMAT})")
+    parser.add_argument("--jpeg-quality", type=int, default=JPEG_QUALITY,
+                        help=f"JPEG格式的质量 (默认: {JPEG_QUALITY})")
+    parser.add_argument("--backend", choices=["auto"] + BACKEND_NAMES, default=WALLPAPER_BACKEND,
+                        help=f"壁纸设置方式，auto=首次使用时自动探测 (默认: {WALLPAPER_BACKEND})")
+    parser.add_argument("--sink", default=WALLPAPER_SINK,
+                        help="file方式下壁纸复制到的文件或目录")
+    parser.add_argument("--backup-format", choices=sorted(WALLPAPER_FORMATS), default=WALLPAPER_BACKUP_FORMAT,
+                        help="在后台额外保存一份该格式的备份")
+    parser.add_argument("--animation", choices=sorted(ANIMATION_FORMATS), default=ANIMATION_FORMAT,
+                        help="同时输出动画壁纸: apng, 或 webp/mp4/webm（需要ffmpeg）")
+    parser.add_argument("--animation-frames", type=int, default=ANIMATION_FRAMES,
+                        help=f"动画帧数 (默认: {ANIMATION_FRAMES})")
+    parser.add_argument("--animation-fps", type=int, default=ANIMATION_FPS,
+                        help=f"动画帧率 (默认: {ANIMATION_FPS})")
+    parser.add_argument("--save-debug-images", action="store_true",
+                        help=f"同时把截图/渲染图保存到 {SCREENSHOT_PATH}，用于调试")
+    parser.add_argument("--schedule", choices=["model-run", "interval"], default=SCHEDULE_MODE,
+                        help=f"更新时机: model-run=按GFS数据发布时间, interval=固定间隔 (默认: {SCHEDULE_MODE})")
+    parser.add_argument("--interval", type=int, default=UPDATE_INTERVAL,
+                        help=f"固定间隔模式下的更新间隔秒数 (默认: {UPDATE_INTERVAL})")
+    parser.add_argument("--geometry", default=DISPLAY_GEOMETRY,
+                        help="指定显示器几何而不自动检测，例如 3840x2160 或 2560x1440+0+0,1920x1080+2560+0")
+    parser.add_argument("--metrics-file", default=METRICS_FILE,
+                        help="把每次更新的分阶段耗时追加到该JSON Lines文件")
+
+    subparsers = parser.add_subparsers(dest="command")
+    stats_parser = subparsers.add_parser("stats", help="打印指标文件的耗时百分位数和趋势")
+    stats_parser.add_argument("metrics_path", nargs="?", default="wind_wallpaper_metrics.jsonl",
+                              help="指标文件路径 (默认: wind_wallpaper_metrics.jsonl)")
+    stats_parser.add_argument("--last", type=int, default=None, help="只统计最近N个周期")
+    return parser.parse_args()
 
 # 主程序
 def main():
+    global DATA_SOURCE, WIND_DATA_BASE_URL, SAVE_DEBUG_IMAGES
+    global WALLPAPER_FORMAT, JPEG_QUALITY, WALLPAPER_BACKUP_FORMAT, DISPLAY_GEOMETRY
+    global SCHEDULE_MODE, UPDATE_INTERVAL, METRICS_FILE, CAPTURE_VIEWS, CAPTURE_MODE
+    global CAPTURE_WORKERS, WORKER_MEMORY_MB, ANIMATION_FORMAT, ANIMATION_FRAMES, ANIMATION_FPS
+    global WALLPAPER_BACKEND, WALLPAPER_SINK
+    args = parse_arguments()
+    if args.command == "stats":
+        return metrics.print_stats(args.metrics_path, args.last)
+    METRICS_FILE = args.metrics_file
+    metrics_recorder.path = METRICS_FILE
+    SCHEDULE_MODE = args.schedule
+    UPDATE_INTERVAL = args.interval
+    DISPLAY_GEOMETRY = args.geometry
+    WALLPAPER_FORMAT = args.format
+    WALLPAPER_BACKEND = args.backend
+    WALLPAPER_SINK = args.sink
+    if WALLPAPER_BACKEND == "file" and not WALLPAPER_SINK:
+        print("错误: file方式需要用--sink指定目标文件或目录")
+        return 1
+    JPEG_QUALITY = args.jpeg_quality
+    WALLPAPER_BACKUP_FORMAT = args.backup_format
+    DATA_SOURCE = args.source
+    WIND_DATA_BASE_URL = args.data_url
+    SAVE_DEBUG_IMAGES = args.save_debug_images
+    ANIMATION_FORMAT = args.animation
+    ANIMATION_FRAMES = max(1, args.animation_frames)
+    ANIMATION_FPS = max(1, args.animation_fps)
+    CAPTURE_MODE = args.capture_mode
+    CAPTURE_WORKERS = max(1, args.capture_workers)
+    WORKER_MEMORY_MB = args.worker_memory_mb
+    CAPTURE_VIEWS = args.views
+    if args.views_file:
+        with open(args.views_file, encoding="utf-8") as file:
+            CAPTURE_VIEWS += [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+    try:
+        views = [CaptureView.parse(text) for text in CAPTURE_VIEWS]
+    except ValueError as e:
+        print(f"错误: {e}")
+        return 1
+    if len({view.name for view in views}) != len(views):
+        print("错误: 额外视图的名称不能重复")
+        return 1
+    if any(view.name in WALLPAPER_SLOTS for view in views):
+        print(f"错误: 额外视图不能命名为 {'/'.join(WALLPAPER_SLOTS)}（壁纸文件的槽位名）")
+        return 1
+    if views:
+        logger.info(f"额外视图 ({CAPTURE_MODE}): {views}")
+        if DATA_SOURCE == "data":
+            logger.warning("数据模式不使用浏览器，额外视图将被忽略")
+
     logger.info("="*50)
     logger.info("启动实时风流场桌面壁纸程序...")
     logger.info("="*50)
@@ -667,45 +933,53 @@ def main():
             print("检测到非交互式环境，将自动继续执行...")
             non_interactive = True
 
-    # 检查Chrome驱动是否存在
-    logger.info("检查Chrome驱动...")
-    print("\n正在检查Chrome驱动...")
-    if not os.path.exists(CHROME_DRIVER_PATH):
-        print(f"错误: Chrome驱动文件不存在: {CHROME_DRIVER_PATH}")
-        print("请下载适合您Chrome版本的驱动并放置在正确位置")
-        print("下载地址: https://chromedriver.chromium.org/downloads")
-        input("按Enter键退出...")
-        return
-
-    print(f"✓ Chrome驱动已找到: {os.path.abspath(CHROME_DRIVER_PATH)}")
+    layout = get_output_layout()
+    print(f"\n输出显示器: {len(layout.monitors)} 个，渲染尺寸 {layout.master_size[0]}x{layout.master_size[1]}")
 
-    # 检查Chrome浏览器
-    print("\n正在检查Chrome浏览器...")
-    chrome_found = False
-    possible_chrome_paths = [
-        r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-        r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
-        os.path.expanduser("~") + r"\AppData\Local\Google\Chrome\Application\chrome.exe"
-    ]
-
-    for path in possible_chrome_paths:
-        if os.path.exists(path):
-            print(f"✓ Chrome浏览器已找到: {path}")
-            chrome_found = True
-            break
-
-    if not chrome_found:
-        logger.warning("未找到Chrome浏览器，程序可能无法正常运行")
-        print("警告: 未找到Chrome浏览器，程序可能无法正常运行")
-        print("请确保已安装Chrome浏览器")
+    logger.info(f"数据获取方式: {DATA_SOURCE}")
+    if DATA_SOURCE == "data":
+        logger.info(f"数据模式，跳过Chrome检查，数据源: {WIND_DATA_BASE_URL}")
+        print(f"\n数据模式: 直接下载风场数据 ({WIND_DATA_BASE_URL})，无需Chrome")
+    else:
+        # 检查Chrome驱动是否存在
+        logger.info("检查Chrome驱动...")
+        print("\n正在检查Chrome驱动...")
+        if not os.path.exists(CHROME_DRIVER_PATH):
+            print(f"错误: Chrome驱动文件不存在: {CHROME_DRIVER_PATH}")
+            print("请下载适合您Chrome版本的驱动并放置在正确位置")
+            print("下载地址: https://chromedriver.chromium.org/downloads")
+            input("按Enter键退出...")
+            return
+
+        print(f"✓ Chrome驱动已找到: {os.path.abspath(CHROME_DRIVER_PATH)}")
+
+        # 检查Chrome浏览器
+        print("\n正在检查Chrome浏览器...")
+        chrome_found = False
+        possible_chrome_paths = [
+            r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+            r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+            os.path.expanduser("~") + r"\AppData\Local\Google\Chrome\Application\chrome.exe"
+        ]
+
+        for path in possible_chrome_paths:
+            if os.path.exists(path):
+                print(f"✓ Chrome浏览器已找到: {path}")
+                chrome_found = True
+                break
+
+        if not chrome_found:
+            logger.warning("未找到Chrome浏览器，程序可能无法正常运行")
+            print("警告: 未找到Chrome浏览器，程序可能无法正常运行")
+            print("请确保已安装Chrome浏览器")
 
-        if non_interactive:
-            logger.info("非交互式模式，自动继续执行")
-            print("非交互式模式，自动继续执行...")
-        else:
-            response = input("是否继续? (y/n): ")
-            if response.lower() != 'y':
-                return
+            if non_interactive:
+                logger.info("非交互式模式，自动继续执行")
+                print("非交互式模式，自动继续执行...")
+            else:
+                response = input("是否继续? (y/n): ")
+                if response.lower() != 'y':
+                    return
 
     if non_interactive:
         logger.info("非交互式模式，跳过用户确认")
@@ -725,69 +999,14 @@ def main():
 
         # 尝试设置测试壁纸
         print("\n尝试设置测试壁纸...")
-        global WALLPAPER_PATH  # 声明全局变量，必须在使用前声明
-        old_wallpaper_path = WALLPAPER_PATH
-        WALLPAPER_PATH = test_path
-
         wallpaper_set = False
 
-        # 方法1
-        print("\n尝试方法1: 使用SystemParametersInfoW...")
-        if set_wallpaper():
-            print("✓ 壁纸设置测试成功!")
+        # 依次探测可用的设置方式，成功的方式会被记住，之后的更新直接使用
+        if set_wallpaper(path=test_path):
+            print(f"✓ 壁纸设置测试成功! (方式: {get_wallpaper_applier().backend})")
             wallpaper_set = True
         else:
-            print("✗ 方法1失败")
-
-            # 如果方法1失败，尝试直接调用API
-            print("\n尝试方法2: 直接调用Windows API...")
-            try:
-                SPI_SETDESKWALLPAPER = 0x0014
-                SPIF_UPDATEINIFILE = 0x01
-                SPIF_SENDCHANGE = 0x02
-                abs_path = os.path.abspath(test_path)
-                result = ctypes.windll.user32.SystemParametersInfoW(
-                    SPI_SETDESKWALLPAPER,
-                    0,
-                    abs_path,
-                    SPIF_UPDATEINIFILE | SPIF_SENDCHANGE
-                )
-                if result:
-                    print("✓ 方法2成功!")
-                    wallpaper_set = True
-                else:
-                    print(f"✗ 方法2失败: 返回值 {result}")
-            except Exception as e:
-                print(f"✗ 方法2异常: {e}")
-
-            # 如果方法2也失败，尝试使用注册表
-            if not wallpaper_set:
-                print("\n尝试方法3: 使用注册表...")
-                try:
-                    import winreg
-                    abs_path = os.path.abspath(test_path)
-                    registry_key = winreg.OpenKey(
-                        winreg.HKEY_CURRENT_USER,
-                        "Control Panel\\Desktop",
-                        0,
-                        winreg.KEY_SET_VALUE
-                    )
-                    winreg.SetValueEx(registry_key, "WallpaperStyle", 0, winreg.REG_SZ, "0")
-                    winreg.SetValueEx(registry_key, "TileWallpaper", 0, winreg.REG_SZ, "0")
-                    winreg.SetValueEx(registry_key, "Wallpaper", 0, winreg.REG_SZ, abs_path)
-                    winreg.CloseKey(registry_key)
-
-                    # 通知Windows更新设置
-                    ctypes.windll.user32.SendMessageW(0xFFFF, 0x0112, 0xF, 0)
-                    ctypes.windll.user32.SendMessageW(0xFFFF, 0x0112, 0xF, 0)
-
-                    print("✓ 方法3成功!")
-                    wallpaper_set = True
-                except Exception as e:
-                    print(f"✗ 方法3异常: {e}")
-
-        # 恢复原始路径
-        WALLPAPER_PATH = old_wallpaper_path
+            print("✗ 所有设置方式都失败了")
 
         # 询问用户壁纸是否已更改
         if non_interactive:
@@ -852,30 +1071,16 @@ def main():
     print("这可能需要一些时间，请耐心等待...")
 
     # 首次运行
+    scheduler = create_scheduler()
     success = False
     try:
-        # 尝试更新壁纸
-        timestamp, screenshot_path, _ = fetch_wind_data()
-
-        if timestamp and screenshot_path:
-            print(f"\n✓ 风流场数据获取成功!")
-            print(f"时间戳: {timestamp}")
-            print(f"截图路径: {screenshot_path}")
-
-            print("\n正在创建壁纸...")
-            if create_wind_wallpaper(timestamp, screenshot_path, None):
-                print(f"\n✓ 壁纸创建成功: {WALLPAPER_PATH}")
-
-                print("\n正在设置壁纸...")
-                if set_wallpaper():
-                    print("\n✓ 壁纸设置成功!")
-                    success = True
-                else:
-                    print("\n✗ 壁纸设置失败")
-            else:
-                print("\n✗ 壁纸创建失败")
+        # 尝试更新壁纸（强制更新，不使用上次的数据标识）
+        if update_wallpaper(force=True):
+            print("\n✓ 壁纸设置成功!")
+            success = True
         else:
-            print("\n✗ 风流场数据获取失败")
+            print("\n✗ 首次壁纸更新未完成")
+        scheduler.record_result(success)
     except Exception as e:
         print(f"\n首次更新失败: {e}")
         import traceback
@@ -899,9 +1104,12 @@ def main():
     else:
         input("\n第4步: 准备设置定时更新。按Enter键继续...")
 
-    # 设置定时任务
-    schedule.every(UPDATE_INTERVAL).seconds.do(update_wallpaper)
-    print(f"\n✓ 已设置每 {UPDATE_INTERVAL} 秒更新一次壁纸")
+    # 设置定时任务（事件驱动：空闲时不轮询，更新在后台线程中执行）
+    daemon = WallpaperDaemon(update_wallpaper, scheduler)
+    if SCHEDULE_MODE == "model-run":
+        print("\n✓ 已设置按GFS数据发布时间更新壁纸")
+    else:
+        print(f"\n✓ 已设置每 {UPDATE_INTERVAL} 秒更新一次壁纸")
 
     print("\n="*50)
     print("程序设置完成!")
@@ -919,19 +1127,9 @@ def main():
 
     # 主循环
     try:
-        logger.info("开始主循环")
-        update_count = 0
-        while True:
-            schedule.run_pending()
-
-            # 每60秒显示一次心跳信息
-            if update_count % 60 == 0:
-                idle_seconds = schedule.idle_seconds()
-                logger.debug(f"程序正在运行... 下次更新还有 {idle_seconds:.0f} 秒")
-                print(f"程序正在运行... 下次更新还有 {idle_seconds:.0f} 秒")
-
-            update_count += 1
-            time.sleep(1)
+        if not non_interactive:
+            daemon.start_console_commands()
+        asyncio.run(daemon.run())
     except KeyboardInterrupt:
         logger.info("用户中断程序")
         print("\n程序已停止")
@@ -939,6 +1137,9 @@ def main():
         logger.error(f"程序异常: {e}")
         logger.error(traceback.format_exc())
         print(f"\n程序异常: {e}")
+    finally:
+        close_capture_pool()
+        close_capture_session()
 
     if non_interactive:
         logger.info("非交互式模式，自动退出")
@@ -947,4 +1148,4 @@ def main():
         input("\n按Enter键退出...")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+复用页面的数据刷新测试
+假驱动按earth的行为建模：只有URL片段真正变化时才重新拉取风场数据
+"""
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import capture_session
+from capture_session import CaptureSession, CaptureView
+
+PAGE_URL = "https://earth.nullschool.net/zh-cn/#current/wind/surface/level/patterson=0.00,0.00,185"
+
+
+class FakeEarthDriver:
+    """片段变化时记录一次数据请求；只触发hashchange或赋相同的片段不会拉取数据"""
+
+    def __init__(self):
+        self.base_url = None
+        self.hash = ""
+        self.requests = []  # (开始时刻, 片段)
+        self.get_count = 0
+        self.clock = time.perf_counter
+        self.switch_to = mock.Mock()
+
+    @property
+    def current_url(self):
+        return self.base_url + "#" + self.hash
+
+    def now(self):
+        return self.clock() * 1000
+
+    def get(self, url):
+        self.get_count += 1
+        self.base_url, _, self.hash = url.partition("#")
+        self.requests = [(self.now(), self.hash)]
+
+    def execute_script(self, script, *args):
+        if script == "return document.readyState":
+            return "complete"
+        if script is capture_session._CURRENT_FRAGMENT_JS:
+            return self.hash
+        if script is capture_session._SHOW_FRAGMENT_JS:
+            self.requests = []
+            since = self.now()
+            if args[0] != self.hash:
+                self.hash = args[0]
+                self.requests.append((self.now(), self.hash))
+            return since
+        if script is capture_session._DATA_REQUESTED_JS:
+            return any(start >= args[1] for start, _ in self.requests)
+        raise AssertionError(f"未预期的脚本: {script}")
+
+
+class WarmPageRefreshTest(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = FakeEarthDriver()
+        self.session = CaptureSession("chromedriver", PAGE_URL)
+        self.session.driver = self.driver
+        self.assertTrue(self.session.ensure_page())
+
+    def test_warm_refresh_fetches_data_without_reload(self):
+        with mock.patch.object(capture_session, "WARM_DATA_TIMEOUT", 1):
+            for _ in range(3):
+                start = time.monotonic()
+                self.assertFalse(self.session.ensure_page())
+                self.assertLess(time.monotonic() - start, 0.5)
+                self.assertEqual(len(self.driver.requests), 1)
+                self.assertGreaterEqual(self.driver.requests[0][0], self.session.data_since)
+        self.assertEqual(self.driver.get_count, 1)
+        self.assertTrue(self.driver.hash.endswith("/wind/surface/level/patterson=0.00,0.00,185"))
+
+    def test_switching_to_the_shown_view_fetches_data(self):
+        view = CaptureView("main", PAGE_URL.partition("#")[2])
+        self.session._show_view(view, "hash")
+        self.session._show_view(view, "hash")
+        self.assertEqual(len(self.driver.requests), 1)
+
+    def test_fixed_date_view_is_shown_unchanged(self):
+        view = CaptureView("archive", "2020/01/01/0000Z/wind/surface/level/orthographic")
+        self.session._show_view(view, "hash")
+        self.assertEqual(self.driver.hash, view.fragment)
+
+    def test_unresponsive_page_falls_back_to_reload(self):
+        self.driver.execute_script = mock.Mock(side_effect=lambda script, *args: (
+            self.driver.hash if script is capture_session._CURRENT_FRAGMENT_JS else
+            0 if script is capture_session._SHOW_FRAGMENT_JS else False))
+        with mock.patch.object(capture_session, "WARM_DATA_TIMEOUT", 0.3):
+            self.assertTrue(self.session.ensure_page())
+        self.assertEqual(self.driver.get_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
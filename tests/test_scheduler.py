@@ -0,0 +1,50 @@
+"""
+按数据发布时间调度的测试：用假时钟模拟一天的获取次数
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from scheduler import ModelRunScheduler
+
+
+def simulate(changed, days=2):
+    """按调度器的安排获取数据days天，changed(时间)决定每次获取是否得到新数据；返回所有获取时间"""
+    now = [datetime(2026, 1, 1, tzinfo=timezone.utc)]
+    scheduler = ModelRunScheduler(clock=lambda: now[0])
+    end = now[0] + timedelta(days=days)
+    polls = []
+    while now[0] < end:
+        polls.append(now[0])
+        scheduler.record_result(changed(now[0]))
+        now[0] += timedelta(seconds=scheduler.next_delay())
+    return polls
+
+
+class ModelRunSchedulerTest(unittest.TestCase):
+
+    def test_unchanged_data_backs_off(self):
+        polls = simulate(lambda now: False)
+        self.assertLess(len(polls) / 2, 24)
+
+    def test_late_publication_is_retried(self):
+        # 00:05的预期时间点没有新数据，00:20才发布
+        published = datetime(2026, 1, 1, 0, 20, tzinfo=timezone.utc)
+        seen = []
+
+        def changed(now):
+            if now >= published and not seen:
+                seen.append(now)
+                return True
+            return False
+
+        simulate(changed, days=1)
+        self.assertTrue(seen)
+        self.assertLess(seen[0] - published, timedelta(minutes=20))
+
+
+if __name__ == "__main__":
+    unittest.main()
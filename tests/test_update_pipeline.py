@@ -0,0 +1,101 @@
+"""
+更新流水线的重叠测试
+额外视图还在截取时，主壁纸应该已经走完合成、编码和设置壁纸阶段
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from PIL import Image
+
+import wind_wallpaper_new as app
+from capture_session import ViewCapture
+from pipeline import WindFrame
+
+APPLY_WAIT = 3  # 第一个视图最多等主壁纸这么久（秒）
+
+
+class FakeSession:
+    """第一个视图要等主壁纸设置完成后才截好"""
+
+    def __init__(self, applied):
+        self.applied = applied
+        self.applied_during_capture = None
+
+    def iter_capture_views(self, views, mode, timeout):
+        for index, view in enumerate(views):
+            if index == 0:
+                self.applied_during_capture = self.applied.wait(APPLY_WAIT)
+            yield ViewCapture(view, png_bytes=b"png", ready=True)
+
+
+class FakeWriter:
+    def __init__(self):
+        self.views = []
+
+    def write(self, image):
+        return "wallpaper.png"
+
+    def write_view(self, name, png_bytes):
+        self.views.append(name)
+
+
+class UpdatePipelineOverlapTest(unittest.TestCase):
+
+    def run_update(self, animation_format):
+        applied = threading.Event()
+        session = FakeSession(applied)
+        writer = FakeWriter()
+
+        def acquire(force):
+            frame = WindFrame("2026-01-01 00:00", content_key="key", source="browser")
+            frame.image = Image.new("RGB", (8, 8))
+            frame.animation_source = lambda count: iter(())
+            return frame
+
+        def create(frame):
+            frame.wallpaper = frame.image
+            return frame.wallpaper
+
+        def apply(wallpaper=None, path=None, span=False):
+            applied.set()
+            return True
+
+        with mock.patch.multiple(app, ANIMATION_FORMAT=animation_format, CAPTURE_WORKERS=1,
+                                 CAPTURE_VIEWS=["a=current/wind/surface/level", "b=current/wind/isobaric/850hPa"],
+                                 acquire_wind_data=acquire, create_wind_wallpaper=create, set_wallpaper=apply,
+                                 get_capture_session=lambda: session, get_wallpaper_writer=lambda: writer,
+                                 get_output_layout=lambda: SimpleNamespace(is_span=False),
+                                 write_animation=lambda frames, path, fmt, fps: (path, 0, 0.0),
+                                 update_state=app.UpdateState(), _update_pipeline=None):
+            try:
+                start = time.perf_counter()
+                updated = app.update_wallpaper(force=True)
+                seconds = time.perf_counter() - start
+            finally:
+                app.close_update_pipeline()
+        return updated, session, writer, seconds
+
+    def test_main_frame_applied_while_views_are_captured(self):
+        updated, session, writer, seconds = self.run_update(None)
+        self.assertTrue(updated)
+        self.assertTrue(session.applied_during_capture)
+        self.assertEqual(writer.views, ["a", "b"])
+        self.assertLess(seconds, APPLY_WAIT)
+
+    def test_browser_animation_captures_views_first(self):
+        # 动画阶段要用同一个浏览器录制，主壁纸在所有视图截完之后才交出
+        updated, session, writer, seconds = self.run_update("apng")
+        self.assertTrue(updated)
+        self.assertFalse(session.applied_during_capture)
+        self.assertEqual(writer.views, ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()